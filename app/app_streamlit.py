@@ -1,9 +1,20 @@
 #app_streamlit.py
+import time
 import streamlit as st
 from pathlib import Path
-from app.config import UPLOAD_DIR, PROCESSED_DIR, YOLO_CLASSES, PAGE_TITLE, LOGO_PATH, ALLOWED_VIDEO_TYPES
-from app.processing.processing import ejecutar_procesamiento
-from app.utils.utils import asegurar_video_web, obtener_duracion_formato
+from app.config import UPLOAD_DIR, YOLO_CLASSES, YOLO_MAP, PAGE_TITLE, LOGO_PATH, ALLOWED_VIDEO_TYPES
+from app.utils.indice import IndiceDetecciones
+from app.utils.subida import guardar_subida, sondear_en_segundo_plano
+from app.processing.trabajos import (
+    encolar_trabajo,
+    iniciar_servicio,
+    obtener_trabajo,
+    posicion_en_cola,
+    PENDIENTE,
+    PROCESANDO,
+    TERMINADO,
+    ERROR,
+)
 
 # ==============================================================================
 # COMPONENTES DE LA INTERFAZ DE USUARIO (Funciones de Streamlit)
@@ -98,17 +109,90 @@ def manejar_subida_video():
         label_visibility="collapsed"
     )
     if video_file:
-        save_path = UPLOAD_DIR / video_file.name
-        with open(save_path, "wb") as f:
-            f.write(video_file.getbuffer())
-        st.session_state['video_cargado'] = save_path
+        # El uploader conserva el archivo entre reruns: se copia a disco una sola vez
+        id_subida = (getattr(video_file, "file_id", None), video_file.name, video_file.size)
+        if st.session_state.get('id_subida') != id_subida:
+            video_file.seek(0)
+            save_path, video_hash = guardar_subida(video_file, video_file.name, UPLOAD_DIR)
+            st.session_state['id_subida'] = id_subida
+            st.session_state['video_cargado'] = save_path
+            st.session_state['video_hash'] = video_hash
+            st.session_state['sondeo'] = sondear_en_segundo_plano(save_path)
+        save_path = st.session_state['video_cargado']
         st.success("✅ Video cargado correctamente")
+        mostrar_metadatos(st.session_state.get('sondeo'))
         st.video(str(save_path))
 
+def mostrar_metadatos(sondeo):
+    """Duración / resolución / fps del video subido, si el sondeo ffprobe ya terminó."""
+    if sondeo is None or not sondeo.done():
+        return
+    try:
+        datos = sondeo.result()
+    except Exception as e:
+        st.warning(f"⚠️ No se pudieron leer los metadatos del video: {e}")
+        return
+    duracion = int(datos["duracion_seg"])
+    st.caption(f"🎞️ {duracion // 3600:02d}:{duracion % 3600 // 60:02d}:{duracion % 60:02d} · "
+               f"{datos['ancho']}x{datos['alto']} · {datos['fps']:.2f} fps · {datos['codec']}")
+
+def _a_segundos(texto):
+    """'HH:MM:SS' o 'MM:SS' -> segundos (ValueError si el formato es inválido)."""
+    partes = [int(p) for p in texto.strip().split(":")]
+    if not 1 <= len(partes) <= 3:
+        raise ValueError(texto)
+    segundos = 0
+    for p in partes:
+        segundos = segundos * 60 + p
+    return segundos
+
+def mostrar_buscador_detecciones(ruta_video_procesado: Path):
+    """
+    Panel de búsqueda sobre el índice de detecciones del video (sin re-procesar).
+    Devuelve el segundo del video procesado al que saltar, o 0.
+    """
+    indice = IndiceDetecciones.cargar(ruta_video_procesado)
+    if indice is None or not len(indice):
+        return 0
+
+    nombres = {v: k for k, v in YOLO_MAP.items()}
+    conteos = indice.clases()
+    st.markdown("#### 🔎 Buscar en las detecciones")
+    clases = st.multiselect(
+        "Objetos",
+        list(conteos),
+        format_func=lambda c: f"{nombres.get(c, f'clase {c}')} ({conteos[c]})",
+        placeholder="Todos"
+    )
+    col1, col2 = st.columns(2)
+    desde = col1.text_input("Desde (HH:MM:SS del original)", "00:00:00")
+    hasta = col2.text_input("Hasta (HH:MM:SS del original)", "")
+    try:
+        t0 = _a_segundos(desde) if desde.strip() else 0
+        t1 = _a_segundos(hasta) if hasta.strip() else float("inf")
+    except ValueError:
+        st.error("⚠️ Usá el formato HH:MM:SS o MM:SS.")
+        return 0
+
+    eventos = indice.eventos(t0, t1, clases or None)
+    if not eventos:
+        st.info("No hay detecciones en ese rango.")
+        return 0
+
+    def describir(i):
+        ini, fin, _, cuenta = eventos[i]
+        objetos = ", ".join(f"{nombres.get(c, f'clase {c}')}×{n}" for c, n in sorted(cuenta.items()))
+        return (f"{time.strftime('%H:%M:%S', time.gmtime(ini))} – "
+                f"{time.strftime('%H:%M:%S', time.gmtime(fin))}: {objetos}")
+
+    elegido = st.selectbox(f"Eventos encontrados ({len(eventos)})", range(len(eventos)), format_func=describir)
+    return int(eventos[elegido][2])
+
 def mostrar_resultados(ruta_video_procesado: Path):
-    """Muestra el video procesado y el botón de descarga."""
+    """Muestra el video procesado, el buscador de detecciones y el botón de descarga."""
     st.success("✅ Procesamiento completado.")
-    st.video(str(ruta_video_procesado))
+    inicio = mostrar_buscador_detecciones(ruta_video_procesado)
+    st.video(str(ruta_video_procesado), start_time=inicio)
 
     with open(ruta_video_procesado, "rb") as f:
         st.download_button(
@@ -118,6 +202,18 @@ def mostrar_resultados(ruta_video_procesado: Path):
             mime="video/mp4"
         )
 
+@st.fragment(run_every=2)
+def mostrar_estado_trabajo(trabajo_id):
+    """Consulta el trabajo en segundo plano cada 2 s sin bloquear el resto de la página."""
+    trabajo = obtener_trabajo(trabajo_id)
+    if trabajo is None or trabajo["estado"] not in (PENDIENTE, PROCESANDO):
+        st.rerun()  # terminó (o desapareció): se redibuja la página completa
+
+    if trabajo["estado"] == PENDIENTE:
+        antes = posicion_en_cola(trabajo_id)
+        st.info(f"⏳ En cola ({antes} trabajo(s) antes que este).")
+    st.progress(min(max(trabajo["progreso"], 0.0), 1.0), text=trabajo["mensaje"] or "Procesando...")
+
 # ==============================================================================
 # FLUJO PRINCIPAL DE LA APLICACIÓN
 # ==============================================================================
@@ -125,6 +221,7 @@ def mostrar_resultados(ruta_video_procesado: Path):
 def main():
     """Función principal que ejecuta la aplicación de Streamlit."""
     st.set_page_config(page_title=PAGE_TITLE, layout="centered")
+    iniciar_servicio()
     aplicar_estilos_css()
     mostrar_header()
 
@@ -147,41 +244,28 @@ def main():
             if not opciones:
                 st.error("⚠️ Debes seleccionar al menos un objeto a detectar para continuar.")
             else:
-                st.session_state['video_procesado'] = None
-                with st.spinner("Procesando video... Esto puede tardar unos minutos."):
-                    try:
-                        _, duracion_min = obtener_duracion_formato(str(video_original_path))
-                        output_path = PROCESSED_DIR / f"procesado_{video_original_path.name}"
-
-                        if "todos" in opciones:
-                            target_classes = None  # None = todas las clases
-                        else:
-                            from app.config import YOLO_MAP
-                            target_classes = [YOLO_MAP[x] for x in opciones]
-
-                        final_path_str, _ = ejecutar_procesamiento(
-                            str(video_original_path),
-                            str(output_path),
-                            duracion_min=duracion_min,
-                            target_classes=target_classes,
-                            forzar_todas=False
-                        )
-
-                        final_path = Path(final_path_str)
-                        final_web_path = asegurar_video_web(final_path)
-
-                        if final_web_path:
-                            # 🧹 borrar el original para que no quede duplicado
-                            if final_path.exists():
-                                final_path.unlink()
-                            st.session_state['video_procesado'] = final_web_path
-
-                    except Exception as e:
-                        st.error(f"❌ Error al procesar: {e}")
-
-    # --- Sección de Resultados (solo si un video fue procesado exitosamente) ---
-    if 'video_procesado' in st.session_state and st.session_state.video_procesado:
-        mostrar_resultados(st.session_state.video_procesado)
+                if "todos" in opciones:
+                    target_classes = None  # None = todas las clases
+                else:
+                    target_classes = [YOLO_MAP[x] for x in opciones]
+
+                # El trabajo corre en segundo plano; el id queda en la URL y sobrevive a un refresh
+                trabajo_id = encolar_trabajo(video_original_path, target_classes=target_classes,
+                                             video_hash=st.session_state.get('video_hash'))
+                st.query_params["trabajo"] = trabajo_id
+
+    # --- Sección de Estado / Resultados del trabajo ---
+    trabajo_id = st.query_params.get("trabajo")
+    if trabajo_id:
+        trabajo = obtener_trabajo(trabajo_id)
+        if trabajo is None:
+            st.warning("⚠️ No se encontró el trabajo solicitado.")
+        elif trabajo["estado"] in (PENDIENTE, PROCESANDO):
+            mostrar_estado_trabajo(trabajo_id)
+        elif trabajo["estado"] == TERMINADO:
+            mostrar_resultados(Path(trabajo["resultado"]))
+        elif trabajo["estado"] == ERROR:
+            st.error(f"❌ Error al procesar: {trabajo['mensaje']}")
 
 
 if __name__ == "__main__":
@@ -9,8 +9,17 @@ STATIC_DIR = BASE_DIR / "static"
 
 LOGO_PATH = STATIC_DIR / "Logo_MPA.png"
 
+TRABAJOS_DIR = BASE_DIR / "trabajos"      # un directorio de trabajo aislado por job
+TRABAJOS_DB = BASE_DIR / "trabajos.db"     # cola de trabajos (SQLite)
+CACHE_DB = PROCESSED_DIR / "cache.db"                   # índice LRU de resultados cacheados
+CACHE_DETECCIONES_DIR = PROCESSED_DIR / "_detecciones"  # detecciones por frame, por video y modelo
+MODELOS_DIR = BASE_DIR / "modelos"         # modelos exportados (ONNX/OpenVINO), uno por configuración
+
 UPLOAD_DIR.mkdir(exist_ok=True)
 PROCESSED_DIR.mkdir(exist_ok=True)
+TRABAJOS_DIR.mkdir(exist_ok=True)
+CACHE_DETECCIONES_DIR.mkdir(exist_ok=True)
+MODELOS_DIR.mkdir(exist_ok=True)
 
 YOLO_MAP = {
     "persona": 0,
@@ -41,4 +50,91 @@ YOLO_CLASSES = list(YOLO_MAP.keys())
 PAGE_TITLE = "Procesamiento Inteligente de Videos"
 LOGO_FILENAME = "Logo_MPA.png"
 ALLOWED_VIDEO_TYPES = ["mp4", "mov", "avi", "mkv"]
+SUBIDA_BLOQUE = 8 << 20   # bytes por bloque al copiar un video subido a disco (8 MiB)
 LOGO_PATH = BASE_DIR / LOGO_FILENAME
+
+# --- Modelo YOLO (backend de inferencia, ver utils/modelo.py) ---
+YOLO_TAMANIO = "m"          # "n" | "s" | "m": yolov8{n,s,m}.pt; se carga recién cuando se pide
+YOLO_IMGSZ = 640            # resolución de entrada del modelo
+YOLO_RUNTIME = "pytorch"    # "pytorch" | "onnx" (ONNX Runtime) | "openvino"
+YOLO_INT8 = False           # cuantización INT8 (solo openvino)
+
+# --- Umbrales de confianza ---
+YOLO_CONF_MIN = 0.25        # piso que se le pasa al modelo (NMS); las cajas cacheadas lo respetan
+YOLO_CONF_POR_CLASE = {     # umbral propio por clase (nombres de YOLO_MAP); debe ser >= YOLO_CONF_MIN
+    # "persona": 0.4,
+    # "celular": 0.5,
+}
+
+# --- Inferencia YOLO por lotes ---
+YOLO_LOTE_TAMANIO = 8       # frames por llamada al modelo (1 = cuadro a cuadro, como antes)
+YOLO_LOTE_MAX_ESPERA = 64   # máx. frames decodificados por adelantado mientras se arma un lote
+YOLO_LOTE_MAX_MB = 256      # tope de esos frames en memoria, por proceso (acota max_espera en videos grandes)
+
+# --- Pipeline con hilos dentro de cada chunk ---
+PIPELINE_HILOS = True   # decodificación / SSIM+YOLO / overlay+encoder en hilos separados
+PIPELINE_COLA = 16      # frames en vuelo entre etapas (acota la memoria y aplica contrapresión)
+
+# --- Análisis sobre una versión reducida del video (proxy) ---
+ANALISIS_PROXY = False        # True: SSIM/YOLO/tracking sobre un stream escalado por ffmpeg; la salida sigue a resolución original
+ANALISIS_PROXY_ANCHO = 640    # ancho del proxy (YOLO reduce a YOLO_IMGSZ de todos modos); solo si el video es más ancho
+
+# --- Salteo de frames sin detección activa ---
+SALTO_ADAPTATIVO = True   # False: salteo fijo (step=4 en videos largos, step=2 en cortos)
+SALTO_MIN = 1             # salto al haber cambio o detección (1 = cada frame)
+SALTO_MAX = 32            # tope del salto en tramos estáticos (se duplica en cada SSIM sin cambio)
+
+# --- Prefiltro barato antes del SSIM (diferencia sobre miniaturas) ---
+PREFILTRO = True
+PREFILTRO_TAMANIO = (64, 48)   # miniatura en gris (ancho, alto)
+PREFILTRO_IGUAL_MAX = 4        # |dif| máxima por píxel para dar el frame por igual (sin SSIM)
+PREFILTRO_DISTINTO_MAD = 20.0  # |dif| media desde la cual el frame cambió seguro (sin SSIM)
+
+# --- YOLO solo en las regiones que cambiaron (ROI) ---
+YOLO_ROI = False          # True: sin detección activa, inferir solo los recortes con cambio SSIM
+YOLO_ROI_PADDING = 32     # px (del frame completo) agregados alrededor de cada región
+YOLO_ROI_MAX_AREA = 0.4   # si las regiones cubren más de esta fracción del frame, frame completo
+
+# --- Detectar y seguir (tracking entre detecciones YOLO) ---
+TRACKING = False                 # True: durante una detección activa, YOLO 1 de cada N frames
+TRACKING_REDETECTAR_CADA = 5     # N: frames entre detecciones YOLO completas
+TRACKING_POLITICA = "confianza"  # "cada_n" (solo cadencia) o "confianza" (también si el tracker se degrada)
+TRACKING_CONFIANZA_MIN = 0.5     # fracción mínima de puntos sanos por caja para seguir sin YOLO
+
+# --- Calibración del umbral SSIM ---
+SSIM_CALIBRACION = "incremental"   # "incremental" (una sola pasada) o "dos_pasadas" (calcular_ssim_promedio)
+SSIM_CALIBRACION_MUESTRAS = 150    # comparaciones SSIM del calentamiento antes de congelar el umbral
+
+# --- Detector de cambios (SSIM) ---
+SSIM_MOTOR = "rapido"   # "rapido" (cv2.boxFilter float32 con corte temprano) o "skimage"
+
+# --- Codificación de salida (igual en todos los chunks: el concat -c copy sale listo para la web) ---
+VIDEO_PRESET = "fast"
+VIDEO_CRF = 20
+VIDEO_PERFIL = "high"         # perfil H.264 (todos los navegadores lo reproducen)
+VIDEO_GOP_SEG = 2             # un keyframe cada N segundos, fijo (sin keyframes por cambio de escena)
+VIDEO_TIMESCALE = 90000       # timescale de la pista MP4, común a todos los chunks
+
+# --- División en chunks para procesamiento paralelo ---
+CHUNK_MODO = "copia"   # "copia" (corte en keyframes con -c copy) o "reencode" (seek preciso con libx264)
+
+# --- Reparto del procesamiento paralelo ---
+PARALELO_PROCESOS = None   # workers del pool; None = núcleos / TRABAJOS_WORKERS
+PARALELO_MIN_MINUTOS = 10  # videos más largos que esto se procesan en chunks paralelos
+CHUNKS_POR_WORKER = 4      # sobre-descomposición: unidades de trabajo por worker
+CHUNK_MIN_SEG = 60         # duración mínima de un chunk
+CHUNK_MAX_SEG = 600        # duración máxima de un chunk
+
+# --- Tolerancia a fallas por chunk ---
+CHUNK_REINTENTOS = 2       # reintentos de un chunk que falló (además del primer intento)
+CHUNK_BACKOFF_SEG = 5      # espera antes del 1er reintento; se duplica en cada uno
+CHUNK_HUECOS = "error"     # si quedan chunks fallidos: "error" (no arma el video) o "marcar" (placa en el hueco)
+HUECO_SEG = 2              # duración de la placa "SIN PROCESAR" de cada hueco
+
+# --- Cola de trabajos en segundo plano ---
+TRABAJOS_WORKERS = 2      # procesos que atienden la cola a la vez
+TRABAJOS_POLL_SEG = 1.0   # cada cuánto un worker libre revisa si hay trabajos pendientes
+
+# --- Caché de resultados ---
+CACHE_MAX_MB = 20000   # tope de disco para videos procesados + detecciones cacheadas (LRU)
+CACHE_VERSION = 1      # subir si cambia algo del pipeline que invalide resultados viejos
@@ -0,0 +1,205 @@
+# cambios.py
+import cv2
+import numpy as np
+from skimage.metrics import structural_similarity as ssim
+
+
+class DetectorCambiosSkimage:
+    """Camino original: skimage structural_similarity(full=True) en float64."""
+
+    def mapa(self, prev_small, cur_small):
+        """Devuelve (score medio, mapa SSIM completo)."""
+        return ssim(prev_small, cur_small, full=True)
+
+    def hay_cambio(self, prev_small, cur_small, umbral):
+        _score, sim_map = ssim(prev_small, cur_small, full=True)
+        return bool((sim_map < umbral).any())
+
+    def mascara(self, prev_small, cur_small, umbral):
+        """Máscara booleana de las ventanas con SSIM < umbral."""
+        _score, sim_map = ssim(prev_small, cur_small, full=True)
+        return sim_map < umbral
+
+
+class DetectorCambios:
+    """
+    SSIM equivalente al de skimage por defecto (ventana uniforme 7x7, K1=0.01,
+    K2=0.03, covarianza muestral, bordes 'reflect') hecho con cv2.boxFilter en float32.
+    Los buffers se reservan una vez y se reutilizan entre frames. hay_cambio()
+    recorre el frame por franjas horizontales y corta en la primera ventana
+    que queda por debajo del umbral, sin construir el mapa completo.
+    """
+
+    WIN = 7
+    K1, K2 = 0.01, 0.03
+
+    def __init__(self, size=(320, 240), franja=48, data_range=255):
+        w, h = size
+        self.h, self.w = h, w
+        self.pad = self.WIN // 2
+        self.franja = max(1, min(franja, h))
+        self.C1 = (self.K1 * data_range) ** 2
+        self.C2 = (self.K2 * data_range) ** 2
+        n_win = self.WIN * self.WIN
+        self.cov_norm = n_win / (n_win - 1)
+
+        self.x = np.empty((h, w), np.float32)
+        self.y = np.empty((h, w), np.float32)
+        filas = max(h, self.franja + 2 * self.pad)
+        self._buf = {
+            nombre: np.empty((filas, w), np.float32)
+            for nombre in ("ux", "uy", "uxx", "uyy", "uxy", "t1", "t2", "t3", "t4")
+        }
+        self._menor = np.empty((filas, w), np.bool_)
+
+    def _box(self, src, nombre, n):
+        return cv2.boxFilter(src, -1, (self.WIN, self.WIN), dst=self._buf[nombre][:n],
+                             normalize=True, borderType=cv2.BORDER_REFLECT)
+
+    def _franja(self, r0, r1):
+        """
+        Calcula numerador y denominador del SSIM para las filas [r0, r1).
+        Filtra con 'pad' filas de contexto a cada lado; en los bordes reales
+        del frame el BORDER_REFLECT reproduce el 'reflect' de skimage/scipy.
+        """
+        a, b = max(r0 - self.pad, 0), min(r1 + self.pad, self.h)
+        n = b - a
+        xs, ys = self.x[a:b], self.y[a:b]
+        t1, t2, t3, t4 = (self._buf[k][:n] for k in ("t1", "t2", "t3", "t4"))
+
+        ux = self._box(xs, "ux", n)
+        uy = self._box(ys, "uy", n)
+        uxx = self._box(cv2.multiply(xs, xs, dst=t1), "uxx", n)
+        uyy = self._box(cv2.multiply(ys, ys, dst=t1), "uyy", n)
+        uxy = self._box(cv2.multiply(xs, ys, dst=t1), "uxy", n)
+
+        o0, o1 = r0 - a, r1 - a
+        ux, uy, uxx, uyy, uxy = (m[o0:o1] for m in (ux, uy, uxx, uyy, uxy))
+        t1, t2, t3, t4 = (t[o0:o1] for t in (t1, t2, t3, t4))
+
+        # Numerador: (2*ux*uy + C1) * (2*vxy + C2)
+        np.multiply(ux, uy, out=t1)
+        np.subtract(uxy, t1, out=t2)
+        t2 *= 2 * self.cov_norm
+        t2 += self.C2
+        t1 *= 2
+        t1 += self.C1
+        t1 *= t2
+        # Denominador: (ux² + uy² + C1) * (vx + vy + C2)
+        np.multiply(ux, ux, out=t2)
+        np.multiply(uy, uy, out=t3)
+        np.add(uxx, uyy, out=t4)
+        t4 -= t2
+        t4 -= t3
+        t4 *= self.cov_norm
+        t4 += self.C2
+        t2 += t3
+        t2 += self.C1
+        t2 *= t4
+        return t1, t2
+
+    def _cargar(self, prev_small, cur_small):
+        np.copyto(self.x, prev_small)
+        np.copyto(self.y, cur_small)
+
+    def mapa(self, prev_small, cur_small):
+        """
+        Devuelve (score medio, mapa SSIM completo) como skimage(full=True).
+        El mapa es un buffer interno: se pisa en la próxima llamada.
+        """
+        self._cargar(prev_small, cur_small)
+        num, den = self._franja(0, self.h)
+        sim_map = np.divide(num, den, out=self._buf["t3"][:self.h])
+        p = self.pad
+        score = float(sim_map[p:-p, p:-p].mean(dtype=np.float64))
+        return score, sim_map
+
+    def hay_cambio(self, prev_small, cur_small, umbral):
+        """True apenas alguna ventana tiene SSIM < umbral (num < umbral * den, den > 0)."""
+        self._cargar(prev_small, cur_small)
+        for r0 in range(0, self.h, self.franja):
+            r1 = min(r0 + self.franja, self.h)
+            num, den = self._franja(r0, r1)
+            den *= umbral
+            if np.less(num, den, out=self._menor[:r1 - r0]).any():
+                return True
+        return False
+
+    def mascara(self, prev_small, cur_small, umbral):
+        """Máscara booleana (nueva, no es un buffer interno) de las ventanas con SSIM < umbral."""
+        _score, sim_map = self.mapa(prev_small, cur_small)
+        return sim_map < umbral
+
+
+def clasificar_prefiltro(prev_mini, cur_mini, igual_max, distinto_mad):
+    """
+    Primer nivel del detector de cambios, sobre miniaturas en gris (p. ej. 64x48):
+      "igual"    -> ningún píxel de la miniatura cambió más de 'igual_max' (ruido)
+      "distinto" -> la diferencia absoluta media supera 'distinto_mad' (cambio global)
+      "dudoso"   -> hay que decidir con el SSIM completo
+    """
+    diff = cv2.absdiff(prev_mini, cur_mini)
+    if int(diff.max()) <= igual_max:
+        return "igual"
+    if float(diff.mean()) >= distinto_mad:
+        return "distinto"
+    return "dudoso"
+
+
+def regiones_cambio(mascara, frame_shape, padding=32, max_area=0.4, max_regiones=6, min_lado=96):
+    """
+    Convierte la máscara de cambio (resolución del SSIM) en rectángulos
+    (x1, y1, x2, y2) del frame completo: dilata por la ventana SSIM, toma las
+    componentes conexas, escala, agrega 'padding' y fusiona los que se tocan.
+    Devuelve None (= inferir el frame completo) si no hay cambio localizado, si hay
+    más de 'max_regiones' o si el área cubierta supera 'max_area' del frame.
+    """
+    if mascara is None or not mascara.any():
+        return None
+    H, W = frame_shape[:2]
+    mh, mw = mascara.shape
+    sx, sy = W / mw, H / mh
+
+    m = cv2.dilate(mascara.astype(np.uint8), np.ones((DetectorCambios.WIN, DetectorCambios.WIN), np.uint8))
+    _, _, stats, _ = cv2.connectedComponentsWithStats(m, connectivity=8)
+    rects = []
+    for x, y, w, h, _area in stats[1:]:
+        x1, y1 = int(x * sx) - padding, int(y * sy) - padding
+        x2, y2 = int(np.ceil((x + w) * sx)) + padding, int(np.ceil((y + h) * sy)) + padding
+        # Lado mínimo: un recorte muy chico no le da contexto a YOLO
+        if x2 - x1 < min_lado:
+            cx = (x1 + x2) // 2
+            x1, x2 = cx - min_lado // 2, cx + min_lado // 2
+        if y2 - y1 < min_lado:
+            cy = (y1 + y2) // 2
+            y1, y2 = cy - min_lado // 2, cy + min_lado // 2
+        rects.append([max(x1, 0), max(y1, 0), min(x2, W), min(y2, H)])
+
+    # Fusionar rectángulos que se superponen hasta que no quede ninguno
+    fusionado = True
+    while fusionado:
+        fusionado = False
+        for i in range(len(rects)):
+            for j in range(i + 1, len(rects)):
+                a, b = rects[i], rects[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    rects[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del rects[j]
+                    fusionado = True
+                    break
+            if fusionado:
+                break
+
+    area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in rects)
+    if len(rects) > max_regiones or area > max_area * W * H:
+        return None
+    return [tuple(r) for r in rects]
+
+
+def crear_detector_cambios(motor="rapido", size=(320, 240)):
+    """Devuelve el detector de cambios SSIM: 'rapido' (cv2/float32) o 'skimage'."""
+    if motor == "rapido":
+        return DetectorCambios(size=size)
+    if motor == "skimage":
+        return DetectorCambiosSkimage()
+    raise Exception(f"Motor SSIM desconocido: {motor}")
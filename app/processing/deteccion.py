@@ -0,0 +1,141 @@
+# deteccion.py
+import cv2
+import numpy as np
+
+from app.config import YOLO_IMGSZ, YOLO_MAP, YOLO_CONF_MIN, YOLO_CONF_POR_CLASE
+from app.utils.utils import obtener_modelo
+
+# Umbral de confianza por cls_id (las claves de config son los nombres de YOLO_MAP)
+_CONF_POR_ID = {YOLO_MAP[nombre]: conf for nombre, conf in YOLO_CONF_POR_CLASE.items()}
+
+
+def detectar_lote(frames, target_classes=None, modelo=None, imgsz=None):
+    """
+    Corre YOLO sobre varios frames en UNA sola llamada al modelo.
+    Devuelve, en el mismo orden, la lista de cajas (cls_id, x1, y1, x2, y2, conf)
+    de cada frame. target_classes va directo al NMS del modelo (classes=), y el
+    piso de confianza es YOLO_CONF_MIN; los umbrales por clase los aplica filtrar_cajas.
+    Las cajas de cada frame se convierten de una vez como array NumPy (n, 6).
+    Si la inferencia falla se propaga la excepción: el que llama decide (procesar_video
+    marca esos frames como fallidos y no los guarda en el caché).
+    modelo/imgsz: por defecto el modelo del proceso (obtener_modelo) y YOLO_IMGSZ.
+    """
+    if not frames:
+        return []
+    modelo = modelo or obtener_modelo()
+    results = modelo(list(frames), imgsz=imgsz or YOLO_IMGSZ, conf=YOLO_CONF_MIN,
+                     classes=list(target_classes) if target_classes is not None else None,
+                     verbose=False)
+
+    detecciones = []
+    for r in results:
+        datos = r.boxes.data.cpu().numpy()  # (n, 6): x1, y1, x2, y2, conf, cls
+        if not len(datos):
+            detecciones.append([])
+            continue
+        xyxy = datos[:, :4].astype(np.int32).tolist()
+        cls = datos[:, 5].astype(np.int32).tolist()
+        conf = np.round(datos[:, 4], 3).tolist()
+        detecciones.append([(c, *caja, p) for c, caja, p in zip(cls, xyxy, conf)])
+    return detecciones
+
+
+def detectar_lote_roi(frames, regiones, target_classes=None):
+    """
+    Como detectar_lote, pero los frames con regiones (lista de (x1, y1, x2, y2), ver
+    cambios.regiones_cambio) se infieren solo en esos recortes; los de regiones None
+    van completos. Todos los recortes del lote van en UNA llamada al modelo y las
+    cajas vuelven a coordenadas del frame completo.
+    """
+    imagenes, origenes = [], []
+    for i, (frame, rois) in enumerate(zip(frames, regiones)):
+        if rois is None:
+            imagenes.append(frame)
+            origenes.append((i, 0, 0))
+            continue
+        for x1, y1, x2, y2 in rois:
+            imagenes.append(frame[y1:y2, x1:x2].copy())
+            origenes.append((i, x1, y1))
+
+    detecciones = [[] for _ in frames]
+    for (i, dx, dy), cajas in zip(origenes, detectar_lote(imagenes, target_classes)):
+        detecciones[i].extend(
+            (cls_id, x1 + dx, y1 + dy, x2 + dx, y2 + dy, conf)
+            for cls_id, x1, y1, x2, y2, conf in cajas
+        )
+    return detecciones
+
+
+def filtrar_cajas(cajas, target_classes=None):
+    """
+    Se queda con las cajas de las clases pedidas (None = todas) que superan el
+    umbral de confianza de su clase (YOLO_CONF_POR_CLASE; las demás usan el piso).
+    """
+    if target_classes is None and not _CONF_POR_ID:
+        return cajas
+    return [
+        c for c in cajas
+        if (target_classes is None or c[0] in target_classes) and c[5] >= _CONF_POR_ID.get(c[0], 0)
+    ]
+
+
+_COLOR = (0, 255, 0)
+_FUENTE, _ESCALA, _GROSOR = cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2
+_etiquetas = {}  # cls_id -> (máscara del texto renderizado, alto sobre la línea base)
+
+# Nombres COCO de los modelos YOLO (los de model.names), sin cargar el modelo para
+# dibujar: un re-render servido entero desde el caché no paga el arranque de YOLO
+_NOMBRES_COCO = (
+    "person", "bicycle", "car", "motorcycle", "airplane", "bus", "train", "truck", "boat",
+    "traffic light", "fire hydrant", "stop sign", "parking meter", "bench", "bird", "cat",
+    "dog", "horse", "sheep", "cow", "elephant", "bear", "zebra", "giraffe", "backpack",
+    "umbrella", "handbag", "tie", "suitcase", "frisbee", "skis", "snowboard", "sports ball",
+    "kite", "baseball bat", "baseball glove", "skateboard", "surfboard", "tennis racket",
+    "bottle", "wine glass", "cup", "fork", "knife", "spoon", "bowl", "banana", "apple",
+    "sandwich", "orange", "broccoli", "carrot", "hot dog", "pizza", "donut", "cake", "chair",
+    "couch", "potted plant", "bed", "dining table", "toilet", "tv", "laptop", "mouse",
+    "remote", "keyboard", "cell phone", "microwave", "oven", "toaster", "sink",
+    "refrigerator", "book", "clock", "vase", "scissors", "teddy bear", "hair drier",
+    "toothbrush",
+)
+
+
+def _etiqueta(cls_id):
+    """Texto de la clase renderizado una sola vez como máscara (se reutiliza en cada frame)."""
+    if cls_id not in _etiquetas:
+        texto = _NOMBRES_COCO[cls_id] if 0 <= cls_id < len(_NOMBRES_COCO) else str(cls_id)
+        (w, h), base = cv2.getTextSize(texto, _FUENTE, _ESCALA, _GROSOR)
+        g = _GROSOR  # margen para el trazo grueso
+        mascara = np.zeros((h + base + 2 * g, w + 2 * g), np.uint8)
+        cv2.putText(mascara, texto, (g, h + g), _FUENTE, _ESCALA, 255, _GROSOR)
+        _etiquetas[cls_id] = (mascara > 0, h + g)
+    return _etiquetas[cls_id]
+
+
+def dibujar_detecciones(frame, cajas):
+    """
+    Dibuja rectángulo + etiqueta de cada caja sobre el frame (in-place).
+    Todos los rectángulos van en una sola llamada (polylines) y las etiquetas se
+    pegan desde máscaras ya renderizadas por clase, sin putText por frame.
+    """
+    if not cajas:
+        return frame
+    arr = np.array([c[:5] for c in cajas], np.int32)
+    x1, y1, x2, y2 = arr[:, 1], arr[:, 2], arr[:, 3], arr[:, 4]
+    rects = np.stack([np.stack([x1, y1], 1), np.stack([x2, y1], 1),
+                      np.stack([x2, y2], 1), np.stack([x1, y2], 1)], 1)
+    cv2.polylines(frame, list(rects.reshape(-1, 4, 1, 2)), True, _COLOR, _GROSOR)
+
+    H, W = frame.shape[:2]
+    for cls_id, x, y in zip(arr[:, 0].tolist(), x1.tolist(), y1.tolist()):
+        mascara, alto = _etiqueta(cls_id)
+        # Misma ubicación que putText en (x1, y1 - 5): la línea base 5 px arriba de la caja
+        top, left = y - 5 - alto, x - _GROSOR
+        mh, mw = mascara.shape
+        t0, l0 = max(top, 0), max(left, 0)
+        t1, l1 = min(top + mh, H), min(left + mw, W)
+        if t1 <= t0 or l1 <= l0:
+            continue
+        zona = frame[t0:t1, l0:l1]
+        zona[mascara[t0 - top:t1 - top, l0 - left:l1 - left]] = _COLOR
+    return frame
@@ -1,233 +1,741 @@
 # processing.py
 import cv2
-import subprocess
-from pathlib import Path
-from skimage.metrics import structural_similarity as ssim
+import numpy as np
+from collections import deque
 
 from app.utils.utils import (
     calcular_ssim_promedio,
-    ajustar_umbral,
+    CalibradorSSIM,
     timestamp_frame,
-    yolo_model,       # cargado una sola vez en utils
+    zona_timestamp,
 )
-from app.config import YOLO_MAP
+from app.utils.codificador import CodificadorFFmpeg
+from app.utils.lector import DecodificadorProxy, FramesCompletos, LectorEnHilo
+from app.utils.indice import RegistroDetecciones
+from app.utils.instrumentacion import Perfil
+from app.utils.metadatos import metadatos
+from app.config import (
+    YOLO_MAP,
+    YOLO_LOTE_TAMANIO,
+    YOLO_LOTE_MAX_ESPERA,
+    YOLO_LOTE_MAX_MB,
+    SSIM_CALIBRACION,
+    SSIM_CALIBRACION_MUESTRAS,
+    SSIM_MOTOR,
+    PIPELINE_HILOS,
+    PIPELINE_COLA,
+    YOLO_ROI,
+    YOLO_ROI_PADDING,
+    YOLO_ROI_MAX_AREA,
+    SALTO_ADAPTATIVO,
+    SALTO_MIN,
+    SALTO_MAX,
+    PREFILTRO,
+    PREFILTRO_TAMANIO,
+    PREFILTRO_IGUAL_MAX,
+    PREFILTRO_DISTINTO_MAD,
+    TRACKING,
+    TRACKING_REDETECTAR_CADA,
+    TRACKING_POLITICA,
+    TRACKING_CONFIANZA_MIN,
+    PARALELO_MIN_MINUTOS,
+    ANALISIS_PROXY,
+    ANALISIS_PROXY_ANCHO,
+)
+from app.processing.cambios import clasificar_prefiltro, crear_detector_cambios, regiones_cambio
+from app.processing.deteccion import detectar_lote, detectar_lote_roi, dibujar_detecciones, filtrar_cajas
+from app.processing.seguimiento import SeguidorCajas
+from app.utils.cache import archivo_detecciones, cargar_detecciones, guardar_detecciones
 from app.utils.paralelo import procesar_en_paralelo
 
 
-def procesar_video(video_path, output_path, step=1, offset=0, target_classes=None):
-    """
-    Procesa un video (o chunk):
-      - SSIM full=True: conserva frame si ALGUNA ventana < umbral (umbral dinámico).
-      - YOLO: 1x si hay detección; 2.5x si no hay (ajustable).
-      - Escribe MP4 temporal con overlay de tiempo ORIGINAL (abs_idx/fps + offset).
-      - Re-encode final con FFmpeg concatenando segmentos 1x / 2.5x.
-      - Sin deriva: reloj = abs_idx/fps. No usamos POS_MSEC.
-    """
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        raise Exception(f"No se pudo abrir el video: {video_path}")
+# Marca de "cajas a obtener con el tracker" en los ítems del lote
+_SEGUIR = "seguir"
 
-    fps = cap.get(cv2.CAP_PROP_FPS) or 24
-    w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
 
-    temp_out = Path(output_path).with_name(f"{Path(output_path).stem}_temp.mp4")
-    out = cv2.VideoWriter(str(temp_out), cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
-
-    # Umbral dinámico según tu lógica
-    promedio, desviacion = calcular_ssim_promedio(video_path, step=step)
-    umbral = ajustar_umbral(promedio, desviacion)
-    print(f"📊 SSIM promedio={promedio:.4f}, std={desviacion:.4f}, umbral={umbral:.4f}")
-
-    prev_gray = None
-    frame_count, guardados = 0, 0
+class _FuenteFrames:
+    """
+    Envuelve cv2.VideoCapture con un buffer para poder "rebobinar".
+    Mientras graba, todo frame consumido (aunque sea con grab) se decodifica y
+    se guarda, así la lectura especulativa del lote YOLO se puede deshacer.
+    Un frame grabado al que se le dibuja encima se respalda solo en la zona que se
+    toca (respaldar); al rebobinar esa zona se restaura y el frame vuelve limpio.
+    """
 
-    # Estado de detección (para colas) y armado de segmentos de velocidad
-    deteccion_activa = False
-    frames_despues_deteccion = 0
-    max_frames_despues_deteccion = 20  # conserva algunos frames luego de la última detección
+    def __init__(self, cap, max_frames=None):
+        self.cap = cap
+        self.max_frames = max_frames # si no es None, la fuente se agota en ese frame
+        self.pos = 0                 # índice absoluto del próximo frame a consumir
+        self.pendientes = deque()    # frames ya decodificados a re-consumir: (idx, frame)
+        self.historial = []          # frames consumidos desde grabar()
+        self.grabando = False
+        self.agotada = False         # el VideoCapture ya no entrega más frames
+        self.respaldos = {}          # idx -> (zona, píxeles originales de esa zona)
+
+    def _al_limite(self):
+        if self.max_frames is not None and self.pos >= self.max_frames:
+            self.agotada = True
+            return True
+        return False
+
+    def grab(self):
+        if self.pendientes or self.grabando:
+            ret, _ = self.read()
+            return ret
+        if self._al_limite() or not self.cap.grab():
+            self.agotada = True
+            return False
+        self.pos += 1
+        return True
+
+    def read(self):
+        if self.pendientes:
+            _, frame = self.pendientes.popleft()
+        else:
+            if self._al_limite():
+                return False, None
+            ret, frame = self.cap.read()
+            if not ret:
+                self.agotada = True
+                return False, None
+        if self.grabando:
+            self.historial.append((self.pos, frame))
+        self.pos += 1
+        return True, frame
+
+    def fin(self):
+        return self.agotada and not self.pendientes
+
+    def grabar(self):
+        self.grabando = True
+        self.historial = []
+        self.respaldos = {}
+
+    def respaldar(self, idx, frame, zona):
+        self.respaldos[idx] = (zona, frame[zona].copy())
+
+    def rebobinar(self, pos):
+        """Deja de grabar y devuelve al buffer (limpios) los frames grabados desde 'pos'."""
+        restantes = [(i, f) for i, f in self.historial if i >= pos]
+        for i, f in restantes:
+            if i in self.respaldos:
+                zona, pixeles = self.respaldos[i]
+                f[zona] = pixeles
+        self.pendientes.extendleft(reversed(restantes))
+        self.pos = pos
+        self.grabando = False
+        self.historial = []
+        self.respaldos = {}
+
+
+class _Reduccion:
+    """
+    Versión reducida de cada frame para el detector de cambios (gris 320x240 y,
+    con prefiltro, su miniatura) escrita en anillos de arrays preasignados, sin
+    arrays nuevos por frame. Un array se reutiliza recién 'buffers' frames después:
+    tiene que superar los que pueden seguir referenciados (prev_small de los estados
+    guardados del lote especulativo).
+    """
 
-    segmentos = []            # (inicio_segundos, fin_segundos, velocidad)
-    seg_inicio = 0.0
-    velocidad_actual = 2.5      # por defecto rápido (2.5x)
+    def __init__(self, buffers, mini=None):
+        self._color = np.empty((240, 320, 3), np.uint8)
+        self._grises = np.empty((buffers, 240, 320), np.uint8)
+        self._minis = np.empty((buffers, mini[1], mini[0]), np.uint8) if mini else None
+        self._i = 0
+
+    def reducir(self, frame):
+        gris = self._grises[self._i]
+        cv2.resize(frame, (320, 240), dst=self._color)
+        cv2.cvtColor(self._color, cv2.COLOR_BGR2GRAY, dst=gris)
+        mini = None
+        if self._minis is not None:
+            mini = self._minis[self._i]
+            cv2.resize(gris, (mini.shape[1], mini.shape[0]), dst=mini, interpolation=cv2.INTER_AREA)
+        self._i = (self._i + 1) % len(self._grises)
+        return gris, mini
+
+
+class _EstadoSeleccion:
+    """Estado del bucle que decide qué frames llegan a YOLO (salteo, SSIM y cola)."""
+
+    def __init__(self, calibrador, salto=1, reduccion=None):
+        self.abs_idx = 0                  # cuenta TODOS los frames consumidos (incluidos los saltados)
+        self.frame_count = 0
+        self.prev_small = None            # frame previo en gris a 320x240 (se reduce una sola vez)
+        self.prev_mini = None             # y su miniatura para el prefiltro
+        self.deteccion_activa = False
+        self.frames_despues_deteccion = 0
+        self.calibrador = calibrador      # umbral SSIM (fijo o calibrándose en esta pasada)
+        self.salto = salto                # distancia de salteo actual sin detección activa
+        self.frames_seguidos = 0          # frames seguidos con el tracker desde la última detección YOLO
+        self.reduccion = reduccion        # _Reduccion compartida por todas las copias del estado
+        self.prefiltro = {"igual": 0, "distinto": 0, "dudoso": 0}  # decisiones del prefiltro
+
+    def copia(self, deteccion_de=None):
+        """Copia independiente; con 'deteccion_de' toma de ese estado la parte de detección."""
+        c = _EstadoSeleccion(self.calibrador.copia())
+        c.__dict__.update({k: v for k, v in self.__dict__.items() if k != "calibrador"})
+        c.prefiltro = dict(self.prefiltro)
+        if deteccion_de is not None:
+            c.deteccion_activa = deteccion_de.deteccion_activa
+            c.frames_despues_deteccion = deteccion_de.frames_despues_deteccion
+            c.frames_seguidos = deteccion_de.frames_seguidos
+        return c
+
+    def registrar_deteccion(self, hay_deteccion, max_frames_despues_deteccion):
+        # Ventana de "cola" luego de una detección para no cortar abrupto
+        if hay_deteccion:
+            self.deteccion_activa = True
+            self.frames_despues_deteccion = 0
+        elif self.deteccion_activa:
+            self.frames_despues_deteccion += 1
+            if self.frames_despues_deteccion >= max_frames_despues_deteccion:
+                self.deteccion_activa = False
 
-    # ---- Reloj robusto: índice absoluto de frame del original
-    abs_idx = 0  # cuenta TODOS los frames consumidos (incluidos los saltados con grab)
 
+def _siguiente_candidato(estado, fuente, step, detector, perfil, limite=None, roi=False,
+                         salto_max=None, prefiltro=False):
+    """
+    Avanza la fuente igual que el bucle original hasta el próximo frame que
+    debe pasar por YOLO. Devuelve (frame, mascara) o (None, None) si se terminó
+    el video o si llegar al próximo frame pasaría de 'limite' (posición absoluta): un
+    salteo no se empieza si no entra entero, así se corta igual que sin límite.
+    Con roi=True, 'mascara' son las ventanas SSIM bajo el umbral (None si el frame
+    no pasó por SSIM y hay que inferirlo completo).
+    Con salto_max > step el salteo es adaptativo: cada comparación SSIM sin cambio
+    duplica el salto (hasta salto_max) y un cambio o una detección lo vuelven a 'step'.
+    Con prefiltro=True (y el umbral ya congelado) una diferencia sobre miniaturas
+    decide los casos claros; el SSIM corre solo en la franja dudosa.
+    """
     while True:
         # Salteo de frames cuando NO hay detección activa, para acelerar
-        if not deteccion_activa and step > 1:
-            for _ in range(step - 1):
-                if not cap.grab():
-                    break
-                abs_idx += 1  # avanzar el reloj por cada frame saltado
-
-        ret, frame = cap.read()
+        salto = estado.salto if salto_max else step
+        if estado.deteccion_activa:
+            salto = 1
+        if limite is not None and fuente.pos + salto > limite:
+            return None, None
+
+        with perfil.etapa("decodificacion"):
+            if salto > 1:
+                for _ in range(salto - 1):
+                    if not fuente.grab():
+                        break
+                    estado.abs_idx += 1  # avanzar el reloj por cada frame saltado
+
+            ret, frame = fuente.read()
         if not ret:
-            break
+            return None, None
 
-        abs_idx += 1  # consumimos 1 frame más
-        frame_count += 1
-
-        # Tiempo EXACTO del frame actual (0-based) sin depender de POS_MSEC
-        segundos = (abs_idx - 1) / fps
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        estado.abs_idx += 1  # consumimos 1 frame más
+        estado.frame_count += 1
 
         # ---------- SSIM por mapa (full=True) ----------
-        if not deteccion_activa:
-            if prev_gray is None:
-                prev_gray = gray
-            else:
-                prev_small = cv2.resize(prev_gray, (320, 240))
-                cur_small  = cv2.resize(gray,      (320, 240))
-                _score, sim_map = ssim(prev_small, cur_small, full=True)
+        with perfil.etapa("ssim"):
+            # Reducción una sola vez por frame; el previo queda guardado ya reducido
+            if estado.reduccion is None:
+                estado.reduccion = _Reduccion(128, PREFILTRO_TAMANIO if prefiltro else None)
+            cur_small, cur_mini = estado.reduccion.reducir(frame)
+            prev_small = estado.prev_small
+            hay_cambio = True
+            mascara = None
+            veredicto = None
+            if (prefiltro and not estado.deteccion_activa and prev_small is not None
+                    and estado.calibrador.congelado):
+                veredicto = clasificar_prefiltro(estado.prev_mini, cur_mini,
+                                                 PREFILTRO_IGUAL_MAX, PREFILTRO_DISTINTO_MAD)
+                estado.prefiltro[veredicto] += 1  # al perfil solo lo del estado confirmado
+                hay_cambio = veredicto != "igual"
+            if not estado.deteccion_activa and prev_small is not None and veredicto in (None, "dudoso"):
                 # Si TODAS las ventanas >= umbral => descartar; si alguna < umbral => conservar
-                if not (sim_map < umbral).any():
-                    prev_gray = gray
-                    continue
-
-        # ---------- YOLO detección ----------
-        frame = timestamp_frame(frame, segundos + offset)
-        hay_deteccion = False
+                if not estado.calibrador.congelado:
+                    # Calentando: hace falta el score medio, así que se arma el mapa completo
+                    score, sim_map = detector.mapa(prev_small, cur_small)
+                    umbral = estado.calibrador.agregar(score)
+                    mascara = sim_map < umbral
+                    hay_cambio = bool(mascara.any())
+                elif roi:
+                    # ROI: hace falta saber DÓNDE cambió, no alcanza con el corte temprano
+                    mascara = detector.mascara(prev_small, cur_small, estado.calibrador.umbral)
+                    hay_cambio = bool(mascara.any())
+                else:
+                    hay_cambio = detector.hay_cambio(prev_small, cur_small, estado.calibrador.umbral)
+            elif estado.deteccion_activa and prev_small is not None and not estado.calibrador.congelado:
+                # Con detección activa el frame va a YOLO igual, pero el calentamiento sigue
+                # muestreando: en un chunk con mucho movimiento no llegaría nunca a congelarse
+                score, _ = detector.mapa(prev_small, cur_small)
+                estado.calibrador.agregar(score)
+
+            # Planificador de salteo: crece exponencialmente en tramos estáticos
+            if salto_max:
+                if estado.deteccion_activa or hay_cambio:
+                    estado.salto = step
+                else:
+                    estado.salto = min(estado.salto * 2, salto_max)
+        estado.prev_small, estado.prev_mini = cur_small, cur_mini
+        if not hay_cambio:
+            continue
+
+        return frame, (mascara if roi else None)
+
+
+def _dibujar_cajas(cajas, perfil):
+    """Overlay de cajas para el encoder (corre en su hilo si el pipeline es con hilos)."""
+    if not cajas:
+        return None
+
+    def preparar(frame):
+        with perfil.etapa("overlay"):
+            dibujar_detecciones(frame, cajas)
+    return preparar
+
+
+def _escalar_cajas(cajas, fx, fy):
+    """Cajas (cls_id, x1, y1, x2, y2, conf) con las x multiplicadas por fx y las y por fy."""
+    return [(cls_id, round(x1 * fx), round(y1 * fy), round(x2 * fx), round(y2 * fy), conf)
+            for cls_id, x1, y1, x2, y2, conf in cajas]
+
+
+def _frame_de_salida(completos, idx, segundos, cajas, perfil):
+    """
+    Con proxy: el encoder pide el frame 'idx' a resolución original recién al
+    escribirlo (si la decimación lo descarta no se decodifica) y le dibuja
+    el tiempo y las cajas (ya en coordenadas originales).
+    """
+    def preparar(_):
+        with perfil.etapa("decodificacion_salida"):
+            frame = completos.frame(idx)
+        with perfil.etapa("overlay"):
+            frame = timestamp_frame(frame, segundos)
+            if cajas:
+                dibujar_detecciones(frame, cajas)
+        return frame
+    return preparar
+
+
+def _liberar(cap, out, completos):
+    """
+    Tras un error en procesar_video: corta el encoder (mata ffmpeg y su hilo), el
+    lector de frames originales y el lector/proxy, para que no queden hilos ni
+    procesos ffmpeg vivos en el worker.
+    """
+    for cerrar in (out and out.abortar, completos and completos.release, cap.release):
+        if not cerrar:
+            continue
         try:
-            results = yolo_model(frame, verbose=False)
-            for box in results[0].boxes:
-                cls_id = int(box.cls)
-                if target_classes is None or cls_id in target_classes:
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    label = yolo_model.names[cls_id]
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                    cv2.putText(frame, label, (x1, y1 - 5),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                    hay_deteccion = True
-        except Exception:
-            hay_deteccion = False
-
-        # Ajuste de velocidad deseada
-        nueva_vel = 1 if hay_deteccion else 2.5
-        if nueva_vel != velocidad_actual:
-            seg_fin = segundos
-            if seg_fin > seg_inicio:
-                segmentos.append((seg_inicio, seg_fin, velocidad_actual))
-            seg_inicio = segundos
-            velocidad_actual = nueva_vel
-
-        # Escribimos el frame al MP4 temporal (con overlays)
-        out.write(frame)
-        guardados += 1
-        prev_gray = gray
+            cerrar()
+        except Exception as e:
+            print(f"⚠️ Error liberando recursos: {e}")
 
-        # Ventana de "cola" luego de una detección para no cortar abrupto
-        if hay_deteccion:
-            deteccion_activa = True
-            frames_despues_deteccion = 0
-        elif deteccion_activa:
-            frames_despues_deteccion += 1
-            if frames_despues_deteccion >= max_frames_despues_deteccion:
-                deteccion_activa = False
-
-        if frame_count % 100 == 0:
-            print(f"➡️ Procesados {frame_count} frames, guardados {guardados}")
-
-    # Cierre de recursos
-    duracion_chunk = abs_idx / fps
-    cap.release()
-    out.release()
-
-    # Cerrar último segmento abierto
-    if duracion_chunk > seg_inicio:
-        segmentos.append((seg_inicio, duracion_chunk, velocidad_actual))
-
-    # ---------- Re-encode final con FFmpeg ----------
-    if not segmentos:
-        # Caso sin detecciones: todo a 2.5x
-        print("⚠️ Chunk sin detecciones → todo a x2.5")
-        cmd = [
-            "ffmpeg", "-y", "-i", str(temp_out),
-            "-filter:v", "setpts=0.4*PTS",           # 1 / 2.5 = 0.4
-            "-c:v", "libx264", "-preset", "fast", "-crf", "20",
-            "-pix_fmt", "yuv420p",
-            "-movflags", "+faststart",
-            "-an", str(output_path)
-        ]
-        subprocess.run(cmd, check=True)
-        temp_out.unlink(missing_ok=True)
-        return str(output_path), guardados
-
-    # Construcción de filter_complex para concatenar segmentos con velocidades
-    filtros = []
-    maps_v = ""
-    for i, (ini, fin, vel) in enumerate(segmentos):
-        filtros.append(
-            f"[0:v]trim=start={ini}:end={fin},setpts=PTS-STARTPTS[v{i}];\n"
-            f"[v{i}]setpts={1/vel}*PTS[v{i}f];\n"
-        )
-        maps_v += f"[v{i}f]"
 
-    if len(segmentos) > 1:
-        filtros.append(f"{maps_v}concat=n={len(segmentos)}:v=1:a=0[v];\n")
-        map_args = ["-map", "[v]"]
-    else:
-        map_args = ["-map", "[v0f]"]
-
-    filter_complex = "".join(filtros)
-
-    cwd = Path(output_path).parent
-    fname_in = Path(temp_out).name
-    fname_out = Path(output_path).name
-
-    # Guardamos el script de filtros para simplificar el llamado
-    script_path = cwd / (Path(fname_out).stem + ".fcs")
-    with open(script_path, "w", encoding="utf-8") as f:
-        f.write(filter_complex)
-
-    cmd = [
-        "ffmpeg", "-y", "-i", str(fname_in),
-        "-filter_complex_script", script_path.name,
-        *map_args,
-        "-c:v", "libx264", "-preset", "fast", "-crf", "20",
-        "-pix_fmt", "yuv420p",
-        "-movflags", "+faststart",
-        "-an", str(fname_out)
-    ]
-    subprocess.run(cmd, check=True, cwd=str(cwd))
-
-    # Limpieza
+def _inferir(funcion, *args):
+    """Llama a detectar_lote/detectar_lote_roi; si la inferencia falla devuelve None (lote fallido)."""
     try:
-        script_path.unlink(missing_ok=True)
-        temp_out.unlink(missing_ok=True)
-    except Exception:
-        pass
+        return funcion(*args)
+    except Exception as e:
+        print(f"⚠️ Falló la inferencia YOLO ({len(args[0])} frames): {e}")
+        return None
 
+
+def procesar_video(video_path, output_path, step=1, offset=0, target_classes=None,
+                   lote=None, max_espera=None, calibracion=None, motor_ssim=None, perfil=None,
+                   cache_detecciones=None, hilos=None, roi=None, salto_max=None, prefiltro=None,
+                   tracking=None, proxy=None, frames_max=None):
+    """
+    Procesa un video (o chunk):
+      - SSIM full=True: conserva frame si ALGUNA ventana < umbral (umbral dinámico).
+      - Umbral: calibracion="incremental" lo calcula (Welford) con los scores SSIM de las
+        primeras comparaciones del propio bucle y lo congela; "dos_pasadas" usa
+        calcular_ssim_promedio antes de empezar (decodifica parte del video otra vez).
+      - motor_ssim="rapido": SSIM con cv2.boxFilter en float32 y corte en la primera
+        ventana bajo el umbral; "skimage" usa structural_similarity como antes.
+      - YOLO por lotes: los frames que pasan el SSIM se juntan (hasta 'lote' frames o
+        'max_espera' frames leídos por adelantado) y se infieren juntos. El lote se arma
+        suponiendo que el estado de detección no cambia; si el resultado real lo cambia,
+        se rebobina al frame siguiente, así las decisiones son idénticas a cuadro a cuadro.
+        Los frames leídos por adelantado se acotan también en bytes (YOLO_LOTE_MAX_MB).
+      - YOLO: 1x si hay detección; 2.5x si no hay (ajustable).
+      - Overlay de tiempo ORIGINAL (abs_idx/fps + offset).
+      - Salida en una sola pasada: frames crudos por pipe a un único ffmpeg (libx264);
+        los tramos 2.5x se logran descartando frames (2 de cada 5), sin MP4 temporal.
+      - Sin deriva: reloj = abs_idx/fps. No usamos POS_MSEC.
+      - perfil: instrumentación (tiempos por etapa, contadores, eventos de progreso).
+        Si no se pasa, se crea uno y se guarda como JSON al lado de output_path.
+      - cache_detecciones: directorio con las detecciones por frame de corridas
+        anteriores del mismo video/modelo. Con caché YOLO infiere siempre todas las
+        clases (el filtro del NMS casi no ahorra frente al forward) y target_classes se
+        aplica después, así el caché sirve para cualquier subconjunto. Los frames que
+        ya están ahí no pasan por YOLO; los nuevos se agregan al terminar.
+      - Si la inferencia de un lote falla, sus frames siguen como "sin detección" pero
+        no se guardan en el caché y se cuentan en perfil.contadores["frames_fallidos"].
+      - Sin caché, target_classes va al NMS del modelo; los umbrales por clase
+        (YOLO_CONF_POR_CLASE) se aplican al filtrar, así el caché sirve para cualquier umbral.
+      - Índice de detecciones: las cajas filtradas (target_classes y umbrales por clase,
+        las mismas que se dibujan) se guardan en un sidecar columnar
+        (<salida>.detecciones.npz) con tiempo original y tiempo en el video de salida.
+        No depende de si vinieron del caché o de una inferencia nueva.
+      - hilos=True: pipeline productor/consumidor con colas acotadas (PIPELINE_COLA):
+        un hilo decodifica por adelantado, este hilo hace SSIM + YOLO, y otro hilo dibuja
+        las cajas y escribe al encoder en orden. Las decisiones son las mismas que en
+        serie; solo se solapan decodificación, inferencia y codificación.
+      - roi=True: si no hay detección activa, YOLO corre solo sobre los recortes donde
+        cambió la imagen (ventanas SSIM bajo el umbral, con padding y fusionadas) y las
+        cajas vuelven a coordenadas del frame. Si el cambio cubre más de
+        YOLO_ROI_MAX_AREA del frame (o no está localizado) se infiere el frame completo.
+      - salto_max > step: salteo adaptativo sin detección activa (ver _siguiente_candidato);
+        'step' pasa a ser el salto mínimo. Sin salto_max el salteo es fijo = step.
+        El reloj sigue siendo abs_idx (cuenta también los frames salteados).
+      - prefiltro=True: antes del SSIM se comparan miniaturas (PREFILTRO_TAMANIO). Si
+        ningún píxel cambió más de PREFILTRO_IGUAL_MAX el frame se descarta, si la
+        diferencia media supera PREFILTRO_DISTINTO_MAD se conserva; el resto va al SSIM.
+        Los contadores prefiltro_igual/distinto/dudoso dicen cuánto decidió cada nivel
+        (solo decisiones confirmadas: no cuentan las lecturas del lote que se rebobinaron).
+      - tracking=True: durante una detección activa YOLO corre 1 de cada
+        TRACKING_REDETECTAR_CADA frames y en el medio las cajas se siguen con flujo
+        óptico (SeguidorCajas). Con TRACKING_POLITICA="confianza" también se re-detecta
+        apenas el tracker pierde una caja o su confianza baja de TRACKING_CONFIANZA_MIN.
+      - proxy=True (video más ancho que ANALISIS_PROXY_ANCHO): SSIM, YOLO y tracking
+        trabajan sobre un stream reducido que ffmpeg escala al decodificar
+        (DecodificadorProxy, buffers preasignados). Del video original solo se decodifican
+        los frames que se escriben (FramesCompletos, desde el hilo del encoder, con seek
+        al keyframe previo cuando el salto cruza un GOP), con el tiempo y las cajas
+        dibujados ahí. Las cajas del caché y del índice quedan en coordenadas originales.
+      - frames_max: se procesan solo los primeros frames_max frames. Un chunk cortado con
+        -c copy trae paquetes del chunk siguiente; paralelo le pasa su cupo exacto.
+    """
+    perfil_propio = perfil is None
+    perfil = perfil or Perfil()
+    lote = max(1, lote or YOLO_LOTE_TAMANIO)
+    max_espera = max(1, max_espera or YOLO_LOTE_MAX_ESPERA)
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception(f"No se pudo abrir el video: {video_path}")
+
+    completos = None  # frames originales para la salida (solo con proxy)
+    out = None
+    try:
+        meta = metadatos(video_path)
+        fps = meta["fps"] or 24
+        w, h = meta["ancho"], meta["alto"]
+        total_frames = meta["frames"]
+        if frames_max is not None:
+            total_frames = min(total_frames, frames_max) if total_frames else frames_max
+
+        hilos = PIPELINE_HILOS if hilos is None else hilos
+        proxy = ANALISIS_PROXY if proxy is None else proxy
+        fx = fy = 1.0     # escala proxy -> original
+        pw, ph = w, h     # tamaño de los frames que analiza el bucle
+        if proxy and w > ANALISIS_PROXY_ANCHO:
+            pw = ANALISIS_PROXY_ANCHO
+            ph = max(2, round(h * pw / w / 2) * 2)
+        # La ventana especulativa guarda hasta max_espera frames decodificados (los leídos
+        # desde el primer candidato pendiente): se acota a YOLO_LOTE_MAX_MB (64 frames 4K
+        # serían ~1.6 GB por worker)
+        salto_lote = max(step, salto_max or 0)
+        en_presupuesto = YOLO_LOTE_MAX_MB * 2 ** 20 // (pw * ph * 3)
+        if en_presupuesto < max_espera:
+            max_espera = max(1, en_presupuesto)
+            print(f"🧮 Lote especulativo acotado a {max_espera} frames ({pw}x{ph}, {YOLO_LOTE_MAX_MB} MB)")
+        if (pw, ph) != (w, h):
+            fx, fy = w / pw, h / ph
+            keyframes = metadatos(video_path, keyframes=True)["keyframes"] or []
+            completos = FramesCompletos(cap, [round(t * fps) for t in keyframes])
+            # Frames del proxy que pueden estar en uso a la vez: cola del lector + lote
+            # especulativo (max_espera + un salto) + margen
+            buffers = (PIPELINE_COLA if hilos else 0) + max_espera + lote + salto_lote + 4
+            cap = DecodificadorProxy(video_path, pw, ph, buffers=buffers)
+            print(f"🔬 Análisis sobre proxy {pw}x{ph} (original {w}x{h})")
+        roi = YOLO_ROI if roi is None else roi
+        prefiltro = PREFILTRO if prefiltro is None else prefiltro
+        tracking = TRACKING if tracking is None else tracking
+        seguidor = SeguidorCajas() if tracking else None
+        if hilos:
+            cap = LectorEnHilo(cap, cola=PIPELINE_COLA)
+        out = CodificadorFFmpeg(output_path, w, h, fps, cola=PIPELINE_COLA if hilos else 0)
+
+        # Umbral dinámico según tu lógica
+        calibracion = calibracion or SSIM_CALIBRACION
+        if calibracion == "dos_pasadas":
+            with perfil.etapa("calibracion"):
+                promedio, desviacion = calcular_ssim_promedio(video_path, step=step)
+            calibrador = CalibradorSSIM.fijo(promedio, desviacion)
+            print(f"📊 SSIM promedio={promedio:.4f}, std={desviacion:.4f}, umbral={calibrador.umbral:.4f}")
+        elif calibracion == "incremental":
+            calibrador = CalibradorSSIM(muestras=SSIM_CALIBRACION_MUESTRAS)
+        else:
+            raise Exception(f"Modo de calibración SSIM desconocido: {calibracion}")
+
+        guardados = 0
+        max_frames_despues_deteccion = 20  # conserva algunos frames luego de la última detección
+
+        detector = crear_detector_cambios(motor_ssim or SSIM_MOTOR)
+
+        # ---- Reloj robusto: índice absoluto de frame del original (estado.abs_idx)
+        fuente = _FuenteFrames(cap, max_frames=frames_max)
+        salto_max = salto_max if salto_max and salto_max > step else None
+        # Estados del lote que guardan un prev_small: hasta max_espera frames + un salto + el lote
+        reduccion = _Reduccion(max_espera + lote + salto_lote + 4,
+                               PREFILTRO_TAMANIO if prefiltro else None)
+        estado = _EstadoSeleccion(calibrador, salto=step, reduccion=reduccion)
+        ya_inferidos = {}  # abs idx -> cajas, de lotes descartados al rebobinar
+
+        # Caché persistente por frame (un archivo por chunk/offset), siempre de todas las
+        # clases: con caché el modelo no filtra clases y target_classes se aplica al filtrar.
+        # Un archivo de un subconjunto de clases (corridas anteriores) sirve igual para leer.
+        cache_path = None
+        cache_propio = {}   # lo que se escribe en cache_path
+        cache_frames = {}   # todo lo que se puede reutilizar
+        clases_nms = target_classes
+        if cache_detecciones:
+            clases_nms = None
+            ancho_proxy = ANALISIS_PROXY_ANCHO if completos is not None else None
+            cache_path = archivo_detecciones(cache_detecciones, offset, roi=roi, proxy=ancho_proxy)
+            cache_propio = cargar_detecciones(cache_path)
+            if target_classes is not None:
+                cache_frames = cargar_detecciones(archivo_detecciones(cache_detecciones, offset, roi=roi,
+                                                                      clases=target_classes, proxy=ancho_proxy))
+            cache_frames.update(cache_propio)
+        if completos is not None:
+            cache_frames = {i: _escalar_cajas(c, 1 / fx, 1 / fy) for i, c in cache_frames.items()}
+        nuevos_en_cache = 0
+        registro = RegistroDetecciones(fps, offset)
+
+        def a_original(cajas):
+            """Cajas del análisis en coordenadas del frame original (para caché, índice y dibujo)."""
+            return _escalar_cajas(cajas, fx, fy) if completos is not None else cajas
+
+        while True:
+            # ---------- Armado especulativo del lote ----------
+            if ya_inferidos:
+                ya_inferidos = {i: c for i, c in ya_inferidos.items() if i >= estado.abs_idx}
+            spec = estado.copia()
+            items = []       # [idx, frame, cajas|None|_SEGUIR, estado previsto luego del frame, regiones|None]
+            sin_inferir = 0
+            limite = None
+            while sin_inferir < lote:
+                frame, mascara = _siguiente_candidato(spec, fuente, step, detector, perfil, limite, roi,
+                                                       salto_max, prefiltro)
+                if frame is None:
+                    break
+                idx = spec.abs_idx - 1
+                # Tiempo EXACTO del frame actual (0-based) sin depender de POS_MSEC
+                segundos = idx / fps
+                if completos is None:  # con proxy el tiempo se dibuja en el frame de salida
+                    with perfil.etapa("dibujo"):
+                        if fuente.grabando:
+                            # Por si se rebobina: se respalda solo la zona del texto, no el frame
+                            fuente.respaldar(idx, frame, zona_timestamp(frame))
+                        frame = timestamp_frame(frame, segundos + offset)
+
+                cajas = ya_inferidos.pop(idx, None)
+                if cajas is None:
+                    cajas = cache_frames.get(idx)
+                    perfil.contar("frames_desde_cache", cajas is not None)
+                regiones = None
+                if (cajas is None and tracking and spec.deteccion_activa
+                        and spec.frames_despues_deteccion == 0
+                        and spec.frames_seguidos < TRACKING_REDETECTAR_CADA - 1):
+                    # Hay objetos a la vista y YOLO corrió hace poco: este frame lo resuelve el tracker
+                    cajas = _SEGUIR
+                    hay_prevista = True
+                    spec.frames_seguidos += 1
+                elif cajas is None:
+                    spec.frames_seguidos = 0
+                    sin_inferir += 1
+                    hay_prevista = spec.deteccion_activa
+                    if mascara is not None:
+                        with perfil.etapa("roi"):
+                            regiones = regiones_cambio(mascara, frame.shape, padding=YOLO_ROI_PADDING,
+                                                       max_area=YOLO_ROI_MAX_AREA)
+                        perfil.contar("frames_roi", regiones is not None)
+                else:
+                    spec.frames_seguidos = 0
+                    hay_prevista = bool(filtrar_cajas(cajas, target_classes))
+                spec.registrar_deteccion(hay_prevista, max_frames_despues_deteccion)
+                items.append([idx, frame, cajas, spec.copia(), regiones])
+
+                if not fuente.grabando:
+                    fuente.grabar()
+                    limite = fuente.pos + max_espera
+
+            # ---------- YOLO detección (una llamada por lote) ----------
+            a_inferir = [it for it in items if it[2] is None]
+            if a_inferir:
+                with perfil.etapa("yolo"):
+                    resultados = _inferir(detectar_lote_roi, [it[1] for it in a_inferir],
+                                          [it[4] for it in a_inferir], clases_nms)
+                perfil.contar("lotes_yolo")
+                perfil.contar("frames_inferidos", len(a_inferir))
+                if resultados is None:
+                    # Sigue como "sin detección", pero no se cachea (la próxima corrida reintenta)
+                    perfil.contar("frames_fallidos", len(a_inferir))
+                    resultados = [[] for _ in a_inferir]
+                elif cache_path is not None:
+                    for it, cajas in zip(a_inferir, resultados):
+                        cache_propio[it[0]] = a_original(cajas)
+                        nuevos_en_cache += 1
+                for it, cajas in zip(a_inferir, resultados):
+                    it[2] = cajas
+
+            # ---------- Aplicación en orden con los resultados reales ----------
+            rebobinado = False
+            for n, (idx, frame, todas, previsto, _regiones) in enumerate(items):
+                segundos = idx / fps
+                if todas is _SEGUIR:
+                    with perfil.etapa("tracking"):
+                        todas = seguidor.actualizar(frame)
+                    if seguidor.necesita_redeteccion(TRACKING_POLITICA, TRACKING_CONFIANZA_MIN):
+                        # El tracker no alcanza: YOLO sobre este frame (fuera del lote)
+                        with perfil.etapa("yolo"):
+                            todas = _inferir(detectar_lote, [frame], clases_nms)
+                        perfil.contar("redetecciones_tracker")
+                        if todas is None:
+                            perfil.contar("frames_fallidos")
+                            todas = []
+                        else:
+                            todas = todas[0]
+                            if cache_path is not None:
+                                cache_propio[idx] = a_original(todas)
+                                nuevos_en_cache += 1
+                        seguidor.reiniciar(frame, filtrar_cajas(todas, target_classes))
+                        estado.frames_seguidos = 0
+                    else:
+                        perfil.contar("frames_seguidos")
+                        estado.frames_seguidos += 1
+                else:
+                    if seguidor is not None:
+                        with perfil.etapa("tracking"):
+                            seguidor.reiniciar(frame, filtrar_cajas(todas, target_classes))
+                    estado.frames_seguidos = 0
+                cajas = filtrar_cajas(todas, target_classes)
+                if cajas:
+                    registro.agregar(idx, a_original(cajas), out.escritos)
+                hay_deteccion = bool(cajas)
+
+                # Velocidad deseada: 1x con detección, 2.5x sin
+                nueva_vel = 1 if hay_deteccion else 2.5
+
+                # El frame va directo al encoder (las cajas se dibujan ahí, solo si no se
+                # descarta); la velocidad se aplica por decimación
+                with perfil.etapa("codificacion"):
+                    if completos is None:
+                        out.escribir(frame, velocidad=nueva_vel, preparar=_dibujar_cajas(cajas, perfil))
+                    else:
+                        out.escribir(None, velocidad=nueva_vel,
+                                     preparar=_frame_de_salida(completos, idx, segundos + offset,
+                                                               a_original(cajas), perfil))
+                guardados += 1
+                perfil.contar("frames_con_deteccion", hay_deteccion)
+                estado.registrar_deteccion(hay_deteccion, max_frames_despues_deteccion)
+
+                if previsto.frame_count % 100 == 0:
+                    print(f"➡️ Procesados {previsto.frame_count} frames, guardados {guardados}")
+
+                if estado.deteccion_activa != previsto.deteccion_activa:
+                    # La especulación falló: se retoma justo después de este frame
+                    for resto in items[n + 1:]:
+                        if resto[2] is not _SEGUIR:
+                            ya_inferidos[resto[0]] = resto[2]
+                    fuente.rebobinar(idx + 1)
+                    estado = previsto.copia(deteccion_de=estado)
+                    perfil.contar("rebobinados")
+                    rebobinado = True
+                    break
+
+            if total_frames:
+                perfil.avance(estado.abs_idx / total_frames)
+            if rebobinado:
+                continue
+
+            fuente.rebobinar(fuente.pos)
+            estado = spec.copia(deteccion_de=estado)
+            if fuente.fin():
+                break
+
+        if calibracion == "incremental":
+            cal = estado.calibrador
+            perfil.contar("ssim_muestras_calibracion", cal.n)
+            perfil.contar("ssim_sin_congelar", not cal.congelado)
+            print(f"📊 SSIM promedio={cal.media:.4f}, std={cal.desviacion:.4f}, umbral={cal.umbral:.4f} "
+                  f"({cal.n} muestras en el mismo bucle)")
+
+        if prefiltro:
+            # Del estado final: las lecturas especulativas que se rebobinaron no cuentan
+            for veredicto, n in estado.prefiltro.items():
+                perfil.contar(f"prefiltro_{veredicto}", n)
+            c = estado.prefiltro
+            print(f"🔎 Prefiltro: {c['igual']} iguales, {c['distinto']} distintos, {c['dudoso']} al SSIM")
+
+        # Cierre de recursos
+        cap.release()
+        with perfil.etapa("codificacion"):
+            out.cerrar()
+        if completos is not None:
+            completos.release()  # después del encoder: su hilo es el que lo lee
+    except BaseException:
+        _liberar(cap, out, completos)
+        raise
+    perfil.contar("frames_leidos", estado.abs_idx)
+    perfil.contar("frames_examinados", estado.frame_count)
+    perfil.contar("frames_guardados", guardados)
+    perfil.contar("frames_salida", out.escritos)
+    perfil.avance(1.0, forzar=True)
+    if nuevos_en_cache:
+        guardar_detecciones(cache_path, cache_propio)
+    registro.frames_salida = out.escritos
+    registro.guardar(output_path)
+
+    print(f"🎬 {guardados} frames conservados → {out.escritos} frames de salida "
+          f"({out.escritos / fps:.1f} s de {estado.abs_idx / fps:.1f} s)")
+
+    if perfil_propio:
+        perfil.guardar(output_path)
     return str(output_path), guardados
 
 
 def ejecutar_procesamiento(video_path, output_path, duracion_min,
-                           target_classes=None, forzar_todas=False):
+                           target_classes=None, forzar_todas=False, work_dir=".", perfil=None,
+                           cache_detecciones=None):
     """
     Wrapper compatible con app_streamlit.py y app_flask.py.
     - duracion_min: ya viene calculado por la UI; se usa solo para decidir paralelización.
     - forzar_todas: si True, se ignoran filtros y se detectan todas las clases YOLO.
+    - work_dir: directorio de temporales (chunks) propio del trabajo.
+    - perfil: Perfil de instrumentación del llamador (progreso/tiempos); si es None
+      cada camino crea el suyo y lo guarda junto al video de salida.
+    - cache_detecciones: directorio del caché de detecciones por frame (ver procesar_video).
+    - Salteo: con SALTO_ADAPTATIVO el planificador va de SALTO_MIN a SALTO_MAX según
+      la escena; si no, el salteo fijo de siempre (4 en videos largos, 2 en cortos).
+    - Videos de más de PARALELO_MIN_MINUTOS van en chunks paralelos, con cantidad de
+      workers y tamaño de chunk automáticos (ver paralelo.procesar_en_paralelo).
     """
     if forzar_todas:
         target_classes = list(YOLO_MAP.values())
 
-    if duracion_min > 10:
+    if SALTO_ADAPTATIVO:
+        salto = {"step": SALTO_MIN, "salto_max": SALTO_MAX}
+    else:
+        salto = {"step": 4 if duracion_min > PARALELO_MIN_MINUTOS else 2}
+
+    if duracion_min > PARALELO_MIN_MINUTOS:
         final, guardados = procesar_en_paralelo(
             procesar_video,
             video_path,
             output_path,
-            step=4,
-            chunk_minutes=10,
-            procesos=4,
-            target_classes=target_classes
+            work_dir=work_dir,
+            perfil=perfil,
+            target_classes=target_classes,
+            cache_detecciones=cache_detecciones,
+            **salto
         )
     else:
         final, guardados = procesar_video(
             video_path,
             output_path,
-            step=2,
-            target_classes=target_classes
+            target_classes=target_classes,
+            perfil=perfil,
+            cache_detecciones=cache_detecciones,
+            **salto
         )
 
     return final, guardados
@@ -0,0 +1,110 @@
+# seguimiento.py
+import cv2
+import numpy as np
+
+
+class SeguidorCajas:
+    """
+    Seguimiento liviano de las cajas de YOLO entre dos detecciones: flujo óptico
+    Lucas-Kanade sobre puntos de cada caja, en una versión reducida del frame.
+    Cada caja se desplaza por la mediana del movimiento de sus puntos; los puntos
+    que no pasan el chequeo ida y vuelta se descartan. La clase y la confianza de
+    YOLO se conservan, así las etiquetas no saltan entre frames.
+    'confianza' es la fracción de puntos sanos de la peor caja (0 si no hay cajas).
+    """
+
+    def __init__(self, ancho=640, max_puntos=30, error_max=1.0, min_puntos=4):
+        self.ancho = ancho
+        self.max_puntos = max_puntos
+        self.error_max = error_max
+        self.min_puntos = min_puntos
+        self.escala = 1.0
+        self.prev = None
+        self.cajas = []       # [(cls_id, x1, y1, x2, y2, conf)] en coordenadas del frame completo
+        self.puntos = []      # por caja: puntos (n, 1, 2) float32 en la escala reducida
+        self.confianza = 0.0
+        self.perdidas = 0     # cajas perdidas en la última actualización
+
+    def _gris(self, frame):
+        h, w = frame.shape[:2]
+        self.escala = min(1.0, self.ancho / w)
+        if self.escala < 1.0:
+            frame = cv2.resize(frame, (round(w * self.escala), round(h * self.escala)),
+                               interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    def _puntos(self, gris, caja):
+        x1, y1, x2, y2 = (int(v * self.escala) for v in caja[1:5])
+        if x2 - x1 < 2 or y2 - y1 < 2:
+            return None
+        mascara = np.zeros_like(gris)
+        mascara[y1:y2, x1:x2] = 255
+        pts = cv2.goodFeaturesToTrack(gris, self.max_puntos, 0.01, 3, mask=mascara)
+        if pts is None or len(pts) < self.min_puntos:
+            # Caja sin textura: grilla regular de puntos
+            xs, ys = np.meshgrid(np.linspace(x1, x2 - 1, 5), np.linspace(y1, y2 - 1, 5))
+            pts = np.stack([xs.ravel(), ys.ravel()], axis=1).reshape(-1, 1, 2)
+        return pts.astype(np.float32)
+
+    def reiniciar(self, frame, cajas):
+        """Arranca a seguir las cajas recién detectadas en 'frame'."""
+        self.cajas, self.puntos = [], []
+        self.perdidas = 0
+        if cajas:
+            gris = self._gris(frame)
+            for caja in cajas:
+                pts = self._puntos(gris, caja)
+                if pts is not None:
+                    self.cajas.append(caja)
+                    self.puntos.append(pts)
+            self.prev = gris
+        self.confianza = 1.0 if self.cajas else 0.0
+
+    def actualizar(self, frame):
+        """Mueve las cajas al frame nuevo y las devuelve (las perdidas se descartan)."""
+        if not self.cajas:
+            self.confianza = 0.0
+            return []
+        gris = self._gris(frame)
+        H, W = frame.shape[:2]
+        todos = np.concatenate(self.puntos)
+        sig, st, _ = cv2.calcOpticalFlowPyrLK(self.prev, gris, todos, None, winSize=(15, 15), maxLevel=2)
+        vuelta, st2, _ = cv2.calcOpticalFlowPyrLK(gris, self.prev, sig, None, winSize=(15, 15), maxLevel=2)
+        error = np.linalg.norm((todos - vuelta).reshape(-1, 2), axis=1)
+        sanos = (st.ravel() == 1) & (st2.ravel() == 1) & (error < self.error_max)
+
+        cajas, puntos, fracciones = [], [], []
+        i = 0
+        for caja, pts in zip(self.cajas, self.puntos):
+            n = len(pts)
+            sel = sanos[i:i + n]
+            nuevos = sig[i:i + n][sel]
+            dx, dy = (np.median((nuevos - pts[sel]).reshape(-1, 2), axis=0) / self.escala
+                      if sel.sum() else (0.0, 0.0))
+            i += n
+            fracciones.append(float(sel.mean()))
+            cls_id, x1, y1, x2, y2, conf = caja
+            x1, x2 = max(0, round(x1 + dx)), min(W, round(x2 + dx))
+            y1, y2 = max(0, round(y1 + dy)), min(H, round(y2 + dy))
+            if sel.sum() < self.min_puntos or x2 - x1 < 2 or y2 - y1 < 2:
+                continue  # caja perdida (sin puntos sanos o fuera de cuadro)
+            cajas.append((cls_id, x1, y1, x2, y2, conf))
+            puntos.append(nuevos.reshape(-1, 1, 2))
+
+        self.perdidas = len(self.cajas) - len(cajas)
+        self.confianza = min(fracciones) if cajas else 0.0
+        self.cajas, self.puntos, self.prev = cajas, puntos, gris
+        return list(cajas)
+
+    def necesita_redeteccion(self, politica, confianza_min):
+        """
+        "cada_n": solo si ya no queda nada que seguir (la cadencia la maneja el llamador).
+        "confianza": además, si se perdió alguna caja o la confianza bajó de confianza_min.
+        """
+        if not self.cajas:
+            return True
+        if politica == "cada_n":
+            return False
+        if politica == "confianza":
+            return self.perdidas > 0 or self.confianza < confianza_min
+        raise Exception(f"Política de re-detección desconocida: {politica}")
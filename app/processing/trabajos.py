@@ -0,0 +1,353 @@
+# trabajos.py
+import atexit
+import fcntl
+import json
+import os
+import shutil
+import signal
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+import uuid
+from contextlib import closing
+from multiprocessing import Process
+from pathlib import Path
+
+from app.config import (
+    PROCESSED_DIR,
+    TRABAJOS_DB,
+    TRABAJOS_DIR,
+    TRABAJOS_WORKERS,
+    TRABAJOS_POLL_SEG,
+)
+from app.processing.processing import ejecutar_procesamiento
+from app.utils.cache import (
+    buscar_resultado,
+    clave_resultado,
+    dir_detecciones,
+    hash_archivo,
+    registrar,
+    registrar_detecciones,
+)
+from app.utils.indice import ruta_indice
+from app.utils.instrumentacion import Perfil
+from app.utils.paralelo import cerrar_pool
+from app.utils.utils import asegurar_video_web, obtener_duracion_formato
+
+# Estados posibles de un trabajo
+PENDIENTE = "pendiente"
+PROCESANDO = "procesando"
+TERMINADO = "terminado"
+ERROR = "error"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id          TEXT PRIMARY KEY,
+    estado      TEXT NOT NULL,
+    video_path  TEXT NOT NULL,
+    params      TEXT NOT NULL,          -- JSON: target_classes
+    progreso    REAL NOT NULL DEFAULT 0,
+    mensaje     TEXT,
+    resultado   TEXT,                   -- path del video final (web)
+    worker_pid  INTEGER,
+    creado      REAL NOT NULL,
+    actualizado REAL NOT NULL
+)
+"""
+
+
+def _conectar():
+    conn = sqlite3.connect(str(TRABAJOS_DB), timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(_ESQUEMA)
+    return conn
+
+
+# ==============================================================================
+# API para la UI
+# ==============================================================================
+
+def encolar_trabajo(video_path, target_classes=None, video_hash=None):
+    """
+    Registra un trabajo pendiente y devuelve su id.
+    video_hash: SHA-256 del video si ya se conoce (p. ej. de la subida); si no, lo calcula el worker.
+    """
+    trabajo_id = uuid.uuid4().hex
+    ahora = time.time()
+    params = json.dumps({"target_classes": target_classes, "video_hash": video_hash})
+    with closing(_conectar()) as conn:
+        conn.execute(
+            "INSERT INTO trabajos (id, estado, video_path, params, mensaje, creado, actualizado) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (trabajo_id, PENDIENTE, str(video_path), params, "En cola", ahora, ahora)
+        )
+    return trabajo_id
+
+
+def obtener_trabajo(trabajo_id):
+    """Devuelve el trabajo como dict (o None si no existe)."""
+    with closing(_conectar()) as conn:
+        fila = conn.execute("SELECT * FROM trabajos WHERE id = ?", (trabajo_id,)).fetchone()
+    return dict(fila) if fila else None
+
+
+def posicion_en_cola(trabajo_id):
+    """Cantidad de trabajos pendientes encolados antes que este."""
+    with closing(_conectar()) as conn:
+        fila = conn.execute(
+            "SELECT COUNT(*) FROM trabajos WHERE estado = ? "
+            "AND creado < (SELECT creado FROM trabajos WHERE id = ?)",
+            (PENDIENTE, trabajo_id)
+        ).fetchone()
+    return fila[0]
+
+
+def actualizar_trabajo(trabajo_id, **campos):
+    campos["actualizado"] = time.time()
+    columnas = ", ".join(f"{k} = ?" for k in campos)
+    with closing(_conectar()) as conn:
+        conn.execute(f"UPDATE trabajos SET {columnas} WHERE id = ?", (*campos.values(), trabajo_id))
+
+
+# ==============================================================================
+# Workers
+# ==============================================================================
+
+def _tomar_siguiente(conn):
+    """Reserva atómicamente el trabajo pendiente más viejo para este proceso."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        fila = conn.execute(
+            "SELECT * FROM trabajos WHERE estado = ? ORDER BY creado LIMIT 1", (PENDIENTE,)
+        ).fetchone()
+        if fila:
+            conn.execute(
+                "UPDATE trabajos SET estado = ?, worker_pid = ?, mensaje = ?, actualizado = ? "
+                "WHERE id = ?",
+                (PROCESANDO, os.getpid(), "Procesando video", time.time(), fila["id"])
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return dict(fila) if fila else None
+
+
+def _formatear_eta(segundos):
+    if segundos is None:
+        return "calculando..."
+    minutos, seg = divmod(int(segundos), 60)
+    return f"{minutos:02d}:{seg:02d}"
+
+
+def _callback_progreso(trabajo_id, desde=0.05, hasta=0.9):
+    """Traduce los eventos de progreso del pipeline a la fila del trabajo (con ETA)."""
+    def callback(evento):
+        if evento["tipo"] != "progreso":
+            return
+        fraccion = evento["fraccion"]
+        actualizar_trabajo(
+            trabajo_id,
+            progreso=desde + (hasta - desde) * fraccion,
+            mensaje=f"Detectando objetos — {fraccion:.0%} (resta ~{_formatear_eta(evento['eta_seg'])})"
+        )
+    return callback
+
+
+def _ejecutar_trabajo(trabajo):
+    """
+    Procesa el video del trabajo y devuelve (path web final, mensaje final).
+    El perfil de tiempos queda como JSON al lado del video final.
+    El directorio de trabajo depende del contenido y los parámetros (no del id): si
+    el procesamiento se corta o falla, se conserva con su manifiesto de chunks y el
+    próximo trabajo con el mismo video retoma donde quedó. Se borra al terminar bien.
+    Un lock (archivo junto al directorio) evita que dos trabajos iguales lo usen a
+    la vez; el directorio y el archivo del lock se borran antes de soltarlo.
+    Si el mismo contenido ya se procesó con los mismos parámetros, devuelve el
+    resultado cacheado; las detecciones por frame ya cacheadas (de todas las clases o
+    del mismo conjunto de clases) no vuelven a pasar por YOLO.
+    """
+    trabajo_id = trabajo["id"]
+    params = json.loads(trabajo["params"])
+    video = Path(trabajo["video_path"])
+    perfil = Perfil(callback=_callback_progreso(trabajo_id))
+
+    actualizar_trabajo(trabajo_id, mensaje="Verificando caché")
+    video_hash = params.get("video_hash") or hash_archivo(video)
+    target_classes = params.get("target_classes")
+    clave = clave_resultado(video_hash, target_classes)
+    cacheado = buscar_resultado(clave)
+    if cacheado is not None:
+        print(f"♻️ Trabajo {trabajo_id[:8]}: resultado reutilizado de caché")
+        return cacheado, "Completado (desde caché)"
+
+    work_dir = TRABAJOS_DIR / clave[:16]
+    TRABAJOS_DIR.mkdir(parents=True, exist_ok=True)
+    # El lock vive al lado del directorio (no adentro): borrar el directorio no lo toca
+    lock_path = TRABAJOS_DIR / f"{clave[:16]}.lock"
+    lock = _tomar_lock(lock_path)  # espera si otro trabajo igual está corriendo
+    try:
+        cacheado = buscar_resultado(clave)
+        if cacheado is not None:
+            return cacheado, "Completado (desde caché)"
+        work_dir.mkdir(parents=True, exist_ok=True)
+        resultado = _procesar_en(work_dir, trabajo_id, video, video_hash, target_classes, clave, perfil)
+        shutil.rmtree(work_dir, ignore_errors=True)  # con el lock tomado
+        return resultado
+    finally:
+        lock_path.unlink(missing_ok=True)  # también con el lock tomado (ver _tomar_lock)
+        lock.close()
+
+
+def _tomar_lock(path):
+    """
+    Lock exclusivo (flock) sobre 'path', creándolo si no existe. El dueño borra el
+    archivo antes de soltarlo, así que quien esperaba puede quedar con el lock de un
+    archivo ya borrado: en ese caso se vuelve a abrir el path hasta que coincidan.
+    """
+    while True:
+        lock = open(path, "w")
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if os.stat(path).st_ino == os.fstat(lock.fileno()).st_ino:
+                return lock
+        except FileNotFoundError:
+            pass
+        lock.close()
+
+
+def _procesar_en(work_dir, trabajo_id, video, video_hash, target_classes, clave, perfil):
+    """Cuerpo de _ejecutar_trabajo (con el lock del directorio de trabajo tomado)."""
+    _, duracion_min = obtener_duracion_formato(str(video))
+    output_path = PROCESSED_DIR / f"procesado_{trabajo_id[:8]}_{video.name}"
+    actualizar_trabajo(trabajo_id, progreso=0.05, mensaje="Detectando objetos")
+
+    final_path_str, _ = ejecutar_procesamiento(
+        str(video),
+        str(output_path),
+        duracion_min=duracion_min,
+        target_classes=target_classes,
+        forzar_todas=False,
+        work_dir=str(work_dir),
+        perfil=perfil,
+        cache_detecciones=str(dir_detecciones(video_hash))
+    )
+    registrar_detecciones(video_hash)
+
+    actualizar_trabajo(trabajo_id, progreso=0.9, mensaje="Verificando el video para la web")
+    final_path = Path(final_path_str)
+    with perfil.etapa("web"):
+        # Normalmente ya es apto (mismo path); solo se re-codifica si no lo es
+        final_web_path = asegurar_video_web(final_path)
+    if final_web_path != final_path:
+        # 🧹 borrar el original para que no quede duplicado
+        if final_path.exists():
+            final_path.unlink()
+        if ruta_indice(final_path).exists():
+            ruta_indice(final_path).replace(ruta_indice(final_web_path))
+    perfil.guardar(final_web_path)
+    huecos = perfil.contadores["huecos"]
+    if huecos:
+        # Un video con huecos no se cachea: la próxima vez se vuelve a intentar
+        return final_web_path, f"Completado con {huecos} tramo(s) sin procesar"
+    fallidos = perfil.contadores["frames_fallidos"]
+    if fallidos:
+        # Tampoco uno con frames en los que YOLO falló (quedaron como "sin detección")
+        return final_web_path, f"Completado con {fallidos} frame(s) sin detección por errores de inferencia"
+    registrar(clave, final_web_path)
+    return final_web_path, "Completado"
+
+
+def _al_recibir_sigterm(*_):
+    """
+    SIGTERM (detener_servicio): corta el pool de detección sin esperar los chunks en
+    curso y sale. Tiene que ser explícito: este proceso es un hijo de multiprocessing,
+    que termina con os._exit y no corre los atexit.
+    """
+    cerrar_pool(terminar=True)
+    sys.exit(0)
+
+
+def _bucle_worker():
+    """Loop de un proceso worker: toma trabajos pendientes de a uno, para siempre."""
+    signal.signal(signal.SIGTERM, _al_recibir_sigterm)
+    conn = _conectar()
+    while True:
+        trabajo = _tomar_siguiente(conn)
+        if trabajo is None:
+            time.sleep(TRABAJOS_POLL_SEG)
+            continue
+        print(f"🛠️ Trabajo {trabajo['id'][:8]} tomado por worker {os.getpid()}")
+        try:
+            resultado, mensaje = _ejecutar_trabajo(trabajo)
+            actualizar_trabajo(trabajo["id"], estado=TERMINADO, progreso=1.0,
+                               mensaje=mensaje, resultado=str(resultado))
+        except Exception as e:
+            traceback.print_exc()
+            actualizar_trabajo(trabajo["id"], estado=ERROR, mensaje=str(e))
+
+
+def _pid_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _recuperar_huerfanos():
+    """Vuelve a la cola los trabajos que quedaron 'procesando' con un worker muerto."""
+    with closing(_conectar()) as conn:
+        filas = conn.execute(
+            "SELECT id, worker_pid FROM trabajos WHERE estado = ?", (PROCESANDO,)
+        ).fetchall()
+        for fila in filas:
+            if not fila["worker_pid"] or not _pid_vivo(fila["worker_pid"]):
+                conn.execute(
+                    "UPDATE trabajos SET estado = ?, progreso = 0, mensaje = ?, worker_pid = NULL, "
+                    "actualizado = ? WHERE id = ? AND estado = ?",
+                    (PENDIENTE, "Reencolado tras reinicio", time.time(), fila["id"], PROCESANDO)
+                )
+
+
+# ==============================================================================
+# Servicio (uno por proceso de la app)
+# ==============================================================================
+
+_workers = []
+_servicio_lock = threading.Lock()
+
+
+def iniciar_servicio(workers=None):
+    """
+    Arranca los procesos worker que atienden la cola (idempotente: se puede
+    llamar en cada rerun de Streamlit; solo repone los que falten).
+    """
+    n = workers or TRABAJOS_WORKERS
+    with _servicio_lock:
+        vivos = [p for p in _workers if p.is_alive()]
+        if len(vivos) < n:
+            _recuperar_huerfanos()
+            for _ in range(n - len(vivos)):
+                p = Process(target=_bucle_worker, name="trabajos-worker")
+                p.start()
+                vivos.append(p)
+        _workers[:] = vivos
+
+
+def detener_servicio():
+    """Termina los workers (el trabajo en curso vuelve a la cola en el próximo arranque)."""
+    with _servicio_lock:
+        for p in _workers:
+            p.terminate()
+        for p in _workers:
+            p.join(timeout=10)
+        _workers.clear()
+
+
+atexit.register(detener_servicio)
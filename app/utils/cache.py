@@ -0,0 +1,209 @@
+# utils/cache.py
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+
+from app.config import (
+    ANALISIS_PROXY,
+    ANALISIS_PROXY_ANCHO,
+    CACHE_DB,
+    CACHE_DETECCIONES_DIR,
+    CACHE_MAX_MB,
+    CACHE_VERSION,
+    CHUNK_MODO,
+    SSIM_CALIBRACION,
+    SSIM_CALIBRACION_MUESTRAS,
+    SSIM_MOTOR,
+    YOLO_ROI,
+    YOLO_ROI_PADDING,
+    YOLO_ROI_MAX_AREA,
+    SALTO_ADAPTATIVO,
+    SALTO_MIN,
+    SALTO_MAX,
+    PREFILTRO,
+    PREFILTRO_TAMANIO,
+    PREFILTRO_IGUAL_MAX,
+    PREFILTRO_DISTINTO_MAD,
+    TRACKING,
+    TRACKING_REDETECTAR_CADA,
+    TRACKING_POLITICA,
+    TRACKING_CONFIANZA_MIN,
+    YOLO_CONF_MIN,
+    YOLO_CONF_POR_CLASE,
+)
+from app.utils.indice import ruta_indice
+from app.utils.modelo import nombre_modelo
+from app.utils.instrumentacion import ruta_perfil
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    clave       TEXT PRIMARY KEY,
+    tipo        TEXT NOT NULL,      -- resultado | detecciones
+    path        TEXT NOT NULL,
+    bytes       INTEGER NOT NULL,
+    ultimo_uso  REAL NOT NULL
+)
+"""
+
+
+def hash_archivo(path, bloque=1 << 20):
+    """SHA-256 del contenido del archivo, leído de a bloques."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            datos = f.read(bloque)
+            if not datos:
+                break
+            h.update(datos)
+    return h.hexdigest()
+
+
+def parametros_pipeline():
+    """Configuración que cambia el video de salida (entra en la clave del caché)."""
+    return {
+        "version": CACHE_VERSION,
+        "modelo": nombre_modelo(),
+        "ssim_calibracion": SSIM_CALIBRACION,
+        "ssim_muestras": SSIM_CALIBRACION_MUESTRAS,
+        "ssim_motor": SSIM_MOTOR,
+        "chunk_modo": CHUNK_MODO,
+        "roi": [YOLO_ROI_PADDING, YOLO_ROI_MAX_AREA] if YOLO_ROI else None,
+        "salto": [SALTO_MIN, SALTO_MAX] if SALTO_ADAPTATIVO else "fijo",
+        "prefiltro": [list(PREFILTRO_TAMANIO), PREFILTRO_IGUAL_MAX, PREFILTRO_DISTINTO_MAD] if PREFILTRO else None,
+        "conf": [YOLO_CONF_MIN, YOLO_CONF_POR_CLASE],
+        "tracking": [TRACKING_REDETECTAR_CADA, TRACKING_POLITICA, TRACKING_CONFIANZA_MIN] if TRACKING else None,
+        "proxy": ANALISIS_PROXY_ANCHO if ANALISIS_PROXY else None,
+    }
+
+
+def clave_resultado(video_hash, target_classes=None, **params):
+    """Clave de un video procesado: hash del contenido + parámetros del pipeline."""
+    datos = {
+        "video": video_hash,
+        "clases": sorted(target_classes) if target_classes is not None else None,
+        **parametros_pipeline(),
+        **params,
+    }
+    return hashlib.sha256(json.dumps(datos, sort_keys=True).encode()).hexdigest()
+
+
+def dir_detecciones(video_hash):
+    """
+    Directorio del caché de detecciones por frame de un video (ver archivo_detecciones).
+    Depende solo del contenido y del modelo.
+    """
+    path = CACHE_DETECCIONES_DIR / video_hash / nombre_modelo()
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _conectar():
+    conn = sqlite3.connect(str(CACHE_DB), timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(_ESQUEMA)
+    return conn
+
+
+def _tamanio(path):
+    path = Path(path)
+    if path.is_file():
+        return path.stat().st_size
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+    return 0
+
+
+def _borrar(fila):
+    path = Path(fila["path"])
+    if fila["tipo"] == "detecciones":
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        path.unlink(missing_ok=True)
+        ruta_perfil(path).unlink(missing_ok=True)
+        ruta_indice(path).unlink(missing_ok=True)
+
+
+def _evictar(conn, max_bytes):
+    """Borra entradas de la menos usada recientemente hasta quedar bajo el tope."""
+    total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM cache").fetchone()[0]
+    if total <= max_bytes:
+        return
+    for fila in conn.execute("SELECT * FROM cache ORDER BY ultimo_uso").fetchall():
+        if total <= max_bytes:
+            break
+        _borrar(fila)
+        conn.execute("DELETE FROM cache WHERE clave = ?", (fila["clave"],))
+        total -= fila["bytes"]
+        print(f"🧹 Caché: eliminado {fila['tipo']} {Path(fila['path']).name} ({fila['bytes'] / 1e6:.1f} MB)")
+
+
+def buscar_resultado(clave):
+    """Path del video cacheado para la clave (y lo marca como usado), o None."""
+    with closing(_conectar()) as conn:
+        fila = conn.execute("SELECT * FROM cache WHERE clave = ?", (clave,)).fetchone()
+        if fila is None:
+            return None
+        if not Path(fila["path"]).exists():
+            conn.execute("DELETE FROM cache WHERE clave = ?", (clave,))
+            return None
+        conn.execute("UPDATE cache SET ultimo_uso = ? WHERE clave = ?", (time.time(), clave))
+        return Path(fila["path"])
+
+
+def registrar(clave, path, tipo="resultado", max_mb=None):
+    """Agrega (o actualiza) una entrada y aplica el tope de tamaño LRU."""
+    max_bytes = int((max_mb or CACHE_MAX_MB) * 1e6)
+    with closing(_conectar()) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (clave, tipo, path, bytes, ultimo_uso) VALUES (?, ?, ?, ?, ?)",
+            (clave, tipo, str(path), _tamanio(path), time.time())
+        )
+        _evictar(conn, max_bytes)
+
+
+def registrar_detecciones(video_hash):
+    """Registra/actualiza en el LRU el caché de detecciones por frame del video."""
+    registrar(f"det:{video_hash}:{nombre_modelo()}", dir_detecciones(video_hash), tipo="detecciones")
+
+
+def archivo_detecciones(directorio, offset, roi=False, clases=None, proxy=None):
+    """
+    Archivo de caché de un chunk. La clave incluye el offset (el overlay de tiempo
+    es parte de la imagen que ve YOLO) y la versión del formato de las cajas.
+    Las detecciones por ROI (solo en recortes) van aparte de las de frame completo,
+    y las de un subconjunto de clases (filtrado en el NMS) aparte de las de todas;
+    procesar_video con caché escribe solo las de todas las clases y lee las otras
+    (de corridas anteriores) si existen.
+    Las del análisis sobre proxy (ancho 'proxy', sin overlay) van aparte también;
+    las cajas se guardan siempre en coordenadas del frame original.
+    """
+    modo = "_roi" if roi else ""
+    if proxy:
+        modo += f"_p{proxy}"
+    if clases is not None:
+        firma = hashlib.sha1(",".join(map(str, sorted(clases))).encode()).hexdigest()[:10]
+        modo += f"_c{firma}"
+    return os.path.join(directorio, f"det_v2{modo}_{round(offset * 1000):010d}.json")
+
+
+def cargar_detecciones(path):
+    """Lee {frame_idx: [(cls, x1, y1, x2, y2, conf), ...]} de un archivo de caché (o {})."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        datos = json.load(f)
+    return {int(k): [tuple(c) for c in v] for k, v in datos.items()}
+
+
+def guardar_detecciones(path, detecciones):
+    """Escritura atómica (tmp + replace) para no dejar archivos a medias."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({str(k): v for k, v in detecciones.items()}, f, separators=(",", ":"))
+    os.replace(tmp, path)
@@ -0,0 +1,177 @@
+# utils/codificador.py
+import queue
+import struct
+import subprocess
+import threading
+from fractions import Fraction
+
+from app.config import VIDEO_PRESET, VIDEO_CRF, VIDEO_PERFIL, VIDEO_GOP_SEG, VIDEO_TIMESCALE
+from app.utils.metadatos import metadatos
+
+# Lo que tiene que coincidir entre dos videos para concatenarlos con -c copy (claves de metadatos)
+_CAMPOS_STREAM = ("codec", "perfil", "pix_fmt", "ancho", "alto", "r_frame_rate", "time_base")
+
+
+def tasa_fps(fps):
+    """fps como fracción exacta ("30000/1001"): el mismo valor en todos los chunks."""
+    f = Fraction(fps).limit_denominator(1001)
+    return f"{f.numerator}/{f.denominator}"
+
+
+def parametros_salida(fps):
+    """
+    Parámetros de libx264/MP4 de todo video que genera el pipeline. Perfil, pix_fmt,
+    GOP fijo, fps racional y timescale son los mismos en cada chunk, así que su
+    concatenación con -c copy es un MP4 válido y compatible con navegadores.
+    """
+    tasa = tasa_fps(fps)
+    gop = max(1, round(float(Fraction(tasa)) * VIDEO_GOP_SEG))
+    return [
+        "-c:v", "libx264", "-preset", VIDEO_PRESET, "-crf", str(VIDEO_CRF),
+        "-profile:v", VIDEO_PERFIL, "-pix_fmt", "yuv420p",
+        "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0",
+        "-r", tasa, "-video_track_timescale", str(VIDEO_TIMESCALE),
+        "-movflags", "+faststart",
+    ]
+
+
+def propiedades_video(path):
+    """Códec, perfil, pix_fmt, tamaño, fps y time_base del stream de video (ver metadatos)."""
+    meta = metadatos(path)
+    return {campo: meta[campo] for campo in _CAMPOS_STREAM}
+
+
+def es_faststart(path):
+    """True si el MP4 tiene el 'moov' antes del 'mdat' (se reproduce sin bajarlo entero)."""
+    with open(path, "rb") as f:
+        while True:
+            cabecera = f.read(8)
+            if len(cabecera) < 8:
+                return False
+            tam, tipo = struct.unpack(">I4s", cabecera)
+            if tipo == b"moov":
+                return True
+            if tipo == b"mdat":
+                return False
+            if tam == 1:  # tamaño de 64 bits
+                tam = struct.unpack(">Q", f.read(8))[0] - 8
+            elif tam == 0:  # la caja llega hasta el final
+                return False
+            f.seek(tam - 8, 1)
+
+
+def es_video_web(path):
+    """H.264 8 bits 4:2:0 con faststart: se sirve tal cual, sin re-codificar."""
+    props = propiedades_video(path)
+    return (props["codec"] == "h264" and props["pix_fmt"] == "yuv420p"
+            and props["perfil"] in ("Constrained Baseline", "Baseline", "Main", "High")
+            and es_faststart(path))
+
+
+class CodificadorFFmpeg:
+    """
+    Salida en un solo paso: los frames BGR crudos van por un pipe a UN proceso
+    ffmpeg (libx264, parametros_salida) que vive todo el video. Sin MP4 temporal
+    ni segunda pasada: el resultado ya es apto para la web.
+    La velocidad de cada frame se resuelve por decimación a fps constantes:
+    a velocidad v cada frame aporta 1/v frames de salida (1x = todos, 2.5x = 2 de cada 5).
+    Con cola > 0 la escritura al pipe (y el 'preparar' de cada frame) corre en un hilo
+    propio con una cola acotada: el llamador solo se bloquea si el encoder se atrasa.
+    El orden de salida es el de llamada y 'escritos' se actualiza en el momento.
+    """
+
+    def __init__(self, output_path, w, h, fps, cola=0):
+        cmd = [
+            "ffmpeg", "-y", "-loglevel", "error", "-nostats",
+            "-f", "rawvideo", "-pix_fmt", "bgr24",
+            "-s", f"{w}x{h}", "-framerate", tasa_fps(fps),
+            "-i", "-",
+            *parametros_salida(fps),
+            "-an", str(output_path)
+        ]
+        try:
+            self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE,
+                                         stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except FileNotFoundError:
+            raise Exception("Comando 'ffmpeg' no encontrado. Asegúrate de que FFmpeg esté instalado y en el PATH del sistema.")
+        self.escritos = 0
+        self._acum = 0.999  # así el primer frame sale siempre, a cualquier velocidad
+        self._cola = None
+        self._error = None
+        if cola:
+            self._cola = queue.Queue(maxsize=cola)
+            self._hilo = threading.Thread(target=self._bucle_escritura, name="codificador", daemon=True)
+            self._hilo.start()
+
+    def escribir(self, frame, velocidad=1, preparar=None):
+        """
+        preparar(frame): se aplica justo antes de escribir (p. ej. dibujar cajas).
+        No se llama si la decimación descarta el frame. Si devuelve un frame, se
+        escribe ese (así 'frame' puede ser None y preparar obtenerlo recién ahí).
+        """
+        self._acum += 1 / velocidad
+        n = int(self._acum)
+        if n == 0:
+            return
+        self._acum -= n
+        self.escritos += n
+        if self._cola is None:
+            try:
+                self._escribir(frame, n, preparar)
+            except BrokenPipeError:
+                self.cerrar()  # levanta la excepción con el stderr de ffmpeg
+                raise
+            return
+        if self._error is not None:
+            self.cerrar()
+        self._cola.put((frame, n, preparar))
+
+    def _escribir(self, frame, n, preparar):
+        if preparar is not None:
+            nuevo = preparar(frame)
+            if nuevo is not None:
+                frame = nuevo
+        for _ in range(n):
+            self.proc.stdin.write(frame.data)
+
+    def _bucle_escritura(self):
+        while True:
+            item = self._cola.get()
+            if item is None:
+                return
+            if self._error is not None:
+                continue  # ya falló: se vacía la cola para no bloquear al productor
+            try:
+                self._escribir(*item)
+            except Exception as e:
+                self._error = e
+
+    def abortar(self):
+        """Corta la codificación tras un error: mata ffmpeg y termina el hilo sin escribir lo que queda en la cola."""
+        if self.proc.poll() is None:
+            self.proc.kill()
+        if self._cola is not None and self._hilo.is_alive():
+            self._error = self._error or Exception("Codificación abortada")
+            self._cola.put(None)
+            self._hilo.join()
+        for f in (self.proc.stdin, self.proc.stderr):
+            try:
+                f.close()
+            except OSError:
+                pass  # BrokenPipeError al vaciar el buffer de stdin
+        self.proc.wait()
+
+    def cerrar(self):
+        if self._cola is not None and self._hilo.is_alive():
+            self._cola.put(None)
+            self._hilo.join()
+        if self.proc.stdin and not self.proc.stdin.closed:
+            try:
+                self.proc.stdin.close()
+            except BrokenPipeError:
+                pass
+        err = self.proc.stderr.read().decode(errors="replace")
+        if self.proc.wait() != 0:
+            raise Exception(f"Error durante la codificación con FFmpeg: {err}")
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,149 @@
+# utils/indice.py
+import json
+from pathlib import Path
+
+import numpy as np
+
+
+def ruta_indice(video_path):
+    """Path del índice de detecciones (sidecar .npz) que acompaña a un video de salida."""
+    return Path(video_path).with_suffix(".detecciones.npz")
+
+
+class RegistroDetecciones:
+    """
+    Junta las detecciones de un video/chunk mientras se procesa y las guarda
+    como arrays columnares (un registro por caja):
+      frame         índice de frame en el video ORIGINAL
+      tiempo        segundo en el video original (el mismo del overlay)
+      tiempo_salida segundo en el video procesado (para saltar con el reproductor)
+      clase, conf, caja (x1, y1, x2, y2)
+    """
+
+    def __init__(self, fps, offset=0):
+        self.fps = fps
+        self.offset = offset
+        self.frame_base = round(offset * fps)
+        self.filas = []
+        self.frames_salida = 0
+
+    def agregar(self, idx, cajas, frame_salida):
+        for cls_id, x1, y1, x2, y2, conf in cajas:
+            self.filas.append((self.frame_base + idx, idx / self.fps + self.offset,
+                               frame_salida / self.fps, cls_id, conf, x1, y1, x2, y2))
+
+    def guardar(self, video_path):
+        filas = self.filas
+        cols = list(zip(*filas)) if filas else [()] * 9
+        _guardar(ruta_indice(video_path), {
+            "frame": np.array(cols[0], np.int64),
+            "tiempo": np.array(cols[1], np.float64),
+            "tiempo_salida": np.array(cols[2], np.float64),
+            "clase": np.array(cols[3], np.int16),
+            "conf": np.array(cols[4], np.float32),
+            "caja": np.array(cols[5:9], np.int32).T.reshape(-1, 4),
+        }, {"fps": self.fps, "duracion_salida": self.frames_salida / self.fps})
+
+
+def _guardar(path, columnas, meta):
+    """Ordena por tiempo, arma el índice por clase y escribe el .npz comprimido."""
+    orden = np.argsort(columnas["tiempo"], kind="stable")
+    columnas = {k: v[orden] for k, v in columnas.items()}
+    # Índice por clase: permutación ordenada por (clase, tiempo)
+    columnas["orden_clase"] = np.lexsort((columnas["tiempo"], columnas["clase"])).astype(np.int64)
+    np.savez_compressed(path, meta=np.array(json.dumps(meta)), **columnas)
+    return path
+
+
+def unir_indices(videos, destino):
+    """
+    Une los índices de los chunks (en el orden de concatenación) en el del video
+    final. tiempo_salida se corre por la duración de salida de los chunks previos.
+    Los chunks sin índice se toman como vacíos.
+    """
+    partes, corrimiento, fps = [], 0.0, None
+    for video in videos:
+        path = ruta_indice(video)
+        if not path.exists():
+            continue
+        with np.load(path) as datos:
+            meta = json.loads(str(datos["meta"]))
+            parte = {k: datos[k] for k in ("frame", "tiempo", "tiempo_salida", "clase", "conf", "caja")}
+        parte["tiempo_salida"] = parte["tiempo_salida"] + corrimiento
+        corrimiento += meta["duracion_salida"]
+        fps = fps or meta["fps"]
+        partes.append(parte)
+    if not partes:
+        return None
+    columnas = {k: np.concatenate([p[k] for p in partes]) for k in partes[0]}
+    return _guardar(ruta_indice(destino), columnas, {"fps": fps, "duracion_salida": corrimiento})
+
+
+class IndiceDetecciones:
+    """Consultas por rango de tiempo y clase en O(log n + k) sin tocar el video."""
+
+    def __init__(self, columnas, meta):
+        self.c = columnas
+        self.meta = meta
+        self._clase_ordenada = columnas["clase"][columnas["orden_clase"]]
+        self._tiempo_por_clase = columnas["tiempo"][columnas["orden_clase"]]
+
+    @classmethod
+    def cargar(cls, video_path):
+        """Carga el índice de un video procesado, o None si no tiene."""
+        path = ruta_indice(video_path)
+        if not path.exists():
+            return None
+        with np.load(path) as datos:
+            meta = json.loads(str(datos["meta"]))
+            columnas = {k: datos[k] for k in datos.files if k != "meta"}
+        return cls(columnas, meta)
+
+    def __len__(self):
+        return len(self.c["tiempo"])
+
+    def clases(self):
+        """{cls_id: cantidad de detecciones}"""
+        ids, cantidades = np.unique(self.c["clase"], return_counts=True)
+        return dict(zip(ids.tolist(), cantidades.tolist()))
+
+    def _posiciones(self, t0, t1, clase=None):
+        """Posiciones (en el orden por tiempo) con t0 <= tiempo <= t1."""
+        if clase is None:
+            i = np.searchsorted(self.c["tiempo"], t0, side="left")
+            j = np.searchsorted(self.c["tiempo"], t1, side="right")
+            return np.arange(i, j)
+        a = np.searchsorted(self._clase_ordenada, clase, side="left")
+        b = np.searchsorted(self._clase_ordenada, clase, side="right")
+        tiempos = self._tiempo_por_clase[a:b]
+        i = a + np.searchsorted(tiempos, t0, side="left")
+        j = a + np.searchsorted(tiempos, t1, side="right")
+        return self.c["orden_clase"][i:j]
+
+    def buscar(self, t0=0.0, t1=float("inf"), clases=None):
+        """
+        Detecciones entre t0 y t1 (segundos del video original) de las clases
+        pedidas (None = todas). Devuelve un dict de arrays ordenado por tiempo.
+        """
+        if clases is None:
+            pos = self._posiciones(t0, t1)
+        else:
+            pos = np.concatenate([self._posiciones(t0, t1, c) for c in clases] or [np.array([], np.int64)])
+            pos = np.sort(pos)
+        return {k: v[pos] for k, v in self.c.items() if k != "orden_clase"}
+
+    def eventos(self, t0=0.0, t1=float("inf"), clases=None, separacion=2.0):
+        """
+        Agrupa las detecciones en eventos (huecos > 'separacion' seg cortan el evento).
+        Devuelve [(inicio, fin, inicio_salida, {cls_id: cantidad})].
+        """
+        r = self.buscar(t0, t1, clases)
+        eventos = []
+        for t, ts, c in zip(r["tiempo"].tolist(), r["tiempo_salida"].tolist(), r["clase"].tolist()):
+            if eventos and t - eventos[-1][1] <= separacion:
+                ev = eventos[-1]
+                ev[1] = t
+                ev[3][c] = ev[3].get(c, 0) + 1
+            else:
+                eventos.append([t, t, ts, {c: 1}])
+        return [tuple(ev) for ev in eventos]
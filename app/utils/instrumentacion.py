@@ -0,0 +1,79 @@
+# utils/instrumentacion.py
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def ruta_perfil(video_path):
+    """Path del JSON de perfil que acompaña a un video de salida."""
+    return Path(video_path).with_suffix(".perfil.json")
+
+
+class Perfil:
+    """
+    Instrumentación del pipeline: tiempos acumulados por etapa, contadores y
+    estadísticas por chunk. Los eventos ({"tipo": "progreso" | "chunk" | ..., ...})
+    se entregan a 'callback'; los de progreso se limitan a uno cada 'intervalo' seg.
+    """
+
+    def __init__(self, callback=None, intervalo=1.0):
+        self.callback = callback
+        self.intervalo = intervalo
+        self.inicio = time.perf_counter()
+        self.tiempos = defaultdict(float)
+        self.contadores = defaultdict(int)
+        self.chunks = []
+        self._ultimo_progreso = 0.0
+
+    @contextmanager
+    def etapa(self, nombre):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.tiempos[nombre] += time.perf_counter() - t0
+
+    def contar(self, nombre, n=1):
+        self.contadores[nombre] += n
+
+    def emitir(self, tipo, **datos):
+        if self.callback is not None:
+            self.callback({"tipo": tipo, **datos})
+
+    def avance(self, fraccion, forzar=False):
+        """Emite un evento de progreso con ETA (estimada por ritmo medio)."""
+        ahora = time.perf_counter()
+        if not forzar and ahora - self._ultimo_progreso < self.intervalo:
+            return
+        self._ultimo_progreso = ahora
+        fraccion = min(max(fraccion, 0.0), 1.0)
+        transcurrido = ahora - self.inicio
+        eta = transcurrido * (1 - fraccion) / fraccion if fraccion > 0 else None
+        self.emitir("progreso", fraccion=fraccion, transcurrido_seg=transcurrido,
+                    eta_seg=eta, contadores=dict(self.contadores))
+
+    def agregar_chunk(self, idx, datos):
+        """Suma al total las etapas/contadores de un chunk procesado en otro proceso."""
+        for nombre, seg in datos.get("etapas", {}).items():
+            self.tiempos[f"chunk.{nombre}"] += seg
+        for nombre, n in datos.get("contadores", {}).items():
+            self.contadores[nombre] += n
+        self.chunks.append({"idx": idx, **datos})
+        self.emitir("chunk", idx=idx, **datos)
+
+    def a_dict(self):
+        return {
+            "total_seg": time.perf_counter() - self.inicio,
+            "etapas": dict(self.tiempos),
+            "contadores": dict(self.contadores),
+            "chunks": sorted(self.chunks, key=lambda c: c["idx"]),
+        }
+
+    def guardar(self, video_path):
+        """Escribe el perfil como JSON al lado del video y devuelve el path."""
+        path = ruta_perfil(video_path)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.a_dict(), f, indent=2, ensure_ascii=False)
+        return path
@@ -0,0 +1,167 @@
+# utils/lector.py
+import queue
+import subprocess
+import tempfile
+import threading
+from bisect import bisect_right
+
+import cv2
+import numpy as np
+
+
+class LectorEnHilo:
+    """
+    Decodificación en un hilo aparte: lee el cv2.VideoCapture por adelantado y deja
+    los frames en una cola acotada ('cola' frames como máximo, así la memoria no
+    crece si el consumidor es más lento). Expone read/grab/release como VideoCapture.
+    OpenCV libera el GIL al decodificar, así que se solapa con SSIM/YOLO/encoder.
+    grab() también decodifica (el hilo no sabe de antemano qué frames se saltean).
+    """
+
+    _FIN = object()
+
+    def __init__(self, cap, cola=16):
+        self.cap = cap
+        self._cola = queue.Queue(maxsize=max(1, cola))
+        self._parar = threading.Event()
+        self._terminado = False
+        self._error = None
+        self._hilo = threading.Thread(target=self._bucle, name="decodificador", daemon=True)
+        self._hilo.start()
+
+    def _bucle(self):
+        try:
+            while not self._parar.is_set():
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+                self._poner(frame)
+        except Exception as e:
+            self._error = e
+        finally:
+            self._poner(self._FIN)
+
+    def _poner(self, item):
+        # put con timeout para poder cortar si release() pide parar con la cola llena
+        while not self._parar.is_set():
+            try:
+                self._cola.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def read(self):
+        if self._terminado:
+            return False, None
+        item = self._cola.get()
+        if item is self._FIN:
+            self._terminado = True
+            if self._error is not None:
+                raise self._error
+            return False, None
+        return True, item
+
+    def grab(self):
+        ret, _ = self.read()
+        return ret
+
+    def release(self):
+        self._parar.set()
+        self._hilo.join()
+        self.cap.release()
+
+
+class DecodificadorProxy:
+    """
+    Versión reducida del video para el análisis (SSIM, YOLO, tracking): ffmpeg
+    decodifica y escala (filtro scale) y entrega BGR crudo por un pipe, que se lee
+    directo (readinto) en un anillo de 'buffers' arrays NumPy preasignados. Sin
+    conversión de color ni arrays nuevos por frame en Python.
+    Expone read/grab/release como cv2.VideoCapture. Un frame entregado es válido
+    hasta 'buffers' lecturas después: luego su array se reutiliza.
+    El stderr de ffmpeg va a un archivo temporal (un pipe sin leer se llenaría con un
+    stream dañado y ffmpeg quedaría bloqueado); si ffmpeg termina con error, read()
+    lanza una excepción con ese texto en lugar de tomarlo como fin del video.
+    """
+
+    def __init__(self, path, ancho, alto, buffers=64):
+        cmd = [
+            "ffmpeg", "-loglevel", "error", "-nostdin",
+            "-i", str(path), "-map", "0:v:0", "-an", "-sn",
+            "-vf", f"scale={ancho}:{alto}:flags=bilinear",
+            "-fps_mode", "passthrough",  # un frame de salida por frame decodificado (como cv2)
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-"
+        ]
+        self._stderr = tempfile.TemporaryFile()
+        try:
+            self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=self._stderr,
+                                         bufsize=ancho * alto * 3)
+        except FileNotFoundError:
+            self._stderr.close()
+            raise Exception("Comando 'ffmpeg' no encontrado. Asegúrate de que FFmpeg esté instalado y en el PATH del sistema.")
+        self._anillo = np.empty((max(2, buffers), alto, ancho, 3), np.uint8)
+        self._siguiente = 0
+
+    def read(self):
+        frame = self._anillo[self._siguiente]
+        vista = memoryview(frame).cast("B")
+        leidos = 0
+        while leidos < len(vista):
+            n = self.proc.stdout.readinto(vista[leidos:])
+            if not n:
+                self._verificar_salida()
+                return False, None  # fin del video (un frame incompleto se descarta)
+            leidos += n
+        self._siguiente = (self._siguiente + 1) % len(self._anillo)
+        return True, frame
+
+    def _verificar_salida(self):
+        codigo = self.proc.wait()
+        if codigo != 0:
+            self._stderr.seek(0)
+            texto = self._stderr.read().decode(errors="replace").strip()
+            raise Exception(f"ffmpeg falló al decodificar el proxy (código {codigo}): {texto[-2000:]}")
+
+    def grab(self):
+        ret, _ = self.read()
+        return ret
+
+    def release(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.stdout.close()
+        self.proc.wait()
+        self._stderr.close()
+
+
+class FramesCompletos:
+    """
+    Frames a resolución original pedidos por índice absoluto, en orden creciente
+    (los que van a la salida). grab() también decodifica, así que si entre la
+    posición actual y el frame pedido hay un keyframe (índices en 'keyframes') se
+    hace seek y solo se decodifica desde ese keyframe; si no, los del medio se
+    avanzan con grab(), sin la conversión de color ni la copia de retrieve().
+    """
+
+    def __init__(self, cap, keyframes=None):
+        self.cap = cap
+        self.pos = 0   # índice del próximo frame que entrega el VideoCapture
+        self.keyframes = sorted(keyframes or [])
+
+    def frame(self, idx):
+        if idx < self.pos:
+            raise Exception(f"Frame {idx} ya consumido (posición actual {self.pos})")
+        i = bisect_right(self.keyframes, idx)
+        if i and self.keyframes[i - 1] > self.pos and self.cap.set(cv2.CAP_PROP_POS_FRAMES, idx):
+            self.pos = idx  # cv2 decodifica desde el keyframe anterior hasta idx
+        while self.pos <= idx:
+            if not self.cap.grab():
+                raise Exception(f"El video terminó antes del frame {idx}")
+            self.pos += 1
+        ret, frame = self.cap.retrieve()
+        if not ret:
+            raise Exception(f"No se pudo decodificar el frame {idx}")
+        return frame
+
+    def release(self):
+        self.cap.release()
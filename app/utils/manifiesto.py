@@ -0,0 +1,87 @@
+# utils/manifiesto.py
+import hashlib
+import json
+import os
+import time
+
+# Estados de un chunk en el manifiesto
+PENDIENTE = "pendiente"
+OK = "ok"
+FALLIDO = "fallido"
+
+
+def firma_entrada(input_path, **params):
+    """
+    Identifica el trabajo de un manifiesto: el video (path, tamaño, mtime) y los
+    parámetros de procesamiento. Si cambia algo, el manifiesto viejo no se reutiliza.
+    """
+    st = os.stat(input_path)
+    datos = {"video": os.path.abspath(input_path), "bytes": st.st_size, "mtime": st.st_mtime, **params}
+    return hashlib.sha256(json.dumps(datos, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class ManifiestoChunks:
+    """
+    Estado persistente (JSON en el work_dir) del procesamiento por chunks:
+    por chunk, su path y offset, estado, intentos, último error, salida y hash de
+    la salida. Se reescribe de forma atómica tras cada cambio, así un trabajo
+    interrumpido retoma procesando solo lo que falta.
+    """
+
+    def __init__(self, path, firma, chunks=None):
+        self.path = path
+        self.firma = firma
+        self.chunks = chunks or []
+
+    @classmethod
+    def cargar(cls, path, firma):
+        """Manifiesto existente para esta firma, o None (no existe, corrupto u otra firma)."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                datos = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if datos.get("firma") != firma:
+            return None
+        return cls(path, firma, datos["chunks"])
+
+    @classmethod
+    def nuevo(cls, path, firma, chunks):
+        """Manifiesto para los chunks recién cortados [(path, offset)], todos pendientes."""
+        m = cls(path, firma, [
+            {"idx": i, "entrada": p, "offset": off, "estado": PENDIENTE, "intentos": 0,
+             "salida": None, "sha256": None, "frames": 0, "error": None}
+            for i, (p, off) in enumerate(chunks)
+        ])
+        m.guardar()
+        return m
+
+    def guardar(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"firma": self.firma, "actualizado": time.time(), "chunks": self.chunks},
+                      f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def marcar(self, idx, **campos):
+        self.chunks[idx].update(campos)
+        self.guardar()
+
+    def entradas_validas(self):
+        """True si siguen estando todos los chunks de entrada (si no, hay que volver a cortar)."""
+        return all(os.path.exists(c["entrada"]) for c in self.chunks)
+
+    def verificar_salidas(self, hash_archivo):
+        """Vuelve a pendiente todo chunk 'ok' cuya salida falte o no coincida con su hash."""
+        for c in self.chunks:
+            if c["estado"] != OK:
+                continue
+            if not c["salida"] or not os.path.exists(c["salida"]) or hash_archivo(c["salida"]) != c["sha256"]:
+                c.update(estado=PENDIENTE, salida=None, sha256=None, frames=0)
+        self.guardar()
+
+    def pendientes(self):
+        return [c for c in self.chunks if c["estado"] != OK]
+
+    def completo(self):
+        return not self.pendientes()
@@ -0,0 +1,107 @@
+# utils/metadatos.py
+import json
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from fractions import Fraction
+
+_MAX_ENTRADAS = 256
+_memo = OrderedDict()  # (path absoluto, mtime_ns, bytes) -> metadatos
+_lock = threading.Lock()
+
+
+def _ffprobe(args):
+    try:
+        return subprocess.check_output(["ffprobe", "-v", "error", *args])
+    except FileNotFoundError:
+        raise Exception("Comando 'ffprobe' no encontrado. Asegúrate de que FFmpeg esté instalado y en el PATH del sistema.")
+
+
+def _segundos(valor):
+    return float(valor) if valor not in (None, "N/A") else 0.0
+
+
+def _leer(path, keyframes):
+    """Una sola llamada a ffprobe: formato + stream de video (+ paquetes si keyframes)."""
+    entradas = ("format=duration,start_time:stream=codec_name,profile,pix_fmt,width,height,"
+                "r_frame_rate,avg_frame_rate,time_base,nb_frames,start_time")
+    if keyframes:
+        entradas += ":packet=pts_time,flags"
+    datos = json.loads(_ffprobe(["-select_streams", "v:0", "-show_entries", entradas, "-of", "json", path]))
+    stream = (datos.get("streams") or [{}])[0]
+    duracion = float(datos.get("format", {}).get("duration") or 0)
+    # -ss de ffmpeg se mide desde el start_time del contenedor (el mínimo entre streams);
+    # el video puede empezar después (audio antes, retardo de B-frames)
+    inicio_formato = _segundos(datos.get("format", {}).get("start_time"))
+    inicio_video = _segundos(stream.get("start_time"))
+
+    # fps nominal (como cv2); el promedio varía entre chunks cortados con -c copy
+    tasa = stream.get("r_frame_rate")
+    if not tasa or tasa.startswith("0"):
+        tasa = stream.get("avg_frame_rate") or "0/1"
+    num, _, den = tasa.partition("/")
+    fps = float(Fraction(int(num), int(den or 1))) if int(den or 1) else 0.0
+
+    meta = {
+        "duracion_seg": duracion,
+        "fps": fps,
+        "frames": int(stream.get("nb_frames") or 0) or round(duracion * fps),
+        "ancho": stream.get("width"),
+        "alto": stream.get("height"),
+        "codec": stream.get("codec_name"),
+        "perfil": stream.get("profile"),
+        "pix_fmt": stream.get("pix_fmt"),
+        "r_frame_rate": stream.get("r_frame_rate"),
+        "time_base": stream.get("time_base"),
+        "inicio_video": max(0.0, inicio_video - inicio_formato),
+        "keyframes": None,
+    }
+    if keyframes:
+        todos, claves = [], []
+        for paquete in datos.get("packets", []):
+            t = paquete.get("pts_time")
+            if t in (None, "N/A"):
+                continue
+            todos.append(float(t))
+            if "K" in paquete.get("flags", ""):
+                claves.append(float(t))
+        if todos:
+            inicio = min(todos)
+            meta["inicio_video"] = max(0.0, inicio - inicio_formato)
+            meta["frames"] = len(todos)
+            meta["keyframes"] = sorted(t - inicio for t in claves)
+        else:
+            meta["keyframes"] = []
+    return meta
+
+
+def metadatos(path, keyframes=False):
+    """
+    Metadatos del video con UNA llamada a ffprobe, memorizados por path + mtime
+    (+ tamaño): si el archivo cambia, se vuelven a leer. Devuelve un dict con
+    duracion_seg, fps, frames, ancho, alto, codec, perfil, pix_fmt, r_frame_rate,
+    time_base, inicio_video y keyframes.
+    inicio_video: segundos entre el start_time del contenedor (desde donde mide el -ss
+    de ffmpeg) y el primer frame de video.
+    keyframes=True agrega el índice de keyframes (segundos relativos al primer
+    frame) y el conteo exacto de frames: ffprobe lee los paquetes (sin decodificar),
+    así que solo se pide cuando hace falta. Sin él, 'keyframes' es None y 'frames'
+    sale del contenedor (o de duración * fps).
+    """
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    clave = (path, st.st_mtime_ns, st.st_size)
+    with _lock:
+        meta = _memo.get(clave)
+        if meta is not None and (not keyframes or meta["keyframes"] is not None):
+            _memo.move_to_end(clave)
+            return dict(meta)
+
+    meta = _leer(path, keyframes)
+    with _lock:
+        _memo[clave] = meta
+        _memo.move_to_end(clave)
+        while len(_memo) > _MAX_ENTRADAS:
+            _memo.popitem(last=False)
+    return dict(meta)
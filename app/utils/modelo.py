@@ -0,0 +1,79 @@
+# utils/modelo.py
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from app.config import (
+    MODELOS_DIR,
+    YOLO_TAMANIO,
+    YOLO_IMGSZ,
+    YOLO_RUNTIME,
+    YOLO_INT8,
+)
+
+RUNTIMES = ("pytorch", "onnx", "openvino")
+
+
+def _opciones(tamanio=None, imgsz=None, runtime=None, int8=None):
+    tamanio = tamanio or YOLO_TAMANIO
+    imgsz = imgsz or YOLO_IMGSZ
+    runtime = runtime or YOLO_RUNTIME
+    int8 = YOLO_INT8 if int8 is None else int8
+    if runtime not in RUNTIMES:
+        raise Exception(f"Runtime de inferencia desconocido: {runtime} (opciones: {', '.join(RUNTIMES)})")
+    if int8 and runtime != "openvino":
+        raise Exception("La cuantización INT8 solo está disponible con runtime 'openvino'")
+    return tamanio, imgsz, runtime, int8
+
+
+def pesos_base(tamanio=None):
+    """Pesos PyTorch de referencia (ultralytics los descarga si no están)."""
+    return f"yolov8{tamanio or YOLO_TAMANIO}.pt"
+
+
+def nombre_modelo(tamanio=None, imgsz=None, runtime=None, int8=None):
+    """Identificador estable del modelo efectivo (entra en las claves de caché)."""
+    tamanio, imgsz, runtime, int8 = _opciones(tamanio, imgsz, runtime, int8)
+    nombre = f"yolov8{tamanio}-{imgsz}-{runtime}"
+    return f"{nombre}-int8" if int8 else nombre
+
+
+def ruta_modelo(tamanio=None, imgsz=None, runtime=None, int8=None):
+    """
+    Path cargable por ultralytics.YOLO para la configuración pedida.
+    PyTorch usa los pesos .pt; ONNX/OpenVINO se exportan una sola vez a MODELOS_DIR
+    y se reutilizan. La exportación se hace en un directorio temporal y se mueve al
+    final, así dos procesos que exportan a la vez no dejan un modelo a medias.
+    """
+    tamanio, imgsz, runtime, int8 = _opciones(tamanio, imgsz, runtime, int8)
+    if runtime == "pytorch":
+        return pesos_base(tamanio)
+
+    nombre = nombre_modelo(tamanio, imgsz, runtime, int8)
+    destino = MODELOS_DIR / (f"{nombre}.onnx" if runtime == "onnx" else f"{nombre}_openvino_model")
+    if destino.exists():
+        return str(destino)
+
+    from ultralytics import YOLO
+
+    print(f"📦 Exportando {pesos_base(tamanio)} a {runtime} (imgsz={imgsz}{', INT8' if int8 else ''})...")
+    with tempfile.TemporaryDirectory(dir=MODELOS_DIR) as tmp:
+        pesos = Path(tmp) / pesos_base(tamanio)
+        shutil.copy(YOLO(pesos_base(tamanio)).ckpt_path, pesos)
+        exportado = YOLO(str(pesos)).export(
+            format=runtime, imgsz=imgsz, int8=int8, dynamic=True, verbose=False
+        )
+        try:
+            os.replace(exportado, destino)
+        except OSError:
+            if not destino.exists():  # otro proceso ya lo movió: se usa ese
+                raise
+    print(f"✅ Modelo exportado: {destino}")
+    return str(destino)
+
+
+def cargar_modelo(tamanio=None, imgsz=None, runtime=None, int8=None):
+    """Carga (exportando si hace falta) el modelo YOLO para el backend pedido."""
+    from ultralytics import YOLO
+    return YOLO(ruta_modelo(tamanio, imgsz, runtime, int8), task="detect")
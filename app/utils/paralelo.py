@@ -1,32 +1,53 @@
 # utils/paralelo.py
+import atexit
 import os
 import subprocess
 import shutil
+import threading
+import time
+from bisect import bisect_left
+from fractions import Fraction
 from multiprocessing import Pool
 
-def dividir_video(input_path, chunk_minutes=10, output_dir="chunks"):
-    """
-    Corta el video en chunks exactos usando seek preciso:
-    - Accurate seek: -i input -ss start -t dur  (re-encode)
-    - Evita saltos a keyframes y corrimientos de varios segundos.
-    """
-    if os.path.exists(output_dir):
-        shutil.rmtree(output_dir)
-    os.makedirs(output_dir, exist_ok=True)
+import numpy as np
 
-    chunk_secs = int(chunk_minutes * 60)
+from app.config import (
+    CHUNK_MODO,
+    CHUNK_REINTENTOS,
+    CHUNK_BACKOFF_SEG,
+    CHUNK_HUECOS,
+    HUECO_SEG,
+    CHUNK_MIN_SEG,
+    CHUNK_MAX_SEG,
+    CHUNKS_POR_WORKER,
+    PARALELO_PROCESOS,
+    TRABAJOS_WORKERS,
+)
+from app.utils.cache import hash_archivo
+from app.utils.codificador import CodificadorFFmpeg, parametros_salida, propiedades_video
+from app.utils.metadatos import metadatos
+from app.utils.indice import RegistroDetecciones, unir_indices
+from app.utils.manifiesto import FALLIDO, OK, ManifiestoChunks, firma_entrada
+from app.utils.instrumentacion import Perfil
+from app.utils.modelo import ruta_modelo
 
-    # Duración total en segundos con ffprobe
-    def _probe_duration(path):
-        cmd = [
-            "ffprobe", "-v", "error", "-show_entries", "format=duration",
-            "-of", "default=noprint_wrappers=1:nokey=1", path
-        ]
-        out = subprocess.check_output(cmd).decode().strip()
-        return float(out)
+def _cortes_en_keyframes(keyframes, total, chunk_secs):
+    """Para cada múltiplo de chunk_secs toma el primer keyframe >= objetivo."""
+    cortes = [0.0]
+    objetivo = chunk_secs
+    while objetivo < total:
+        i = bisect_left(keyframes, objetivo)
+        if i == len(keyframes):
+            break
+        k = keyframes[i]
+        if cortes[-1] < k < total:
+            cortes.append(k)
+        objetivo = max(objetivo, k) + chunk_secs
+    return cortes
 
-    total = _probe_duration(input_path)
+def _dividir_reencode(input_path, total, chunk_secs, output_dir):
     n_chunks = (int(total) + chunk_secs - 1) // chunk_secs
+    inicio_video = metadatos(input_path)["inicio_video"]  # -ss se mide desde el start_time del contenedor
 
     chunk_paths = []
     for i in range(n_chunks):
@@ -38,7 +59,7 @@ def dividir_video(input_path, chunk_minutes=10, output_dir="chunks"):
         cmd = [
             "ffmpeg", "-y",
             "-i", input_path,        # input primero
-            "-ss", str(start),       # luego -ss (accurate seek)
+            "-ss", f"{start + inicio_video:.6f}",  # luego -ss (accurate seek)
             "-t",  str(dur),
             "-c:v", "libx264", "-preset", "fast", "-crf", "20",
             "-pix_fmt", "yuv420p",
@@ -51,74 +72,332 @@ def dividir_video(input_path, chunk_minutes=10, output_dir="chunks"):
 
     return chunk_paths
 
+def _dividir_copia(input_path, total, chunk_secs, output_dir):
+    """
+    Corta SOLO en keyframes con -c copy (sin re-encode). Los chunks no duran
+    exactamente chunk_secs: cada uno empieza en el primer keyframe luego del
+    objetivo, y ese tiempo exacto es el offset que se devuelve.
+    """
+    meta = metadatos(input_path, keyframes=True)
+    keyframes = meta["keyframes"]
+    if not keyframes:
+        raise Exception("No se encontraron keyframes")
+    cortes = _cortes_en_keyframes(keyframes, total, chunk_secs)
+    ext = os.path.splitext(input_path)[1] or ".mp4"
+
+    chunk_paths = []
+    for i, start in enumerate(cortes):
+        out_path = os.path.join(output_dir, f"chunk_{i:03d}{ext}")
+        # -ss antes de -i: seek al keyframe <= start. 'start' es relativo al primer
+        # frame de video y -ss al start_time del contenedor: se suma inicio_video.
+        # El +1ms evita caer en el keyframe anterior por redondeo del tiempo impreso.
+        cmd = ["ffmpeg", "-y", "-ss", f"{start + meta['inicio_video'] + 0.001:.6f}", "-i", input_path]
+        if i + 1 < len(cortes):
+            cmd += ["-t", f"{cortes[i + 1] - start:.6f}"]
+        cmd += [
+            "-map", "0:v:0", "-c", "copy", "-an",
+            "-avoid_negative_ts", "make_zero",
+            out_path
+        ]
+        subprocess.run(cmd, check=True)
+        chunk_paths.append((out_path, start))
+
+    return chunk_paths
+
+def cupos_de_frames(offsets, fps):
+    """
+    Frames que le tocan a cada chunk: desde su offset hasta el del siguiente (None
+    en el último, que va hasta el final). Con -c copy un chunk trae además paquetes
+    del siguiente (-t corta por pts, y con B-frames hay frames reordenados); sin
+    cupo esos frames saldrían dos veces en el video unido y en el índice.
+    """
+    inicios = [round(off * fps) for off in offsets]
+    return [b - a for a, b in zip(inicios, inicios[1:])] + [None]
+
+def dividir_video(input_path, chunk_minutes=10, output_dir="chunks", modo=None):
+    """
+    Corta el video en chunks y devuelve [(path, offset_real_en_segundos)].
+    - modo="copia": corte en keyframes con -c copy (ffprobe de paquetes, sin re-encode).
+      El offset es el tiempo exacto del keyframe, así el reloj quemado sigue siendo
+      el del original. Si falla (sin keyframes, contenedor raro) cae a "reencode".
+    - modo="reencode": accurate seek -i input -ss start -t dur con libx264.
+      Evita saltos a keyframes y corrimientos de varios segundos, pero re-codifica todo.
+    """
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    chunk_secs = int(chunk_minutes * 60)
+    total = metadatos(input_path)["duracion_seg"]
+    modo = modo or CHUNK_MODO
+
+    if modo == "copia":
+        try:
+            return _dividir_copia(input_path, total, chunk_secs, output_dir)
+        except Exception as e:
+            print(f"⚠️ Corte por keyframes falló ({e}) → re-encode")
+            shutil.rmtree(output_dir)
+            os.makedirs(output_dir, exist_ok=True)
+    elif modo != "reencode":
+        raise Exception(f"Modo de división desconocido: {modo}")
+
+    return _dividir_reencode(input_path, total, chunk_secs, output_dir)
+
+def procesos_por_defecto():
+    """
+    Workers del pool: PARALELO_PROCESOS o, si es None, los núcleos repartidos
+    entre los trabajos que pueden correr a la vez (TRABAJOS_WORKERS).
+    """
+    if PARALELO_PROCESOS:
+        return PARALELO_PROCESOS
+    return max(1, (os.cpu_count() or 1) // TRABAJOS_WORKERS)
+
+def planificar_chunks(duracion_seg, procesos):
+    """
+    Duración de chunk (segundos) para 'procesos' workers: se sobre-descompone en
+    ~CHUNKS_POR_WORKER unidades por worker, así un chunk cargado de detecciones no
+    deja núcleos ociosos al final (imap_unordered reparte a quien se libere).
+    Acotada a [CHUNK_MIN_SEG, CHUNK_MAX_SEG] para no pagar demasiado arranque por chunk.
+    """
+    objetivo = duracion_seg / max(1, procesos * CHUNKS_POR_WORKER)
+    return int(min(max(objetivo, CHUNK_MIN_SEG), CHUNK_MAX_SEG))
+
+# ---- Pool de workers persistente (uno por proceso de la app, reutilizado entre pedidos)
+_pool = None
+_pool_procesos = None
+_pool_lock = threading.RLock()  # reentrante: cerrar_pool puede llegar desde un handler de señal
+
+def _inicializar_worker(hilos):
+    """
+    Initializer de cada worker: limita los hilos de torch/OpenCV (procesos x hilos
+    no debe superar los núcleos) y carga YOLO una sola vez por proceso.
+    """
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(hilos)
+    import cv2
+    cv2.setNumThreads(hilos)
+    try:
+        import torch
+        torch.set_num_threads(hilos)
+    except ImportError:
+        pass  # runtime ONNX/OpenVINO sin torch instalado
+    from app.utils.utils import obtener_modelo
+    obtener_modelo()
+
+def obtener_pool(procesos=None):
+    """
+    Devuelve el pool de detección, creándolo la primera vez.
+    Se reutiliza entre pedidos de Streamlit; si cambia 'procesos' se recrea.
+    """
+    global _pool, _pool_procesos
+    procesos = procesos or procesos_por_defecto()
+    with _pool_lock:
+        if _pool is not None and _pool_procesos != procesos:
+            _cerrar_pool_sin_lock()
+        if _pool is None:
+            # Exportación (ONNX/OpenVINO) una sola vez acá, no en cada worker a la vez
+            ruta_modelo()
+            hilos = max(1, (os.cpu_count() or 1) // (procesos * TRABAJOS_WORKERS))
+            _pool = Pool(processes=procesos, initializer=_inicializar_worker, initargs=(hilos,))
+            _pool_procesos = procesos
+        return _pool
+
+def _cerrar_pool_sin_lock(terminar=False):
+    global _pool, _pool_procesos
+    if _pool is not None:
+        if terminar:
+            _pool.terminate()
+        else:
+            _pool.close()
+        _pool.join()
+    _pool, _pool_procesos = None, None
+
+def cerrar_pool(terminar=False):
+    """
+    Cierra el pool. Por defecto espera a que los workers terminen lo que tienen;
+    con terminar=True los corta sin esperar los chunks en curso (así lo llama el
+    handler de SIGTERM de los workers de trabajos, y el atexit de un proceso principal).
+    """
+    with _pool_lock:
+        _cerrar_pool_sin_lock(terminar)
+
+atexit.register(cerrar_pool, terminar=True)
+
 def _tarea_procesar(args):
     """
     Ejecuta procesar_video sobre un chunk.
     args = (func, chunk_path, offset, output_dir, idx, kwargs)
+    Devuelve (idx, path_salida|None, frames_guardados, perfil_del_chunk|None, sha256|error).
     """
     func, chunk_path, offset, output_dir, idx, kwargs = args
     out_path = os.path.join(output_dir, f"proc_{idx:03d}.mp4")
+    perfil = Perfil()
     try:
-        final, frames = func(chunk_path, out_path, offset=offset, **kwargs)
-        return final, frames
+        final, frames = func(chunk_path, out_path, offset=offset, perfil=perfil, **kwargs)
+        return idx, final, frames, perfil.a_dict(), hash_archivo(final)
     except Exception as e:
         print(f"❌ Chunk {idx:03d} falló: {e}")
-        return None, 0
+        return idx, None, 0, None, str(e)
+
+def _video_hueco(path, chunk, muestra):
+    """
+    Placa negra de HUECO_SEG segundos que marca en el video final el tramo de un
+    chunk que no se pudo procesar. Mismo tamaño/fps/códec que los chunks procesados
+    (así el concat -c copy funciona) y con su índice vacío, para que los tiempos
+    de los chunks siguientes en el índice unido sigan siendo correctos.
+    """
+    import cv2
+    meta = metadatos(muestra)
+    fps = Fraction(meta["r_frame_rate"]) if meta["r_frame_rate"] else 24
+    w, h = meta["ancho"], meta["alto"]
 
-def unir_videos(paths, output_path):
+    inicio = time.strftime("%H:%M:%S", time.gmtime(chunk["offset"]))
+    frame = np.zeros((h, w, 3), np.uint8)
+    for n, texto in enumerate(("SIN PROCESAR", f"desde {inicio}", f"chunk {chunk['idx']:03d}")):
+        cv2.putText(frame, texto, (w // 10, h // 3 + n * h // 8),
+                    cv2.FONT_HERSHEY_SIMPLEX, h / 400, (255, 255, 255), max(1, h // 300))
+    out = CodificadorFFmpeg(path, w, h, fps)
+    for _ in range(int(HUECO_SEG * fps)):
+        out.escribir(frame)
+    out.cerrar()
+    registro = RegistroDetecciones(float(fps), chunk["offset"])  # fps va al meta JSON del índice
+    registro.frames_salida = out.escritos
+    registro.guardar(path)
+    return path
+
+def unir_videos(paths, output_path, list_file="file_list.txt"):
     """
     Concatena MP4s por lista. Usa concat demuxer.
+    Los chunks salen todos con los mismos parámetros (codificador.parametros_salida),
+    así que se unen con -c copy + faststart y el resultado ya es apto para la web.
+    Antes se verifica con ffprobe que los streams coincidan; si no (p. ej. chunks de
+    una versión anterior retomados de un manifiesto), se re-codifica la unión.
     """
-    list_file = "file_list.txt"
     with open(list_file, "w", encoding="utf-8") as f:
         for p in paths:
             f.write(f"file '{os.path.abspath(p)}'\n")
 
+    props = [propiedades_video(p) for p in paths]
+    if all(p == props[0] for p in props):
+        codificacion = ["-c", "copy", "-movflags", "+faststart"]
+    else:
+        print("⚠️ Los chunks no tienen la misma codificación: se re-codifica la unión")
+        codificacion = parametros_salida(Fraction(props[0]["r_frame_rate"]))
+
     cmd = [
-        "ffmpeg", "-y", "-f", "concat", "-safe", "0",
+        "ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
         "-i", list_file,
-        "-c", "copy",
-        output_path
+        *codificacion,
+        "-an", output_path
     ]
     subprocess.run(cmd, check=True)
     os.remove(list_file)
     return output_path
 
 def procesar_en_paralelo(func, input_path, output_path,
-                         step=4, chunk_minutes=10, procesos=4, **kwargs):
+                         step=4, chunk_minutes=None, procesos=None, modo_division=None,
+                         work_dir=".", perfil=None, **kwargs):
     """
-    Divide input en chunks con seek preciso, procesa cada uno en paralelo
+    Divide input en chunks (ver dividir_video), procesa cada uno en paralelo
     pasando offset=start real, y concatena.
+    procesos=None usa procesos_por_defecto(); chunk_minutes=None dimensiona los
+    chunks según la duración y los workers (planificar_chunks).
+    Los chunks y la lista de concat viven en 'work_dir' (uno distinto por trabajo).
+    El progreso se informa por chunk terminado; los tiempos de cada chunk se suman
+    al perfil (si no se pasa uno, se guarda como JSON junto a output_path).
+    Tolerancia a fallas:
+      - work_dir/manifiesto.json guarda estado, intentos y hash de salida de cada chunk.
+        Si el trabajo se interrumpe, la próxima corrida con el mismo video y parámetros
+        retoma y procesa solo los chunks que faltan.
+      - Un chunk que falla se reintenta hasta CHUNK_REINTENTOS veces con espera
+        exponencial (CHUNK_BACKOFF_SEG, 2x, 4x...).
+      - Si aun así quedan chunks sin procesar: con CHUNK_HUECOS="error" no se arma el
+        video (el manifiesto queda para retomar); con "marcar" se arma igual, con una
+        placa "SIN PROCESAR" en cada hueco, y perfil.contadores["huecos"] > 0.
     """
-    chunks = dividir_video(input_path, chunk_minutes=chunk_minutes, output_dir="chunks")
+    perfil_propio = perfil is None
+    perfil = perfil or Perfil()
+    procesos = procesos or procesos_por_defecto()
+    if chunk_minutes is None:
+        chunk_minutes = planificar_chunks(metadatos(input_path)["duracion_seg"], procesos) / 60
+    chunks_dir = os.path.join(work_dir, "chunks")
+    out_dir = os.path.join(work_dir, "chunks_proc")
+    kwargs = {"step": step, **kwargs}
 
-    tareas = []
-    out_dir = "chunks_proc"
-    if os.path.exists(out_dir):
-        shutil.rmtree(out_dir)
+    manifiesto_path = os.path.join(work_dir, "manifiesto.json")
+    firma = firma_entrada(input_path, func=func.__name__, chunk_minutes=chunk_minutes,
+                          modo_division=modo_division or CHUNK_MODO, kwargs=kwargs)
+    manifiesto = ManifiestoChunks.cargar(manifiesto_path, firma)
+    if manifiesto is not None and manifiesto.entradas_validas():
+        manifiesto.verificar_salidas(hash_archivo)
+        hechos = len(manifiesto.chunks) - len(manifiesto.pendientes())
+        print(f"♻️ Retomando: {hechos}/{len(manifiesto.chunks)} chunks ya procesados")
+        perfil.contar("chunks_retomados", hechos)
+    else:
+        with perfil.etapa("division"):
+            chunks = dividir_video(input_path, chunk_minutes=chunk_minutes, output_dir=chunks_dir,
+                                   modo=modo_division)
+        if os.path.exists(out_dir):
+            shutil.rmtree(out_dir)
+        manifiesto = ManifiestoChunks.nuevo(manifiesto_path, firma, chunks)
     os.makedirs(out_dir, exist_ok=True)
 
-    for idx, (chunk_path, start) in enumerate(chunks):
-        # IMPORTANTÍSIMO: offset = start REAL del chunk en el original
-        tarea = (func, chunk_path, start, out_dir, idx, {"step": step, **kwargs})
-        tareas.append(tarea)
-
-    with Pool(processes=procesos) as pool:
-        resultados = pool.map(_tarea_procesar, tareas)
-
-    out_paths = [r[0] for r in resultados if r[0] is not None]
-    frames_totales = sum(r[1] for r in resultados if r[0] is not None)
+    total = len(manifiesto.chunks)
+    cupos = cupos_de_frames([c["offset"] for c in manifiesto.chunks], metadatos(input_path)["fps"])
+    with perfil.etapa("chunks"):
+        for intento in range(CHUNK_REINTENTOS + 1):
+            pendientes = manifiesto.pendientes()
+            if not pendientes:
+                break
+            if intento:
+                espera = CHUNK_BACKOFF_SEG * 2 ** (intento - 1)
+                print(f"🔁 Reintento {intento}/{CHUNK_REINTENTOS} de {len(pendientes)} chunks en {espera:.0f} s")
+                time.sleep(espera)
+            # IMPORTANTÍSIMO: offset = start REAL del chunk en el original
+            tareas = [(func, c["entrada"], c["offset"], out_dir, c["idx"],
+                       {**kwargs, "frames_max": cupos[c["idx"]]}) for c in pendientes]
+            for idx, final, frames, datos, extra in obtener_pool(procesos).imap_unordered(_tarea_procesar, tareas):
+                intentos = manifiesto.chunks[idx]["intentos"] + 1
+                if final is None:
+                    manifiesto.marcar(idx, estado=FALLIDO, intentos=intentos, error=extra)
+                    perfil.contar("chunks_fallidos")
+                    continue
+                manifiesto.marcar(idx, estado=OK, intentos=intentos, error=None,
+                                  salida=final, sha256=extra, frames=frames)
+                perfil.agregar_chunk(idx, datos)
+                perfil.avance((total - len(manifiesto.pendientes())) / total, forzar=True)
 
-    if not out_paths:
+    faltantes = manifiesto.pendientes()
+    if faltantes and CHUNK_HUECOS != "marcar":
+        detalle = ", ".join(f"{c['idx']:03d} ({c['error']})" for c in faltantes)
+        raise Exception(f"❌ {len(faltantes)} de {total} chunks fallaron tras los reintentos: {detalle}")
+    if len(faltantes) == total:
         raise Exception("❌ Todos los chunks fallaron en el procesamiento.")
 
-    final_output = unir_videos(out_paths, output_path)
+    out_paths = []
+    for c in manifiesto.chunks:
+        if c["estado"] == OK:
+            out_paths.append(c["salida"])
+        else:
+            print(f"⚠️ Chunk {c['idx']:03d} sin procesar: se marca el hueco en el video final")
+            out_paths.append(_video_hueco(os.path.join(out_dir, f"hueco_{c['idx']:03d}.mp4"), c,
+                                          next(x["salida"] for x in manifiesto.chunks if x["estado"] == OK)))
+    perfil.contar("huecos", len(faltantes))
+    frames_totales = sum(c["frames"] for c in manifiesto.chunks if c["estado"] == OK)
 
-    # Limpieza
-    if os.path.exists("chunks"):
-        shutil.rmtree("chunks")
-    if os.path.exists("chunks_proc"):
-        shutil.rmtree("chunks_proc")
+    with perfil.etapa("concat"):
+        final_output = unir_videos(out_paths, output_path,
+                                   list_file=os.path.join(work_dir, "file_list.txt"))
+        unir_indices(out_paths, output_path)
+
+    # Limpieza (solo cuando el video final ya está armado)
+    if os.path.exists(chunks_dir):
+        shutil.rmtree(chunks_dir)
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.remove(manifiesto_path)
 
-    print(f"✅ Procesamiento paralelo completado: {len(out_paths)} chunks procesados")
+    print(f"✅ Procesamiento paralelo completado: {total - len(faltantes)}/{total} chunks procesados")
+    if perfil_propio:
+        perfil.guardar(output_path)
     return final_output, frames_totales
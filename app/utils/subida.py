@@ -0,0 +1,53 @@
+# utils/subida.py
+import hashlib
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from app.config import UPLOAD_DIR, SUBIDA_BLOQUE
+from app.utils.metadatos import metadatos
+
+# Sondeos ffprobe de videos recién subidos (no bloquean la interfaz)
+_sondeos = ThreadPoolExecutor(max_workers=2, thread_name_prefix="sondeo")
+
+
+def guardar_subida(archivo, nombre, destino_dir=UPLOAD_DIR, bloque=SUBIDA_BLOQUE):
+    """
+    Copia un archivo subido (cualquier objeto con read) a destino_dir de a bloques
+    de 'bloque' bytes, calculando el SHA-256 mientras escribe: la memoria usada no
+    depende del tamaño del video. Devuelve (path, sha256).
+    El archivo queda como '<hash[:16]>_<nombre>'. Si ya hay uno con el mismo
+    contenido, se descarta lo escrito y se devuelve el existente (sin duplicados).
+    """
+    destino_dir = Path(destino_dir)
+    h = hashlib.sha256()
+    tmp = destino_dir / f".{uuid.uuid4().hex}.part"
+    try:
+        with open(tmp, "wb") as f:
+            while True:
+                datos = archivo.read(bloque)
+                if not datos:
+                    break
+                h.update(datos)
+                f.write(datos)
+        sha = h.hexdigest()
+        existente = buscar_subida(sha, destino_dir)
+        if existente is not None:
+            return existente, sha
+        path = destino_dir / f"{sha[:16]}_{Path(nombre).name}"
+        os.replace(tmp, path)
+        return path, sha
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def buscar_subida(sha, destino_dir=UPLOAD_DIR):
+    """Video ya subido con ese contenido, o None."""
+    return next(Path(destino_dir).glob(f"{sha[:16]}_*"), None)
+
+
+def sondear_en_segundo_plano(path):
+    """Lanza metadatos(path) en otro hilo y devuelve el Future (queda memorizado)."""
+    return _sondeos.submit(metadatos, str(path))
@@ -5,15 +5,30 @@ import time
 import subprocess
 import shutil
 import os
+import threading
 import requests
 from pathlib import Path
 from skimage.metrics import structural_similarity as ssim
-from moviepy import VideoFileClip, concatenate_videoclips
-from ultralytics import YOLO
 from app.config import UPLOAD_DIR, PROCESSED_DIR, YOLO_MAP
+from app.utils.codificador import es_video_web
+from app.utils.metadatos import metadatos
+from app.utils.modelo import cargar_modelo
 
-# Cargar modelo YOLO una vez
-yolo_model = YOLO("yolov8m.pt")
+# Modelo YOLO: se carga una sola vez por proceso, recién cuando se lo pide
+_yolo_model = None
+_yolo_lock = threading.Lock()
+
+def obtener_modelo():
+    """
+    Devuelve el modelo YOLO del proceso, cargándolo la primera vez (no al importar).
+    Tamaño, resolución y runtime salen de config (YOLO_TAMANIO/IMGSZ/RUNTIME/INT8).
+    """
+    global _yolo_model
+    if _yolo_model is None:
+        with _yolo_lock:
+            if _yolo_model is None:
+                _yolo_model = cargar_modelo()
+    return _yolo_model
 
 # Descarga un archivo de video desde una URL y lo guarda localmente
 def descargar_video(url, save_path):
@@ -26,10 +41,8 @@ def descargar_video(url, save_path):
 
 # Calcula la duración del video en minutos
 def obtener_duracion_formato(video_path):
-    """Devuelve duración HH:MM:SS y en minutos"""
-    clip = VideoFileClip(video_path)
-    duracion_seg = int(clip.duration)
-    clip.close()
+    """Devuelve duración HH:MM:SS y en minutos (ffprobe, ver metadatos)"""
+    duracion_seg = int(metadatos(video_path)["duracion_seg"])
     minutos = duracion_seg // 60
     segundos = duracion_seg % 60
     return f"{minutos:02d}:{segundos:02d}", duracion_seg / 60
@@ -97,41 +110,190 @@ def ajustar_umbral(promedio, desviacion, default=0.85):
         umbral = promedio
     return max(0.55, min(umbral, 0.98))
 
-def timestamp_frame(frame, segundos, prefix="Tiempo del video original: "):
+class CalibradorSSIM:
     """
-    Dibuja el tiempo HH:MM:SS del video (según 'segundos') en la esquina superior izquierda.
-    Si 'prefix' no es None, antepone ese texto (p. ej., 'Tiempo del video original: ').
+    Calibración incremental del umbral SSIM dentro del bucle principal.
+    Acumula media y varianza (Welford) de los scores de las primeras 'muestras'
+    comparaciones y después congela el umbral. Mientras calienta usa el umbral
+    provisorio de lo acumulado (o 'default' si todavía hay pocas muestras).
+    """
+
+    def __init__(self, muestras=150, default=0.85, min_muestras=10):
+        self.muestras = muestras
+        self.default = default
+        self.min_muestras = min_muestras
+        self.n = 0
+        self.media = 0.0
+        self.m2 = 0.0
+        self.congelado = False
+        self.umbral = max(0.55, min(default, 0.98))
+
+    @classmethod
+    def fijo(cls, promedio, desviacion):
+        """Calibrador ya congelado con valores calculados en otra pasada."""
+        c = cls(muestras=0)
+        c.n, c.media, c.m2 = 1, float(promedio), float(desviacion) ** 2
+        c.umbral = ajustar_umbral(promedio, desviacion)
+        c.congelado = True
+        return c
+
+    @property
+    def desviacion(self):
+        return (self.m2 / self.n) ** 0.5 if self.n else 0.0
+
+    def agregar(self, score):
+        if self.congelado:
+            return self.umbral
+        self.n += 1
+        delta = score - self.media
+        self.media += delta / self.n
+        self.m2 += delta * (score - self.media)
+        if self.n >= self.min_muestras:
+            self.umbral = ajustar_umbral(self.media, self.desviacion)
+        if self.n >= self.muestras:
+            self.congelado = True
+        return self.umbral
+
+    def copia(self):
+        c = CalibradorSSIM.__new__(CalibradorSSIM)
+        c.__dict__.update(self.__dict__)
+        return c
+
+_TS_FUENTE, _TS_ESCALA, _TS_GROSOR = cv2.FONT_HERSHEY_SIMPLEX, 0.9, 2
+_TS_MARGEN = 10
+_TS_ALFA = 0.45            # opacidad del fondo negro detrás del texto
+_TS_COLOR = (0, 255, 0)
+_TS_PREFIJO = "Tiempo del video original: "
+_TS_PAD = _TS_GROSOR + 2   # margen de los glifos para el trazo del contorno
+
+
+class RotuloTiempo:
+    """
+    Overlay de timestamp_frame sin trabajo sobre el frame completo:
+      - el fondo semitransparente se mezcla solo dentro del rectángulo del texto;
+      - el texto sale de glifos prerenderizados (el prefijo, los dígitos y ':') como
+        máscaras antialias de contorno y relleno; se recomponen solo cuando cambia
+        el texto (una vez por segundo de video) en factores precalculados;
+      - por frame: una multiplicación y una suma sobre el rectángulo, en un buffer
+        float32 reservado una sola vez.
     """
-    t_str = time.strftime("%H:%M:%S", time.gmtime(segundos))
-    text = f"{prefix}{t_str}" if prefix is not None else t_str
 
-    # Estilo
-    font = cv2.FONT_HERSHEY_SIMPLEX
-    font_scale = 0.9
-    thickness = 2
-    margin = 10
+    def __init__(self, prefix=_TS_PREFIJO):
+        self.prefix = prefix or ""
+        (tw, th), _ = cv2.getTextSize(f"{self.prefix}00:00:00", _TS_FUENTE, _TS_ESCALA, _TS_GROSOR)
+        x, y = _TS_MARGEN, _TS_MARGEN + th
+        # Mismo rectángulo de fondo que antes: (x - 8, y - th - 8) a (x + tw + 8, y + 8), inclusive
+        self.y0, self.y1 = y - th - 8, y + 8 + 1
+        self.x0, self.x1 = x - 8, x + tw + 8 + 1
+        self.origen = (x - self.x0, y - self.y0)
+        alto, ancho = self.y1 - self.y0, self.x1 - self.x0
 
-    # Medir rectángulo de fondo
-    (tw, th), _ = cv2.getTextSize(text, font, font_scale, thickness)
-    x, y = margin, margin + th
+        self._contorno = np.zeros((alto, ancho), np.uint8)
+        self._relleno = np.zeros((alto, ancho), np.uint8)
+        if self.prefix:
+            self._texto_en(self._contorno, self._relleno, self.prefix, self.origen[0])
+        self._base = (self._contorno.copy(), self._relleno.copy())
+        self._x_hora = self.origen[0] + self._avance(self.prefix)
+        self._glifos = {}  # caracter -> (contorno, relleno, avance); el trazo empieza en x = _TS_PAD
+        for c in "0123456789:":
+            w = self._avance(c) + 2 * _TS_PAD
+            cont = np.zeros((alto, w), np.uint8)
+            rell = np.zeros((alto, w), np.uint8)
+            self._texto_en(cont, rell, c, _TS_PAD)
+            self._glifos[c] = (cont, rell, self._avance(c))
 
-    # Fondo semitransparente para legibilidad
-    overlay = frame.copy()
-    cv2.rectangle(overlay, (x - 8, y - th - 8), (x + tw + 8, y + 8), (0, 0, 0), -1)
-    alpha = 0.45
-    cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
+        self._factor = np.empty((alto, ancho, 1), np.float32)
+        self._suma = np.empty((alto, ancho, 3), np.float32)
+        self._buf = np.empty((alto, ancho, 3), np.float32)
+        self._texto = None
+
+    def _texto_en(self, contorno, relleno, texto, x):
+        org = (x, self.origen[1])
+        cv2.putText(contorno, texto, org, _TS_FUENTE, _TS_ESCALA, 255, _TS_GROSOR + 2, cv2.LINE_AA)
+        cv2.putText(relleno, texto, org, _TS_FUENTE, _TS_ESCALA, 255, _TS_GROSOR, cv2.LINE_AA)
+
+    @staticmethod
+    def _avance(texto):
+        """Desplazamiento horizontal que putText aplica después de 'texto'."""
+        if not texto:
+            return 0
+        return cv2.getTextSize(texto, _TS_FUENTE, _TS_ESCALA, _TS_GROSOR)[0][0] - _TS_GROSOR
+
+    def _componer(self, hms):
+        np.copyto(self._contorno, self._base[0])
+        np.copyto(self._relleno, self._base[1])
+        x = self._x_hora
+        ancho = self._contorno.shape[1]
+        for c in hms:
+            cont, rell, avance = self._glifos[c]
+            x0 = x - _TS_PAD
+            w = min(cont.shape[1], ancho - x0)
+            if w > 0:
+                destino = np.s_[:, x0:x0 + w]
+                np.maximum(self._contorno[destino], cont[:, :w], out=self._contorno[destino])
+                np.maximum(self._relleno[destino], rell[:, :w], out=self._relleno[destino])
+            x += avance
+        # fondo * (1 - alfa) -> contorno negro encima -> relleno de color encima
+        a_cont = self._contorno.astype(np.float32) / 255
+        a_rell = self._relleno.astype(np.float32) / 255
+        self._factor[..., 0] = (1 - _TS_ALFA) * (1 - a_cont) * (1 - a_rell)
+        np.multiply(a_rell[..., None], np.array(_TS_COLOR, np.float32), out=self._suma)
+        self._suma += 0.5  # redondeo al volver a uint8
+        self._texto = hms
+
+    def zona(self, frame):
+        """(filas, columnas) del frame que toca el overlay (para respaldarlas)."""
+        H, W = frame.shape[:2]
+        return slice(self.y0, min(self.y1, H)), slice(self.x0, min(self.x1, W))
+
+    def aplicar(self, frame, segundos):
+        hms = time.strftime("%H:%M:%S", time.gmtime(segundos))
+        if hms != self._texto:
+            self._componer(hms)
+        filas, columnas = self.zona(frame)
+        roi = frame[filas, columnas]
+        h, w = roi.shape[:2]
+        if h <= 0 or w <= 0:
+            return frame
+        buf = self._buf[:h, :w]
+        np.multiply(roi, self._factor[:h, :w], out=buf)
+        buf += self._suma[:h, :w]
+        np.copyto(roi, buf, casting="unsafe")
+        return frame
+
+
+_rotulos = threading.local()  # un RotuloTiempo por hilo y prefijo (tienen buffers propios)
+
+
+def _rotulo(prefix):
+    cache = _rotulos.__dict__.setdefault("por_prefijo", {})
+    if prefix not in cache:
+        cache[prefix] = RotuloTiempo(prefix)
+    return cache[prefix]
+
+
+def timestamp_frame(frame, segundos, prefix=_TS_PREFIJO):
+    """
+    Dibuja el tiempo HH:MM:SS del video (según 'segundos') en la esquina superior izquierda.
+    Si 'prefix' no es None, antepone ese texto (p. ej., 'Tiempo del video original: ').
+    Modifica el frame in-place (solo el rectángulo del texto, ver RotuloTiempo).
+    """
+    return _rotulo(prefix).aplicar(frame, segundos)
 
-    # Texto (contorno + relleno)
-    cv2.putText(frame, text, (x, y), font, font_scale, (0, 0, 0), thickness + 2, cv2.LINE_AA)
-    cv2.putText(frame, text, (x, y), font, font_scale, (0, 255, 0), thickness, cv2.LINE_AA)
 
-    return frame
+def zona_timestamp(frame, prefix=_TS_PREFIJO):
+    """(filas, columnas) que modifica timestamp_frame en este frame."""
+    return _rotulo(prefix).zona(frame)
 
 # Convierte un video cualquiera en un video compatible para la web
 def asegurar_video_web(input_path):
     """
     Convierte un video a un formato compatible con navegadores web usando FFmpeg.
+    Si ya lo es (lo que produce el pipeline: ver codificador.es_video_web), devuelve
+    el mismo path sin re-codificar.
     """
+    if es_video_web(input_path):
+        return input_path
     web_compatible_path = input_path.with_name(f"{input_path.stem}_web.mp4")
     cmd = [
         "ffmpeg", "-y", "-i", str(input_path),
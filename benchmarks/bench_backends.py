@@ -0,0 +1,121 @@
+# benchmarks/bench_backends.py
+"""
+Latencia y concordancia de cada backend de inferencia contra el modelo actual
+(yolov8m, 640, PyTorch) sobre un conjunto fijo de clips.
+
+Para cada variante "tamaño:imgsz:runtime[:int8]" informa ms/frame (en lotes) y,
+como proxy de mAP, precisión / recall / F1 de sus cajas contra las del modelo de
+referencia (misma clase, IoU >= --iou). La primera corrida de cada variante
+ONNX/OpenVINO incluye la exportación (queda cacheada en MODELOS_DIR).
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_backends clip1.mp4 clip2.mp4 \\
+        [--variantes m:640:onnx,m:640:openvino,m:640:openvino:int8,s:640:pytorch,n:640:pytorch] \\
+        [--frames 64] [--lote 8]
+"""
+import argparse
+import time
+
+import cv2
+
+from app.processing.deteccion import detectar_lote
+from app.utils.modelo import cargar_modelo, nombre_modelo
+
+REFERENCIA = "m:640:pytorch"
+VARIANTES = "m:640:onnx,m:640:openvino,m:640:openvino:int8,s:640:pytorch,n:640:pytorch"
+
+
+def leer_variante(texto):
+    partes = texto.split(":")
+    if len(partes) not in (3, 4):
+        raise Exception(f"Variante inválida: {texto} (formato tamaño:imgsz:runtime[:int8])")
+    return {"tamanio": partes[0], "imgsz": int(partes[1]), "runtime": partes[2],
+            "int8": len(partes) == 4 and partes[3] == "int8"}
+
+
+def muestrear(clips, n):
+    """n frames repartidos uniformemente a lo largo de cada clip."""
+    frames = []
+    for clip in clips:
+        cap = cv2.VideoCapture(clip)
+        if not cap.isOpened():
+            raise Exception(f"No se pudo abrir el video: {clip}")
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or n
+        for i in range(n):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, i * total // n)
+            ret, frame = cap.read()
+            if ret:
+                frames.append(frame)
+        cap.release()
+    return frames
+
+
+def correr(opciones, frames, lote):
+    modelo = cargar_modelo(**opciones)
+    detectar_lote(frames[:lote], modelo=modelo, imgsz=opciones["imgsz"])  # calentamiento
+    cajas = []
+    t0 = time.perf_counter()
+    for i in range(0, len(frames), lote):
+        cajas.extend(detectar_lote(frames[i:i + lote], modelo=modelo, imgsz=opciones["imgsz"]))
+    return cajas, (time.perf_counter() - t0) / len(frames) * 1000
+
+
+def iou(a, b):
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def concordancia(referencia, candidata, umbral_iou):
+    """(precisión, recall, F1) con emparejamiento voraz por clase e IoU."""
+    vp = total_ref = total_cand = 0
+    for ref, cand in zip(referencia, candidata):
+        total_ref += len(ref)
+        total_cand += len(cand)
+        libres = list(cand)
+        for caja in sorted(ref, key=lambda c: -c[5]):
+            mejor = max((c for c in libres if c[0] == caja[0]),
+                        key=lambda c: iou(c[1:5], caja[1:5]), default=None)
+            if mejor is not None and iou(mejor[1:5], caja[1:5]) >= umbral_iou:
+                libres.remove(mejor)
+                vp += 1
+    precision = vp / total_cand if total_cand else 1.0
+    recall = vp / total_ref if total_ref else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("clips", nargs="+")
+    parser.add_argument("--variantes", default=VARIANTES)
+    parser.add_argument("--frames", type=int, default=64, help="frames por clip")
+    parser.add_argument("--lote", type=int, default=8)
+    parser.add_argument("--iou", type=float, default=0.5)
+    args = parser.parse_args()
+
+    frames = muestrear(args.clips, args.frames)
+    if not frames:
+        raise Exception("No se pudo leer ningún frame de los clips")
+
+    ref = leer_variante(REFERENCIA)
+    cajas_ref, ms_ref = correr(ref, frames, args.lote)
+    print(f"🎞️ {len(frames)} frames de {len(args.clips)} clips, lote={args.lote}")
+    print(f"  {nombre_modelo(**ref):<28} {ms_ref:8.1f} ms/frame  (referencia)")
+
+    for texto in args.variantes.split(","):
+        opciones = leer_variante(texto.strip())
+        try:
+            cajas, ms = correr(opciones, frames, args.lote)
+        except Exception as e:
+            print(f"  {texto:<28} ⚠️ no disponible: {e}")
+            continue
+        p, r, f1 = concordancia(cajas_ref, cajas, args.iou)
+        print(f"  {nombre_modelo(**opciones):<28} {ms:8.1f} ms/frame  x{ms_ref / ms:4.2f}  "
+              f"P={p:.3f} R={r:.3f} F1={f1:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# benchmarks/bench_calibracion.py
+"""
+Chequeo de regresión del umbral SSIM: calibración incremental (una pasada)
+contra calcular_ssim_promedio (dos pasadas). Falla (exit 1) si algún video
+supera la tolerancia. El incremental sale del mismo bucle que procesar_video
+(_siguiente_candidato: 320x240 y SSIM_MOTOR), así que la diferencia medida es la
+que hay en producción entre los dos modos. Lo corre también tests/test_calibracion.py
+sobre clips sintéticos.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_calibracion video1.mp4 [video2.mp4 ...] [--step 2] [--tol 0.03]
+"""
+import argparse
+import sys
+import time
+
+import cv2
+
+from app.config import SSIM_CALIBRACION_MUESTRAS, SSIM_MOTOR
+from app.processing.cambios import crear_detector_cambios
+from app.processing.processing import _EstadoSeleccion, _FuenteFrames, _siguiente_candidato
+from app.utils.instrumentacion import Perfil
+from app.utils.utils import calcular_ssim_promedio, ajustar_umbral, CalibradorSSIM
+
+
+def umbral_dos_pasadas(video_path, step):
+    promedio, desviacion = calcular_ssim_promedio(video_path, step=step)
+    return ajustar_umbral(promedio, desviacion)
+
+
+def umbral_incremental(video_path, step, muestras):
+    """Umbral que congela el bucle de procesar_video (sin detección activa, salteo fijo)."""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception(f"No se pudo abrir el video: {video_path}")
+    fuente = _FuenteFrames(cap)
+    estado = _EstadoSeleccion(CalibradorSSIM(muestras=muestras), salto=step)
+    detector = crear_detector_cambios(SSIM_MOTOR)
+    perfil = Perfil()
+    while not estado.calibrador.congelado:
+        frame, _ = _siguiente_candidato(estado, fuente, step, detector, perfil)
+        if frame is None:
+            break
+    cap.release()
+    return estado.calibrador.umbral
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("--step", type=int, default=2)
+    parser.add_argument("--muestras", type=int, default=SSIM_CALIBRACION_MUESTRAS)
+    parser.add_argument("--tol", type=float, default=0.03)
+    args = parser.parse_args()
+
+    fallas = 0
+    for video in args.videos:
+        t0 = time.perf_counter()
+        u2 = umbral_dos_pasadas(video, args.step)
+        t1 = time.perf_counter()
+        u1 = umbral_incremental(video, args.step, args.muestras)
+        t2 = time.perf_counter()
+        dif = abs(u1 - u2)
+        ok = dif <= args.tol
+        fallas += not ok
+        print(f"{'✅' if ok else '❌'} {video}: dos_pasadas={u2:.4f} ({t1 - t0:.2f}s) "
+              f"incremental={u1:.4f} ({t2 - t1:.2f}s) |Δ|={dif:.4f}")
+
+    sys.exit(1 if fallas else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# benchmarks/bench_escalado.py
+"""
+Curva de escalado de procesar_en_paralelo: tiempo total con 1, 2, ... N workers
+(tamaño de chunk automático según la duración y los workers), speedup contra 1
+worker y eficiencia (speedup / workers).
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_escalado ruta/al/video.mp4 [--max-procesos 8] [--step 2]
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from app.processing.processing import procesar_video
+from app.utils.metadatos import metadatos
+from app.utils.paralelo import cerrar_pool, obtener_pool, planificar_chunks, procesar_en_paralelo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video")
+    parser.add_argument("--max-procesos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--step", type=int, default=2)
+    args = parser.parse_args()
+
+    duracion = metadatos(args.video)["duracion_seg"]
+    base = None
+    print(f"🎞️ {duracion / 60:.1f} min, {os.cpu_count()} núcleos")
+    print(" workers  chunk(s)     tiempo   speedup  eficiencia")
+    niveles, n = [], 1
+    while n < args.max_procesos:
+        niveles.append(n)
+        n *= 2
+    niveles.append(args.max_procesos)
+    for procesos in niveles:
+        obtener_pool(procesos)  # el arranque del pool (carga del modelo) queda fuera de la medición
+        with tempfile.TemporaryDirectory() as tmp:
+            t0 = time.perf_counter()
+            procesar_en_paralelo(procesar_video, args.video, str(Path(tmp) / "salida.mp4"),
+                                 step=args.step, procesos=procesos, work_dir=tmp)
+            seg = time.perf_counter() - t0
+        base = base or seg
+        print(f" {procesos:7d}  {planificar_chunks(duracion, procesos):8d}  {seg:8.1f}s  "
+              f"{base / seg:7.2f}x  {base / seg / procesos:9.0%}")
+    cerrar_pool()
+
+
+if __name__ == "__main__":
+    main()
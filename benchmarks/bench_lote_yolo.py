@@ -0,0 +1,74 @@
+# benchmarks/bench_lote_yolo.py
+"""
+Compara frames/seg de la etapa YOLO según el tamaño de lote.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_lote_yolo ruta/al/video.mp4 [--frames 128] [--completo]
+
+--completo corre además procesar_video entero con cada tamaño de lote.
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+
+from app.processing.deteccion import detectar_lote
+from app.processing.processing import procesar_video
+
+TAMANIOS = [1, 4, 8, 16]
+
+
+def leer_frames(video_path, n):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception(f"No se pudo abrir el video: {video_path}")
+    frames = []
+    while len(frames) < n:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def medir_deteccion(frames, lote):
+    detectar_lote(frames[:lote])  # calentamiento
+    t0 = time.perf_counter()
+    for i in range(0, len(frames), lote):
+        detectar_lote(frames[i:i + lote])
+    return len(frames) / (time.perf_counter() - t0)
+
+
+def medir_completo(video_path, lote):
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        _, guardados = procesar_video(video_path, str(Path(tmp) / "salida.mp4"), step=2, lote=lote)
+        return guardados, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video")
+    parser.add_argument("--frames", type=int, default=128)
+    parser.add_argument("--completo", action="store_true")
+    args = parser.parse_args()
+
+    frames = leer_frames(args.video, args.frames)
+    if not frames:
+        raise Exception("El video no tiene frames legibles")
+
+    print(f"🎞️ {len(frames)} frames de {args.video}")
+    for lote in TAMANIOS:
+        print(f"  lote={lote:>2}: {medir_deteccion(frames, lote):7.2f} frames/seg (solo YOLO)")
+
+    if args.completo:
+        for lote in TAMANIOS:
+            guardados, seg = medir_completo(args.video, lote)
+            print(f"  lote={lote:>2}: {seg:7.2f} s totales, {guardados} frames guardados")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# benchmarks/bench_memoria.py
+"""
+Memoria y asignaciones del camino por frame.
+
+1) Micro: por llamada, tiempo y pico de memoria transitoria (tracemalloc) del overlay de tiempo
+   (implementación anterior: copia del frame + addWeighted completo + putText, contra
+   RotuloTiempo) y de la reducción para el SSIM (resize + cvtColor nuevos por frame,
+   contra los anillos de _Reduccion).
+2) Macro: procesar_video sobre un clip largo (por defecto uno sintético de 10 min a
+   1080p, ver benchmarks/sinteticos.py): frames/s y pico de RSS en un proceso aparte,
+   y pico de memoria de Python/NumPy con tracemalloc en otra corrida.
+
+Para el "antes" del macro: correrlo en el commit anterior con los mismos argumentos.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_memoria [video.mp4] [--simulado] [--minutos 10] [--sin-macro]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from app.config import PREFILTRO_TAMANIO
+from app.processing.processing import _Reduccion, procesar_video
+from app.utils.instrumentacion import Perfil
+from app.utils.utils import timestamp_frame
+from benchmarks.sinteticos import clip_cacheado, instalar_modelo_simulado
+from benchmarks.suite import _salto, correr_aislado
+
+
+def timestamp_anterior(frame, segundos, prefix="Tiempo del video original: "):
+    """timestamp_frame tal como era antes (referencia)."""
+    text = f"{prefix}{time.strftime('%H:%M:%S', time.gmtime(segundos))}"
+    font, font_scale, thickness, margin = cv2.FONT_HERSHEY_SIMPLEX, 0.9, 2, 10
+    (tw, th), _ = cv2.getTextSize(text, font, font_scale, thickness)
+    x, y = margin, margin + th
+    overlay = frame.copy()
+    cv2.rectangle(overlay, (x - 8, y - th - 8), (x + tw + 8, y + 8), (0, 0, 0), -1)
+    cv2.addWeighted(overlay, 0.45, frame, 0.55, 0, frame)
+    cv2.putText(frame, text, (x, y), font, font_scale, (0, 0, 0), thickness + 2, cv2.LINE_AA)
+    cv2.putText(frame, text, (x, y), font, font_scale, (0, 255, 0), thickness, cv2.LINE_AA)
+    return frame
+
+
+def reduccion_anterior(frame):
+    small = cv2.cvtColor(cv2.resize(frame, (320, 240)), cv2.COLOR_BGR2GRAY)
+    return small, cv2.resize(small, PREFILTRO_TAMANIO, interpolation=cv2.INTER_AREA)
+
+
+def por_llamada(funcion, frames, n):
+    """
+    (µs por llamada, KB de pico transitorio por llamada): lo que una llamada pide
+    al allocator por encima de lo que ya estaba vivo (arrays temporales de NumPy/cv2).
+    """
+    funcion(frames[0])  # calentamiento (cachés, buffers)
+    t0 = time.perf_counter()
+    for i in range(n):
+        funcion(frames[i % len(frames)])
+    us = (time.perf_counter() - t0) / n * 1e6
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    for i in range(n):
+        funcion(frames[i % len(frames)])
+    pico = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return us, pico / 1024
+
+
+def micro(n):
+    rng = np.random.default_rng(0)
+    print(f"{'':<28} {'µs/frame':>10} {'KB pico':>10}")
+    for nombre, (w, h) in {"1080p": (1920, 1080), "4K": (3840, 2160)}.items():
+        frames = [rng.integers(0, 255, (h, w, 3), dtype=np.uint8) for _ in range(4)]
+        reduccion = _Reduccion(128, PREFILTRO_TAMANIO)
+        casos = {
+            f"overlay anterior {nombre}": lambda f: timestamp_anterior(f, time.time()),
+            f"overlay nuevo {nombre}": lambda f: timestamp_frame(f, time.time()),
+            f"reducción anterior {nombre}": reduccion_anterior,
+            f"reducción nueva {nombre}": reduccion.reducir,
+        }
+        for caso, funcion in casos.items():
+            us, kb = por_llamada(funcion, frames, n)
+            print(f"{caso:<28} {us:10.1f} {kb:10.1f}")
+
+
+def _procesar(clip, con_tracemalloc):
+    perfil = Perfil()
+    if con_tracemalloc:
+        tracemalloc.start()
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        procesar_video(clip, os.path.join(tmp, "salida.mp4"), perfil=perfil, **_salto())
+        segundos = time.perf_counter() - t0
+    resultado = {"frames": perfil.contadores["frames_leidos"], "segundos": segundos}
+    if con_tracemalloc:
+        resultado["tracemalloc_pico_mb"] = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        tracemalloc.stop()
+    return resultado
+
+
+def macro(clip):
+    normal = correr_aislado(lambda c, _: _procesar(c, False), clip, None)
+    traza = correr_aislado(lambda c, _: _procesar(c, True), clip, None)
+    for r in (normal, traza):
+        if "error" in r:
+            raise Exception(r["error"])
+    print(f"🎞️ {Path(clip).name}: {normal['frames']} frames en {normal['segundos']:.1f} s "
+          f"= {normal['frames'] / normal['segundos']:.1f} frames/s, pico RSS {normal['rss_pico_mb']:.0f} MB, "
+          f"pico tracemalloc {traza['tracemalloc_pico_mb']:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video", nargs="?")
+    parser.add_argument("--simulado", action="store_true", help="detector simulado (sin pesos de YOLO)")
+    parser.add_argument("--minutos", type=int, default=10, help="duración del clip sintético")
+    parser.add_argument("--llamadas", type=int, default=200)
+    parser.add_argument("--sin-macro", action="store_true")
+    parser.add_argument("--clips-dir", default=str(Path(tempfile.gettempdir()) / "bench_cctv"))
+    args = parser.parse_args()
+
+    micro(args.llamadas)
+    if args.sin_macro:
+        return
+    if args.simulado:
+        instalar_modelo_simulado()
+    clip = args.video or clip_cacheado(args.clips_dir, f"largo_{args.minutos}min_1080p",
+                                       1920, 1080, args.minutos * 60, "eventos")
+    macro(clip)
+
+
+if __name__ == "__main__":
+    main()
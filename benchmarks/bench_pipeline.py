@@ -0,0 +1,53 @@
+# benchmarks/bench_pipeline.py
+"""
+Frames/seg de procesar_video en serie (hilos=False) vs. con el pipeline de hilos
+(decodificador -> SSIM/YOLO -> overlay/encoder con colas acotadas).
+frames/seg = frames leídos del original / tiempo total. Conviene correrlo en la
+máquina objetivo (p. ej. 4 núcleos) con un video de unos minutos.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_pipeline ruta/al/video.mp4 [--step 2] [--repeticiones 2]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from app.processing.processing import procesar_video
+from app.utils.instrumentacion import Perfil
+
+
+def medir(video_path, step, hilos):
+    perfil = Perfil()
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        procesar_video(video_path, str(Path(tmp) / "salida.mp4"), step=step, hilos=hilos, perfil=perfil)
+        seg = time.perf_counter() - t0
+    return perfil.contadores["frames_leidos"] / seg, seg, perfil.tiempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video")
+    parser.add_argument("--step", type=int, default=2)
+    parser.add_argument("--repeticiones", type=int, default=2)
+    args = parser.parse_args()
+
+    medir(args.video, args.step, hilos=False)  # calentamiento (carga del modelo, caché de disco)
+    resultados = {}
+    for hilos in (False, True):
+        nombre = "hilos" if hilos else "serie"
+        mejor = None
+        for _ in range(args.repeticiones):
+            fps, seg, tiempos = medir(args.video, args.step, hilos)
+            if mejor is None or fps > mejor[0]:
+                mejor = (fps, seg, tiempos)
+        resultados[nombre] = mejor[0]
+        etapas = ", ".join(f"{k}={v:.1f}s" for k, v in sorted(mejor[2].items()))
+        print(f"⏱️ {nombre:>5}: {mejor[0]:7.1f} frames/s ({mejor[1]:.1f} s) — {etapas}")
+
+    print(f"🚀 Ganancia del pipeline con hilos: {resultados['hilos'] / resultados['serie']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
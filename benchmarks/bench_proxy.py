@@ -0,0 +1,108 @@
+# benchmarks/bench_proxy.py
+"""
+Throughput de decodificación para el análisis: frames/s que llegan al SSIM/YOLO
+con decodificación completa (cv2 a resolución original + resize al tamaño del
+proxy, como sin ANALISIS_PROXY) contra el proxy de ffmpeg (DecodificadorProxy),
+solo y con el original recorrido a la par (grab, y retrieve de una fracción
+--conservados de los frames, como los que se escriben en la salida).
+
+Sin clips se generan dos sintéticos (testsrc2, H.264) de --segundos a 1080p y 4K.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_proxy [clip1.mp4 clip2.mp4] [--segundos 10] [--conservados 0.2]
+"""
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+
+import cv2
+
+from app.config import ANALISIS_PROXY_ANCHO
+from app.utils.lector import DecodificadorProxy, FramesCompletos
+from app.utils.metadatos import metadatos
+
+RESOLUCIONES = {"1080p": (1920, 1080), "4K": (3840, 2160)}
+
+
+def generar_clip(path, w, h, segundos):
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={w}x{h}:rate=30:duration={segundos}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", str(path)
+    ]
+    subprocess.run(cmd, check=True)
+
+
+def medir(funcion):
+    t0 = time.perf_counter()
+    frames = funcion()
+    return frames / (time.perf_counter() - t0)
+
+
+def completo(clip, pw, ph):
+    cap = cv2.VideoCapture(clip)
+    n = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        cv2.resize(frame, (pw, ph), interpolation=cv2.INTER_LINEAR)
+        n += 1
+    cap.release()
+    return n
+
+
+def proxy(clip, pw, ph, conservados=None):
+    dec = DecodificadorProxy(clip, pw, ph, buffers=8)
+    orig = FramesCompletos(cv2.VideoCapture(clip)) if conservados is not None else None
+    cada = round(1 / conservados) if conservados else 0
+    n = 0
+    while True:
+        ret, _ = dec.read()
+        if not ret:
+            break
+        if orig is not None and cada and n % cada == 0:
+            orig.frame(n)
+        n += 1
+    dec.release()
+    if orig is not None:
+        orig.release()
+    return n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("clips", nargs="*")
+    parser.add_argument("--segundos", type=int, default=10)
+    parser.add_argument("--conservados", type=float, default=0.2,
+                        help="fracción de frames que se piden a resolución original")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        clips = args.clips
+        if not clips:
+            clips = []
+            for nombre, (w, h) in RESOLUCIONES.items():
+                path = os.path.join(tmp, f"sintetico_{nombre}.mp4")
+                print(f"🎞️ Generando clip sintético {nombre} ({args.segundos} s)...")
+                generar_clip(path, w, h, args.segundos)
+                clips.append(path)
+
+        print(f"{'clip':<24} {'resolución':>11} {'completo':>10} {'proxy':>10} {'proxy+orig':>11}  (frames/s)")
+        for clip in clips:
+            meta = metadatos(clip)
+            w, h = meta["ancho"], meta["alto"]
+            pw = min(ANALISIS_PROXY_ANCHO, w)
+            ph = max(2, round(h * pw / w / 2) * 2)
+            fps_completo = medir(lambda: completo(clip, pw, ph))
+            fps_proxy = medir(lambda: proxy(clip, pw, ph))
+            fps_mixto = medir(lambda: proxy(clip, pw, ph, args.conservados))
+            print(f"{os.path.basename(clip)[:24]:<24} {f'{w}x{h}':>11} {fps_completo:10.1f} "
+                  f"{fps_proxy:10.1f} {fps_mixto:11.1f}  x{fps_proxy / fps_completo:.2f} / "
+                  f"x{fps_mixto / fps_completo:.2f}")
+
+
+if __name__ == "__main__":
+    main()
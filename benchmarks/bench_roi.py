@@ -0,0 +1,115 @@
+# benchmarks/bench_roi.py
+"""
+YOLO por regiones de cambio (ROI) contra YOLO en el frame completo.
+Toma pares de frames consecutivos (con salto 'step'), se queda con los que el
+SSIM marca como cambiados y sobre esos compara:
+  - recall: cajas del frame completo que la pasada ROI también encuentra
+    (misma clase, IoU >= --iou). Se informa sobre todas las cajas y sobre las
+    que tocan alguna región con cambio (objetos en movimiento);
+  - tiempo de YOLO de cada modo y la fracción de frames que cayó a frame completo.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_roi ruta/al/video.mp4 [--frames 200] [--step 2] [--lote 8]
+"""
+import argparse
+import time
+
+import cv2
+
+from app.config import YOLO_ROI_PADDING, YOLO_ROI_MAX_AREA
+from app.processing.cambios import DetectorCambios, regiones_cambio
+from app.processing.deteccion import detectar_lote, detectar_lote_roi
+from app.utils.utils import CalibradorSSIM, calcular_ssim_promedio
+
+
+def frames_con_cambio(video_path, n, step, umbral):
+    """Frames (BGR completos) que pasan el SSIM, con su máscara de cambio."""
+    detector = DetectorCambios()
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception(f"No se pudo abrir el video: {video_path}")
+    prev, salida = None, []
+    while len(salida) < n:
+        for _ in range(step - 1):
+            cap.grab()
+        ret, frame = cap.read()
+        if not ret:
+            break
+        small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (320, 240))
+        if prev is not None:
+            mascara = detector.mascara(prev, small, umbral)
+            if mascara.any():
+                salida.append((frame, mascara))
+        prev = small
+    cap.release()
+    return salida
+
+
+def iou(a, b):
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def toca(caja, regiones):
+    return any(caja[0] < r[2] and r[0] < caja[2] and caja[1] < r[3] and r[1] < caja[3] for r in regiones)
+
+
+def por_lotes(func, lote, *listas):
+    resultados = []
+    for i in range(0, len(listas[0]), lote):
+        resultados.extend(func(*(l[i:i + lote] for l in listas)))
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--step", type=int, default=2)
+    parser.add_argument("--lote", type=int, default=8)
+    parser.add_argument("--iou", type=float, default=0.5)
+    args = parser.parse_args()
+
+    promedio, desviacion = calcular_ssim_promedio(args.video, step=args.step)
+    umbral = CalibradorSSIM.fijo(promedio, desviacion).umbral
+    muestras = frames_con_cambio(args.video, args.frames, args.step, umbral)
+    if not muestras:
+        raise Exception("Ningún frame pasó el SSIM: no hay nada que comparar")
+    frames = [f for f, _ in muestras]
+    regiones = [regiones_cambio(m, f.shape, padding=YOLO_ROI_PADDING, max_area=YOLO_ROI_MAX_AREA)
+                for f, m in muestras]
+
+    detectar_lote(frames[:args.lote])  # calentamiento
+    t0 = time.perf_counter()
+    completas = por_lotes(detectar_lote, args.lote, frames)
+    seg_completo = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    por_roi = por_lotes(detectar_lote_roi, args.lote, frames, regiones)
+    seg_roi = time.perf_counter() - t0
+
+    total = encontradas = total_mov = encontradas_mov = 0
+    for ref, cand, rois in zip(completas, por_roi, regiones):
+        for caja in ref:
+            ok = any(c[0] == caja[0] and iou(c[1:5], caja[1:5]) >= args.iou for c in cand)
+            total += 1
+            encontradas += ok
+            if rois is None or toca(caja[1:5], rois):
+                total_mov += 1
+                encontradas_mov += ok
+
+    con_roi = sum(r is not None for r in regiones)
+    print(f"🎞️ {len(frames)} frames con cambio (umbral={umbral:.4f}); "
+          f"{con_roi} por ROI, {len(frames) - con_roi} cayeron a frame completo")
+    print(f"⏱️ YOLO frame completo: {seg_completo:.2f} s | ROI: {seg_roi:.2f} s "
+          f"(x{seg_completo / seg_roi:.2f})")
+    if total:
+        print(f"🎯 recall ROI: {encontradas / total:.1%} de {total} cajas")
+    if total_mov:
+        print(f"🎯 recall ROI en zonas con cambio: {encontradas_mov / total_mov:.1%} de {total_mov} cajas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# benchmarks/bench_salida.py
+"""
+Tiempo total y pico de disco de procesar_video sobre un video.
+El pico se mide muestreando el tamaño del directorio de salida mientras corre
+(incluye cualquier temporal que el pipeline escriba ahí).
+
+Uso (desde la raíz del repo; correrlo en cada revisión a comparar):
+    python -m benchmarks.bench_salida ruta/al/video.mp4 [--step 2]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from app.processing.processing import procesar_video
+
+
+def tamanio_dir(path):
+    total = 0
+    for raiz, _, archivos in os.walk(path):
+        for nombre in archivos:
+            try:
+                total += os.path.getsize(os.path.join(raiz, nombre))
+            except OSError:
+                pass  # temporal borrado entre el listado y el stat
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video")
+    parser.add_argument("--step", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pico = [0]
+        corriendo = threading.Event()
+        corriendo.set()
+
+        def muestrear():
+            while corriendo.is_set():
+                pico[0] = max(pico[0], tamanio_dir(tmp))
+                time.sleep(0.05)
+
+        hilo = threading.Thread(target=muestrear, daemon=True)
+        hilo.start()
+        t0 = time.perf_counter()
+        salida, guardados = procesar_video(args.video, str(Path(tmp) / "salida.mp4"), step=args.step)
+        seg = time.perf_counter() - t0
+        corriendo.clear()
+        hilo.join()
+        pico[0] = max(pico[0], tamanio_dir(tmp))
+        final = os.path.getsize(salida)
+
+    print(f"⏱️ {seg:.2f} s totales, {guardados} frames guardados")
+    print(f"💾 pico de disco {pico[0] / 1e6:.1f} MB (salida final {final / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
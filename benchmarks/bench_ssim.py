@@ -0,0 +1,88 @@
+# benchmarks/bench_ssim.py
+"""
+Microbenchmark del detector de cambios: skimage (full=True) contra el motor
+cv2/float32 con corte temprano. Verifica también que las decisiones
+conservar/descartar coincidan en cada par de frames.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_ssim [video.mp4] [--pares 300] [--umbral 0.85] [--step 2]
+
+Sin video se usan pares sintéticos (ruido + un bloque que se desplaza).
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from app.processing.cambios import DetectorCambios, DetectorCambiosSkimage
+
+
+def pares_video(video_path, n, step):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception(f"No se pudo abrir el video: {video_path}")
+    prev, pares = None, []
+    while len(pares) < n:
+        for _ in range(step - 1):
+            cap.grab()
+        ret, frame = cap.read()
+        if not ret:
+            break
+        small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (320, 240))
+        if prev is not None:
+            pares.append((prev, small))
+        prev = small
+    cap.release()
+    return pares
+
+
+def pares_sinteticos(n, seed=0):
+    rng = np.random.default_rng(seed)
+    fondo = rng.integers(60, 180, (240, 320), dtype=np.uint8)
+    pares = []
+    for i in range(n):
+        a = cv2.add(fondo, rng.integers(0, 4, fondo.shape, dtype=np.uint8))
+        b = cv2.add(fondo, rng.integers(0, 4, fondo.shape, dtype=np.uint8))
+        if i % 3 == 0:  # un tercio de los pares con movimiento
+            x = (i * 7) % 280
+            cv2.rectangle(b, (x, 100), (x + 30, 140), 255, -1)
+        pares.append((a, b))
+    return pares
+
+
+def medir(func, pares, umbral):
+    t0 = time.perf_counter()
+    decisiones = [func(a, b, umbral) for a, b in pares]
+    return decisiones, (time.perf_counter() - t0) / len(pares) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video", nargs="?")
+    parser.add_argument("--pares", type=int, default=300)
+    parser.add_argument("--umbral", type=float, default=0.85)
+    parser.add_argument("--step", type=int, default=2)
+    args = parser.parse_args()
+
+    pares = pares_video(args.video, args.pares, args.step) if args.video else pares_sinteticos(args.pares)
+    if not pares:
+        raise Exception("No hay pares de frames para medir")
+
+    sk = DetectorCambiosSkimage()
+    rapido = DetectorCambios()
+
+    dec_sk, ms_sk = medir(sk.hay_cambio, pares, args.umbral)
+    dec_rap, ms_rap = medir(rapido.hay_cambio, pares, args.umbral)
+    _, ms_mapa = medir(lambda a, b, _u: rapido.mapa(a, b), pares, args.umbral)
+
+    difs = sum(x != y for x, y in zip(dec_sk, dec_rap))
+    print(f"🎞️ {len(pares)} pares, umbral={args.umbral}, conservados={sum(dec_sk)}")
+    print(f"  skimage full=True : {ms_sk:7.3f} ms/par")
+    print(f"  rapido (mapa)     : {ms_mapa:7.3f} ms/par")
+    print(f"  rapido (corte)    : {ms_rap:7.3f} ms/par  (x{ms_sk / ms_rap:.1f})")
+    print(f"  decisiones distintas: {difs}")
+
+
+if __name__ == "__main__":
+    main()
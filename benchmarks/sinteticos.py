@@ -0,0 +1,195 @@
+# benchmarks/sinteticos.py
+"""
+Clips sintéticos tipo CCTV, deterministas (misma semilla = mismos frames), y un
+detector simulado para correr el pipeline sin pesos de YOLO.
+
+Cada clip: fondo estático con textura, ruido de sensor, figuras de color
+saturado que cruzan la escena (alargadas = "persona", anchas = "auto") y cambios
+de iluminación graduales, según el escenario.
+"""
+import json
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from app.utils.codificador import CodificadorFFmpeg
+
+VERSION_CLIPS = 1  # subir si cambia la generación (los clips cacheados se regeneran)
+
+ESCENARIOS = {
+    # eventos: figuras que cruzan por minuto; ruido: sigma del sensor; luz: cambios de iluminación por minuto
+    "estatica":    {"eventos": 0,  "ruido": 2.0, "luz": 0},
+    "eventos":     {"eventos": 4,  "ruido": 2.0, "luz": 0},
+    "iluminacion": {"eventos": 2,  "ruido": 3.0, "luz": 3},
+    "trafico":     {"eventos": 20, "ruido": 2.0, "luz": 1},
+}
+
+# Colores saturados (BGR) de las figuras; sin verde, que es el color del overlay de tiempo
+_COLORES = [(0, 0, 230), (230, 60, 0), (0, 200, 255), (200, 0, 200), (0, 120, 255), (255, 200, 0)]
+_MARGEN_RUIDO = 64  # el ruido de cada frame es una ventana desplazada de un único campo precalculado
+
+
+def _fondo(rng, w, h):
+    """Textura de baja frecuencia en gris con algunos bloques ("edificios"), casi sin saturación."""
+    base = rng.integers(70, 170, (max(2, h // 24), max(2, w // 24)), dtype=np.uint8)
+    fondo = cv2.resize(base, (w, h), interpolation=cv2.INTER_CUBIC)
+    for _ in range(12):
+        x, y = int(rng.integers(0, w)), int(rng.integers(0, h))
+        bw, bh = int(rng.integers(w // 20, w // 5)), int(rng.integers(h // 20, h // 4))
+        cv2.rectangle(fondo, (x, y), (x + bw, y + bh), int(rng.integers(40, 210)), -1)
+    fondo = cv2.GaussianBlur(fondo, (0, 0), max(1, w // 400))
+    return cv2.cvtColor(fondo, cv2.COLOR_GRAY2BGR)
+
+
+def _eventos(rng, w, h, segundos, por_minuto):
+    """Figuras que cruzan el cuadro: (inicio, fin, y, alto, ancho, color, sentido)."""
+    eventos = []
+    for _ in range(int(round(por_minuto * segundos / 60))):
+        persona = bool(rng.integers(0, 2))
+        alto = int(h * (rng.uniform(0.15, 0.3) if persona else rng.uniform(0.1, 0.18)))
+        ancho = int(alto * (0.4 if persona else 2.2))
+        duracion = float(rng.uniform(3, 8))
+        inicio = float(rng.uniform(0, max(0.0, segundos - duracion)))
+        y = int(rng.integers(h // 4, max(h // 4 + 1, h - alto)))
+        color = _COLORES[int(rng.integers(0, len(_COLORES)))]
+        eventos.append((inicio, inicio + duracion, y, alto, ancho, color, 1 if rng.integers(0, 2) else -1))
+    return sorted(eventos)
+
+
+def _luces(rng, segundos, por_minuto):
+    """Cambios de iluminación: (inicio, ganancia final); cada uno se aplica en rampa de 2 s."""
+    cambios = [(float(rng.uniform(0, segundos)), float(rng.uniform(0.7, 1.3)))
+               for _ in range(int(round(por_minuto * segundos / 60)))]
+    return sorted(cambios)
+
+
+def _ganancia(t, luces):
+    g = 1.0
+    for inicio, final in luces:
+        if t < inicio:
+            break
+        g = g + (final - g) * min(1.0, (t - inicio) / 2.0)
+    return g
+
+
+def generar_clip(path, w, h, segundos, escenario="eventos", fps=15, semilla=0):
+    """
+    Escribe el clip (H.264, mismos parámetros que la salida del pipeline) y al lado
+    un JSON con su especificación y los eventos (tiempos de cada figura).
+    """
+    params = ESCENARIOS[escenario]
+    rng = np.random.default_rng(semilla)
+    fondo = _fondo(rng, w, h)
+    m = _MARGEN_RUIDO
+    ruido = rng.standard_normal((h + m, w + m, 3), dtype=np.float32) * params["ruido"]
+    suma = np.clip(ruido, 0, 255).astype(np.uint8)
+    resta = np.clip(-ruido, 0, 255).astype(np.uint8)
+    del ruido
+    eventos = _eventos(rng, w, h, segundos, params["eventos"])
+    luces = _luces(rng, segundos, params["luz"])
+
+    out = CodificadorFFmpeg(path, w, h, fps)
+    for i in range(int(segundos * fps)):
+        t = i / fps
+        frame = cv2.convertScaleAbs(fondo, alpha=_ganancia(t, luces))
+        dy, dx = (int(v) for v in rng.integers(0, m, 2))
+        cv2.add(frame, suma[dy:dy + h, dx:dx + w], dst=frame)
+        cv2.subtract(frame, resta[dy:dy + h, dx:dx + w], dst=frame)
+        for inicio, fin, y, alto, ancho, color, sentido in eventos:
+            if inicio <= t < fin:
+                avance = (t - inicio) / (fin - inicio)
+                x = int(-ancho + avance * (w + ancho)) if sentido > 0 else int(w - avance * (w + ancho))
+                if alto > ancho:
+                    cv2.ellipse(frame, (x + ancho // 2, y + alto // 2), (ancho // 2, alto // 2), 0, 0, 360, color, -1)
+                else:
+                    cv2.rectangle(frame, (x, y), (x + ancho, y + alto), color, -1)
+        out.escribir(frame)
+    out.cerrar()
+
+    with open(Path(path).with_suffix(".json"), "w", encoding="utf-8") as f:
+        json.dump({"ancho": w, "alto": h, "segundos": segundos, "escenario": escenario, "fps": fps,
+                   "semilla": semilla, "version": VERSION_CLIPS,
+                   "eventos": [[round(e[0], 3), round(e[1], 3)] for e in eventos]}, f, indent=2)
+    return path
+
+
+def clip_cacheado(directorio, nombre, w, h, segundos, escenario, fps=15, semilla=0):
+    """Path del clip en 'directorio', generándolo solo si no existe todavía."""
+    path = Path(directorio) / f"{nombre}_s{semilla}_v{VERSION_CLIPS}.mp4"
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        print(f"🎞️ Generando {path.name} ({w}x{h}, {segundos} s, {escenario})...")
+        generar_clip(str(path), w, h, segundos, escenario, fps, semilla)
+    return str(path)
+
+
+class _Tensor:
+    def __init__(self, datos):
+        self._datos = datos
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self._datos
+
+
+class _Resultado:
+    def __init__(self, datos):
+        self.boxes = type("Cajas", (), {"data": _Tensor(datos)})()
+
+
+class ModeloSimulado:
+    """
+    Reemplazo de YOLO sin pesos, con la misma interfaz que usa detectar_lote.
+    Reduce cada imagen como el letterbox de YOLO (lado mayor = imgsz) y "detecta"
+    las manchas de color saturado: las figuras de los clips sintéticos (alargadas
+    = persona, anchas = auto). El verde (overlay de tiempo) se ignora.
+    latencia_ms: espera por frame para simular el costo de un modelo real.
+    """
+
+    names = {0: "persona", 2: "auto"}
+
+    def __init__(self, latencia_ms=0.0, sat_min=120, area_min=24):
+        self.latencia_ms = latencia_ms
+        self.sat_min = sat_min
+        self.area_min = area_min
+
+    def __call__(self, frames, imgsz=640, conf=0.25, classes=None, verbose=False):
+        resultados = []
+        for frame in frames:
+            h, w = frame.shape[:2]
+            escala = min(1.0, imgsz / max(h, w))
+            chico = cv2.resize(frame, (max(1, round(w * escala)), max(1, round(h * escala))),
+                               interpolation=cv2.INTER_AREA) if escala < 1.0 else frame
+            hsv = cv2.cvtColor(chico, cv2.COLOR_BGR2HSV)
+            matiz, sat = hsv[..., 0], hsv[..., 1]
+            mascara = ((sat > self.sat_min) & ((matiz < 45) | (matiz > 75))).astype(np.uint8)
+            _, _, stats, _ = cv2.connectedComponentsWithStats(mascara)
+            filas = []
+            for x, y, bw, bh, area in stats[1:]:
+                if area < self.area_min:
+                    continue
+                cls = 0 if bh > bw else 2
+                if classes is not None and cls not in classes:
+                    continue
+                filas.append((x / escala, y / escala, (x + bw) / escala, (y + bh) / escala, 0.9, cls))
+            resultados.append(_Resultado(np.array(filas, np.float32).reshape(-1, 6)))
+        if self.latencia_ms:
+            time.sleep(self.latencia_ms * len(frames) / 1000)
+        return resultados
+
+
+def instalar_modelo_simulado(latencia_ms=0.0):
+    """
+    Deja ModeloSimulado como el modelo del proceso (obtener_modelo ya no carga YOLO).
+    Los workers del pool paralelo lo heredan si se crean por fork.
+    """
+    import multiprocessing
+    import app.utils.utils as utils
+
+    utils._yolo_model = ModeloSimulado(latencia_ms)
+    if "fork" in multiprocessing.get_all_start_methods():
+        multiprocessing.set_start_method("fork", force=True)
@@ -0,0 +1,289 @@
+# benchmarks/suite.py
+"""
+Suite de benchmarks reproducible sobre clips sintéticos tipo CCTV (ver
+benchmarks/sinteticos.py): cada etapa del pipeline por separado y de punta a
+punta, con frames/s, fracción de frames conservados, pico de RSS y tiempo total.
+
+Etapas:
+  decodificacion  cv2 lee todos los frames
+  compuerta       prefiltro + SSIM (+ salteo) sin YOLO: frames candidatos / leídos
+  deteccion       detectar_lote sobre los primeros --frames-deteccion frames
+  codificacion    CodificadorFFmpeg con --frames-codificacion frames
+  completo        procesar_video con la configuración actual
+  paralelo        procesar_en_paralelo (solo clips más largos que PARALELO_MIN_MINUTOS)
+
+Cada (clip, etapa) corre en un proceso aparte (fork), así el pico de RSS es el de
+esa etapa. El resultado va a un JSON; con --base se compara contra una corrida
+anterior y el comando sale con código 1 si alguna etapa perdió más de
+--tolerancia de frames/s o cambió la fracción de conservados.
+--simulado usa un detector sin pesos (ModeloSimulado) en lugar de YOLO.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.suite --salida bench.json [--suite rapida|completa]
+        [--simulado [--latencia-ms 0]] [--base bench_anterior.json] [--tolerancia 0.1]
+        [--etapas completo,compuerta] [--clips-dir /tmp/bench_cctv]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import traceback
+from pathlib import Path
+
+import cv2
+
+from app.config import (
+    PARALELO_MIN_MINUTOS,
+    PREFILTRO,
+    SALTO_ADAPTATIVO,
+    SALTO_MAX,
+    SALTO_MIN,
+    SSIM_CALIBRACION_MUESTRAS,
+    SSIM_MOTOR,
+    YOLO_LOTE_TAMANIO,
+)
+from app.processing.cambios import crear_detector_cambios
+from app.processing.deteccion import detectar_lote
+from app.processing.processing import _EstadoSeleccion, _FuenteFrames, _siguiente_candidato, procesar_video
+from app.utils.cache import parametros_pipeline
+from app.utils.codificador import CodificadorFFmpeg
+from app.utils.instrumentacion import Perfil
+from app.utils.paralelo import cerrar_pool, obtener_pool, procesar_en_paralelo
+from app.utils.utils import CalibradorSSIM
+from benchmarks.sinteticos import clip_cacheado, instalar_modelo_simulado
+
+ETAPAS = ("decodificacion", "compuerta", "deteccion", "codificacion", "completo", "paralelo")
+
+# (nombre, ancho, alto, segundos, escenario)
+_RAPIDA = [
+    ("estatica_360p", 640, 360, 60, "estatica"),
+    ("eventos_360p", 640, 360, 60, "eventos"),
+    ("iluminacion_360p", 640, 360, 60, "iluminacion"),
+    ("trafico_360p", 640, 360, 60, "trafico"),
+]
+SUITES = {
+    "rapida": _RAPIDA,
+    "completa": _RAPIDA + [
+        ("eventos_1080p", 1920, 1080, 60, "eventos"),
+        ("trafico_1080p", 1920, 1080, 60, "trafico"),
+        ("eventos_4k", 3840, 2160, 20, "eventos"),
+        ("largo_720p", 1280, 720, (PARALELO_MIN_MINUTOS + 2) * 60, "eventos"),
+    ],
+}
+
+
+def _salto():
+    """Salteo igual al de ejecutar_procesamiento."""
+    if SALTO_ADAPTATIVO:
+        return {"step": SALTO_MIN, "salto_max": SALTO_MAX}
+    return {"step": 2}
+
+
+def _leer(clip, n=None):
+    cap = cv2.VideoCapture(clip)
+    frames = []
+    while n is None or len(frames) < n:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def etapa_decodificacion(clip, args):
+    cap = cv2.VideoCapture(clip)
+    n = 0
+    while cap.grab() and cap.retrieve()[0]:
+        n += 1
+    cap.release()
+    return {"frames": n}
+
+
+def etapa_compuerta(clip, args):
+    salto = _salto()
+    fuente = _FuenteFrames(cv2.VideoCapture(clip))
+    estado = _EstadoSeleccion(CalibradorSSIM(muestras=SSIM_CALIBRACION_MUESTRAS), salto=salto["step"])
+    detector = crear_detector_cambios(SSIM_MOTOR)
+    perfil = Perfil()
+    candidatos = 0
+    while True:
+        frame, _ = _siguiente_candidato(estado, fuente, salto["step"], detector, perfil,
+                                        salto_max=salto.get("salto_max"), prefiltro=PREFILTRO)
+        if frame is None:
+            break
+        candidatos += 1
+    fuente.cap.release()
+    return {"frames": estado.abs_idx, "conservados": candidatos / max(1, estado.abs_idx)}
+
+
+def etapa_deteccion(clip, args):
+    frames = _leer(clip, args.frames_deteccion)
+    detectar_lote(frames[:YOLO_LOTE_TAMANIO])  # calentamiento (carga del modelo fuera de la medición)
+    t0 = time.perf_counter()
+    cajas = 0
+    for i in range(0, len(frames), YOLO_LOTE_TAMANIO):
+        cajas += sum(len(c) for c in detectar_lote(frames[i:i + YOLO_LOTE_TAMANIO]))
+    return {"frames": len(frames), "segundos": time.perf_counter() - t0,
+            "conservados": None, "cajas": cajas}
+
+
+def etapa_codificacion(clip, args):
+    frames = _leer(clip, 64)
+    h, w = frames[0].shape[:2]
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        out = CodificadorFFmpeg(os.path.join(tmp, "salida.mp4"), w, h, 15)
+        for i in range(args.frames_codificacion):
+            out.escribir(frames[i % len(frames)])
+        out.cerrar()
+        return {"frames": args.frames_codificacion, "segundos": time.perf_counter() - t0}
+
+
+def etapa_completo(clip, args):
+    perfil = Perfil()
+    with tempfile.TemporaryDirectory() as tmp:
+        procesar_video(clip, os.path.join(tmp, "salida.mp4"), perfil=perfil, **_salto())
+    c = perfil.contadores
+    return {"frames": c["frames_leidos"], "conservados": c["frames_guardados"] / max(1, c["frames_leidos"]),
+            "frames_salida": c["frames_salida"], "frames_inferidos": c["frames_inferidos"],
+            "etapas": {k: round(v, 3) for k, v in perfil.tiempos.items()}}
+
+
+def etapa_paralelo(clip, args):
+    obtener_pool()  # arranque del pool (carga del modelo) fuera de la medición
+    perfil = Perfil()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            t0 = time.perf_counter()
+            _, guardados = procesar_en_paralelo(procesar_video, clip, os.path.join(tmp, "salida.mp4"),
+                                                work_dir=tmp, perfil=perfil, **_salto())
+            segundos = time.perf_counter() - t0
+    finally:
+        cerrar_pool()
+    leidos = perfil.contadores["frames_leidos"]
+    return {"frames": leidos, "segundos": segundos, "conservados": guardados / max(1, leidos)}
+
+
+def _en_hijo(conexion, funcion, clip, args):
+    """Corre la etapa en este proceso (hijo) y manda el resultado con su pico de RSS."""
+    try:
+        t0 = time.perf_counter()
+        resultado = funcion(clip, args)
+        resultado.setdefault("segundos", time.perf_counter() - t0)
+        propio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        hijos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss  # p. ej. workers del pool
+        escala = 1 / 1024 if sys.platform != "darwin" else 1 / 1024 ** 2  # KB en Linux, bytes en macOS
+        resultado["rss_pico_mb"] = round(max(propio, hijos) * escala, 1)
+        conexion.send(resultado)
+    except Exception:
+        conexion.send({"error": traceback.format_exc()})
+    finally:
+        conexion.close()
+
+
+def correr_aislado(funcion, clip, args):
+    ctx = multiprocessing.get_context("fork")
+    recibir, enviar = ctx.Pipe(duplex=False)
+    proceso = ctx.Process(target=_en_hijo, args=(enviar, funcion, clip, args))
+    proceso.start()
+    enviar.close()
+    try:
+        resultado = recibir.recv()
+    except EOFError:
+        resultado = {"error": f"el proceso terminó sin resultado (código {proceso.exitcode})"}
+    proceso.join()
+    return resultado
+
+
+def comparar(resultados, base, tolerancia):
+    """Imprime la comparación contra 'base' y devuelve cuántas regresiones hubo."""
+    anteriores = {(r["clip"], r["etapa"]): r for r in base["resultados"] if "fps" in r}
+    regresiones = 0
+    print(f"\n📊 Contra la base ({base.get('fecha', '?')}):")
+    for r in resultados:
+        b = anteriores.get((r["clip"], r["etapa"]))
+        if b is None or "fps" not in r:
+            continue
+        delta = r["fps"] / b["fps"] - 1 if b["fps"] else 0.0
+        avisos = []
+        if delta < -tolerancia:
+            avisos.append("más lento")
+        if (r.get("conservados") is not None and b.get("conservados") is not None
+                and abs(r["conservados"] - b["conservados"]) > 0.005):
+            avisos.append(f"conservados {b['conservados']:.3f} -> {r['conservados']:.3f}")
+        regresiones += bool(avisos)
+        marca = "⚠️ " + ", ".join(avisos) if avisos else "✅"
+        print(f"  {r['clip']:<18} {r['etapa']:<15} {b['fps']:9.1f} -> {r['fps']:9.1f} fps "
+              f"({delta:+.1%})  RSS {b.get('rss_pico_mb', 0):.0f} -> {r.get('rss_pico_mb', 0):.0f} MB  {marca}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--salida", required=True, help="JSON con los resultados")
+    parser.add_argument("--suite", choices=sorted(SUITES), default="rapida")
+    parser.add_argument("--etapas", default=",".join(ETAPAS))
+    parser.add_argument("--simulado", action="store_true", help="detector simulado (sin pesos de YOLO)")
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="costo por frame del detector simulado")
+    parser.add_argument("--base", help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.1, help="pérdida de frames/s tolerada (0.1 = 10%%)")
+    parser.add_argument("--clips-dir", default=str(Path(tempfile.gettempdir()) / "bench_cctv"))
+    parser.add_argument("--frames-deteccion", type=int, default=64)
+    parser.add_argument("--frames-codificacion", type=int, default=300)
+    args = parser.parse_args()
+
+    etapas = [e.strip() for e in args.etapas.split(",") if e.strip()]
+    for e in etapas:
+        if e not in ETAPAS:
+            raise Exception(f"Etapa desconocida: {e} (opciones: {', '.join(ETAPAS)})")
+    if args.simulado:
+        instalar_modelo_simulado(args.latencia_ms)
+
+    clips = [(nombre, clip_cacheado(args.clips_dir, nombre, w, h, seg, escenario), seg)
+             for nombre, w, h, seg, escenario in SUITES[args.suite]]
+
+    resultados = []
+    print(f"{'clip':<18} {'etapa':<15} {'frames':>7} {'fps':>9} {'conserv.':>9} {'RSS MB':>8} {'seg':>8}")
+    for nombre, clip, segundos in clips:
+        for etapa in etapas:
+            if etapa == "paralelo" and segundos <= PARALELO_MIN_MINUTOS * 60:
+                continue
+            r = correr_aislado(globals()[f"etapa_{etapa}"], clip, args)
+            r.update(clip=nombre, etapa=etapa)
+            if "error" in r:
+                print(f"{nombre:<18} {etapa:<15} ❌ {r['error'].strip().splitlines()[-1]}")
+            else:
+                r["fps"] = r["frames"] / r["segundos"] if r["segundos"] else 0.0
+                conservados = f"{r['conservados']:.3f}" if r.get("conservados") is not None else "-"
+                print(f"{nombre:<18} {etapa:<15} {r['frames']:7d} {r['fps']:9.1f} {conservados:>9} "
+                      f"{r['rss_pico_mb']:8.0f} {r['segundos']:8.2f}")
+            resultados.append(r)
+
+    informe = {
+        "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "suite": args.suite,
+        "simulado": args.simulado,
+        "maquina": {"nucleos": os.cpu_count(), "plataforma": platform.platform(),
+                    "python": platform.python_version(), "opencv": cv2.__version__},
+        "pipeline": parametros_pipeline(),
+        "resultados": resultados,
+    }
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False, default=str)
+    print(f"💾 Resultados en {args.salida}")
+
+    if args.base:
+        with open(args.base, encoding="utf-8") as f:
+            base = json.load(f)
+        if comparar(resultados, base, args.tolerancia):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# tests/test_calibracion.py
+"""
+Regresión del umbral SSIM: la calibración incremental (la del bucle de
+procesar_video) tiene que quedar cerca de la de dos pasadas (calcular_ssim_promedio).
+Los clips son 4:3 para que las dos reduzcan a la misma imagen de 320x240 y solo se
+compare la calibración, no el tamaño de la reducción.
+Requiere OpenCV, scikit-image y ffmpeg (los clips se generan con el codificador).
+"""
+import random
+import shutil
+
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("skimage")
+if shutil.which("ffmpeg") is None:
+    pytest.skip("ffmpeg no está instalado", allow_module_level=True)
+
+from app.config import SSIM_CALIBRACION_MUESTRAS
+from app.processing.processing import procesar_video
+from app.utils.instrumentacion import Perfil
+from app.utils.utils import CalibradorSSIM, ajustar_umbral
+from benchmarks.bench_calibracion import umbral_dos_pasadas, umbral_incremental
+from benchmarks.sinteticos import generar_clip, instalar_modelo_simulado
+
+TOLERANCIA = 0.03
+STEP = 2
+
+
+@pytest.fixture(scope="module")
+def clips(tmp_path_factory):
+    directorio = tmp_path_factory.mktemp("clips")
+    return {
+        escenario: generar_clip(str(directorio / f"{escenario}.mp4"), 640, 480, 60, escenario)
+        for escenario in ("estatica", "eventos", "iluminacion", "trafico")
+    }
+
+
+def test_welford_igual_a_media_y_desviacion():
+    rng = random.Random(0)
+    scores = [rng.uniform(0.7, 1.0) for _ in range(50)]
+    calibrador = CalibradorSSIM(muestras=len(scores))
+    for score in scores:
+        calibrador.agregar(score)
+    media = sum(scores) / len(scores)
+    desviacion = (sum((s - media) ** 2 for s in scores) / len(scores)) ** 0.5
+    assert calibrador.congelado
+    assert calibrador.umbral == pytest.approx(ajustar_umbral(media, desviacion), abs=1e-9)
+
+
+@pytest.mark.parametrize("escenario", ["estatica", "eventos", "iluminacion", "trafico"])
+def test_incremental_cerca_de_dos_pasadas(clips, escenario):
+    incremental = umbral_incremental(clips[escenario], STEP, SSIM_CALIBRACION_MUESTRAS)
+    dos_pasadas = umbral_dos_pasadas(clips[escenario], STEP)
+    assert abs(incremental - dos_pasadas) <= TOLERANCIA
+
+
+def test_calentamiento_termina_con_deteccion_activa(clips, tmp_path):
+    """En un clip con tráfico constante la detección casi no se apaga: igual tiene que congelar."""
+    instalar_modelo_simulado()
+    perfil = Perfil()
+    procesar_video(clips["trafico"], str(tmp_path / "salida.mp4"), step=STEP,
+                   calibracion="incremental", perfil=perfil)
+    assert perfil.contadores["ssim_sin_congelar"] == 0
+    assert perfil.contadores["ssim_muestras_calibracion"] == SSIM_CALIBRACION_MUESTRAS
@@ -0,0 +1,46 @@
+# tests/test_chunks.py
+"""
+Corte en chunks con -c copy: cada frame del original tiene que procesarse una sola
+vez (los chunks traen paquetes del siguiente; ver paralelo.cupos_de_frames).
+Corre procesar_en_paralelo con el detector simulado de benchmarks/sinteticos.py.
+Requiere OpenCV, NumPy y ffmpeg.
+"""
+import shutil
+
+import pytest
+
+pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+if shutil.which("ffmpeg") is None:
+    pytest.skip("ffmpeg no está instalado", allow_module_level=True)
+
+from app.processing.processing import procesar_video
+from app.utils.indice import ruta_indice
+from app.utils.instrumentacion import Perfil
+from app.utils.metadatos import metadatos
+from app.utils.paralelo import cerrar_pool, cupos_de_frames, procesar_en_paralelo
+from benchmarks.sinteticos import generar_clip, instalar_modelo_simulado
+
+
+def test_cupos_de_frames():
+    assert cupos_de_frames([0.0, 60.0, 120.0], 15) == [900, 900, None]
+    assert cupos_de_frames([0.0], 15) == [None]
+
+
+def test_chunks_suman_los_frames_del_original(tmp_path):
+    clip = generar_clip(str(tmp_path / "clip.mp4"), 320, 240, 30, "trafico")
+    total = metadatos(clip, keyframes=True)["frames"]
+    instalar_modelo_simulado()
+    perfil = Perfil()
+    salida = str(tmp_path / "salida.mp4")
+    try:
+        procesar_en_paralelo(procesar_video, clip, salida, step=1, chunk_minutes=10 / 60,
+                             procesos=2, modo_division="copia", work_dir=str(tmp_path / "trabajo"),
+                             perfil=perfil)
+    finally:
+        cerrar_pool()
+
+    assert perfil.contadores["frames_leidos"] == total
+    with np.load(ruta_indice(salida)) as indice:
+        filas = np.column_stack([indice["frame"], indice["clase"], indice["caja"]])
+    assert len(np.unique(filas, axis=0)) == len(filas)